@@ -1,5 +1,9 @@
 from .food import food_router
 from .user import user_router
 from .log import log_router
+from .jobs import jobs_router
+from .wearables import wearables_router
+from .live import live_router
+from .home import home_router
 
-__all__ = ["food_router", "user_router", "log_router"]
+__all__ = ["food_router", "user_router", "log_router", "jobs_router", "wearables_router", "live_router", "home_router"]
@@ -0,0 +1,43 @@
+"""
+Cancel in-flight request work when the HTTP client disconnects
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable
+
+from fastapi import HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+# Non-standard "client closed request" status; nobody reads it, but it keeps logs honest
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # The body has already been read, so the next ASGI message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[Any]) -> Any:
+    """Await work, cancelling it (and everything it awaits or queued) if the client leaves first"""
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        logger.info(f"Client disconnected from {request.url.path}, cancelled in-flight work")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
@@ -1,55 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List, Optional, Dict, Any
-import json
-from db.database import get_db
+import asyncio
+from db.database import catalog_version, get_db
 from models.food import Food, FoodCategory
 from models.user_pref import UserPref
 from models.health_context import HealthContext
 from services.ai_service import ai_service
 from services.nutrition_engine import nutrition_engine
+from services.macro_index import SWAP_GOALS
+from services.swap_table import build_swap_table
+from services.state_table import STATE_RULES, USER_STATES, build_state_table
+from services.cooccurrence import cooccurrence
+from services.catalog_sync import JOURNAL_KEEP, changes_since, compact_journal, food_payload, foods_json
+from services.cpu_pool import cpu_pool
+from services.job_queue import job_queue
+from services.prewarm import prewarmer
+from api.disconnect import cancel_on_disconnect
+from api.user import saved_user_prefs
+from api.wire import VARY_ACCEPT, food_json_response, food_response, json_response, negotiate, spliced_json_response
 import sqlite3
 
 food_router = APIRouter()
 
-def get_food_from_row(row) -> Food:
-    """Convert database row to Food model."""
-    return Food(
-        id=row["id"],
-        name=row["name"],
-        category=row["category"],
-        tags=json.loads(row["tags"]),
-        macros={
-            "protein_g": row["protein_g"],
-            "carbs_g": row["carbs_g"],
-            "fat_g": row["fat_g"]
-        },
-        kcal=row["kcal"],
-        availability={
-            "areas": json.loads(row["areas"]),
-            "chains": json.loads(row["chains"])
-        },
-        est_price_range=row["est_price_range"]
-    )
-
 @food_router.get("/", response_model=List[Food])
 async def get_foods(
+    request: Request,
     category: Optional[FoodCategory] = None
 ):
-    """Get all foods, optionally filtered by category."""
+    """Get all foods, optionally filtered by category.
+    
+    Sent as MessagePack or CBOR records when the Accept header asks for it; the JSON body is
+    encoded by SQLite straight from the rows.
+    """
+    where, params = ("WHERE category = ?", (category.value,)) if category else ("", ())
     with get_db() as db:
+        if negotiate(request) is None:
+            return Response(content=foods_json(db, where, params), media_type="application/json", headers=VARY_ACCEPT)
         cursor = db.cursor()
-        
-        if category:
-            cursor.execute("SELECT * FROM foods WHERE category = ?", (category.value,))
-        else:
-            cursor.execute("SELECT * FROM foods")
-        
-        rows = cursor.fetchall()
-        return [get_food_from_row(row) for row in rows]
+        cursor.execute(f"SELECT * FROM foods {where}", params)
+        return food_response(request, cursor.fetchall())
+
+@food_router.get("/changes")
+async def get_catalog_changes(since: Optional[int] = None):
+    """Get the foods upserted and deleted after catalog version since (omit it for a full download).
+    
+    With reset true the client replaces its catalog with snapshot before applying the changes;
+    that happens when since is older than the compacted journal.
+    """
+    try:
+        result = await asyncio.to_thread(changes_since, since)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading catalog changes: {str(e)}")
+    if result.pop("journal_entries") > 2 * JOURNAL_KEEP:
+        _request_compaction(result["version"])
+    snapshot_json = result.pop("snapshot_json", None)
+    if snapshot_json is None:
+        return json_response(result)
+    # The snapshot is already encoded; splice it in rather than decoding and re-encoding the catalog
+    return spliced_json_response(result, snapshot=snapshot_json)
 
 @food_router.get("/{food_id}", response_model=Food)
-async def get_food(food_id: str):
-    """Get a specific food by ID."""
+async def get_food(request: Request, food_id: str):
+    """Get a specific food by ID (a single record when a binary encoding is negotiated)."""
     with get_db() as db:
         cursor = db.cursor()
         cursor.execute("SELECT * FROM foods WHERE id = ?", (food_id,))
@@ -58,10 +70,63 @@ async def get_food(food_id: str):
         if not row:
             raise HTTPException(status_code=404, detail="Food not found")
         
-        return get_food_from_row(row)
+        return food_response(request, [row]) or json_response(food_payload(row), VARY_ACCEPT)
+
+@food_router.get("/{food_id}/similar")
+async def get_similar_foods(food_id: str, k: int = 10):
+    """Get foods with the most similar tags, category and chains."""
+    similar = await nutrition_engine.similar_foods(food_id, max(1, min(k, 50)))
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Food not found")
+    return {"food_id": food_id, "similar": similar}
+
+@food_router.get("/{food_id}/goes-well-with")
+async def get_food_pairings(food_id: str, k: int = 5):
+    """Get the foods most often logged in the same meal or day as this one."""
+    pairings = cooccurrence.goes_well_with(food_id, max(1, min(k, 20)))
+    with get_db() as db:
+        if not db.execute("SELECT 1 FROM foods WHERE id = ?", (food_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Food not found")
+        names = {
+            row["id"]: row["name"]
+            for row in db.execute(
+                f"SELECT id, name FROM foods WHERE id IN ({','.join('?' * len(pairings))})",
+                [other for other, _ in pairings]
+            )
+        } if pairings else {}
+    return {
+        "food_id": food_id,
+        "goes_well_with": [
+            {"food_id": other, "name": names[other], "weight": weight}
+            for other, weight in pairings if other in names
+        ]
+    }
+
+@food_router.get("/for-state/{user_state}")
+async def get_state_recommendations(user_state: str, area: Optional[str] = None, k: int = 3):
+    """Get the top foods for a detected wearable state, from the precomputed table.
+
+    The area defaults to the user's home area; diet, dislikes and budget come from the saved preferences.
+    """
+    if user_state not in STATE_RULES:
+        raise HTTPException(status_code=400, detail=f"user_state must be one of {', '.join(USER_STATES)}")
+    try:
+        user_prefs = saved_user_prefs()
+        area = area or user_prefs.get("home_area")
+
+        foods = await nutrition_engine.state_picks(user_state, area, user_prefs, max(1, min(k, 10)))
+        return {
+            "state": user_state,
+            "area": area,
+            "reason": STATE_RULES[user_state]["reason"],
+            "foods": foods
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting state recommendations: {str(e)}")
 
 @food_router.post("/recommend/", response_model=List[Food])
 async def recommend_foods(
+    request: Request,
     user_pref: UserPref,
     health_context: HealthContext,
     limit: int = 5
@@ -69,11 +134,6 @@ async def recommend_foods(
     """Get AI-powered food recommendations based on user preferences and health context."""
     with get_db() as db:
         cursor = db.cursor()
-        cursor.execute("SELECT * FROM foods")
-        all_foods = cursor.fetchall()
-        
-        # Convert to dict format for AI service
-        available_foods = [dict(row) for row in all_foods]
         
         # Convert user preferences and health context to dict
         user_prefs_dict = {
@@ -91,12 +151,17 @@ async def recommend_foods(
         
         try:
             # Get AI recommendations
-            ai_recommendations = await ai_service.get_food_recommendations(
-                user_prefs_dict, 
-                health_context_dict, 
-                available_foods, 
-                limit
-            )
+            # Hot inputs are served from the pre-warmed cache; a cold miss is
+            # abandoned if the client disconnects before the model answers
+            # Cached ids are only valid for the catalog they were chosen from
+            version = catalog_version(db)
+            _forget_stale_recommendations(version)
+            ai_recommendations = await cancel_on_disconnect(request, prewarmer.get_or_fetch("recommendations", {
+                "user_prefs": user_prefs_dict,
+                "health_context": health_context_dict,
+                "limit": limit,
+                "catalog_version": version
+            }))
             
             # Get recommended food IDs
             recommended_ids = [rec["food_id"] for rec in ai_recommendations]
@@ -109,19 +174,69 @@ async def recommend_foods(
                 
                 # Sort by AI recommendation order
                 food_dict = {row["id"]: row for row in recommended_rows}
-                sorted_foods = [food_dict[fid] for fid in recommended_ids if fid in food_dict]
-                
-                return [get_food_from_row(row) for row in sorted_foods]
+                rows = [food_dict[fid] for fid in recommended_ids if fid in food_dict]
             else:
                 # Fallback to simple recommendations
-                return await _fallback_recommendations(cursor, health_context, limit)
+                rows = await _fallback_recommendations(cursor, health_context, limit)
                 
+        except HTTPException:
+            raise
         except Exception as e:
             # Fallback to simple recommendations if AI fails
-            return await _fallback_recommendations(cursor, health_context, limit)
+            rows = await _fallback_recommendations(cursor, health_context, limit)
+        
+        return food_response(request, rows) or food_json_response(rows)
+
+async def _fetch_recommendations(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ask the model for recommendations over the current catalog"""
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT * FROM foods")
+        available_foods = [dict(row) for row in cursor.fetchall()]
+    
+    return await ai_service.fetch_food_recommendations(
+        params["user_prefs"],
+        params["health_context"],
+        available_foods,
+        params["limit"]
+    )
+
+prewarmer.register("recommendations", _fetch_recommendations)
+
+_recommendations_version: Dict[str, Optional[str]] = {"version": None}
 
-async def _fallback_recommendations(cursor, health_context: HealthContext, limit: int) -> List[Food]:
-    """Fallback recommendation logic when AI is unavailable."""
+def _forget_stale_recommendations(version: str) -> None:
+    """Drop recommendations cached for an earlier catalog so the warm loop stops refreshing them"""
+    if version != _recommendations_version["version"]:
+        if _recommendations_version["version"] is not None:
+            prewarmer.invalidate("recommendations")
+        _recommendations_version["version"] = version
+
+async def _swap_table_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await cpu_pool.run(build_swap_table)
+
+job_queue.register("swap_table", _swap_table_job)
+
+async def _state_table_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await cpu_pool.run(build_state_table)
+
+job_queue.register("state_table", _state_table_job)
+
+async def _catalog_compaction_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await asyncio.to_thread(compact_journal)
+
+job_queue.register("catalog_compaction", _catalog_compaction_job)
+
+_compaction_requested: Dict[str, Optional[int]] = {"version": None}
+
+def _request_compaction(version: int) -> None:
+    """Queue one journal compaction per catalog version"""
+    if version != _compaction_requested["version"]:
+        job_queue.enqueue("catalog_compaction", {"version": version})
+        _compaction_requested["version"] = version
+
+async def _fallback_recommendations(cursor, health_context: HealthContext, limit: int) -> List[sqlite3.Row]:
+    """Fallback recommendation logic when AI is unavailable; returns the food rows."""
     if health_context.activity_level == "intense":
         # High protein foods for intense activity
         cursor.execute("""
@@ -146,8 +261,7 @@ async def _fallback_recommendations(cursor, health_context: HealthContext, limit
             LIMIT ?
         """, (limit,))
     
-    rows = cursor.fetchall()
-    return [get_food_from_row(row) for row in rows]
+    return cursor.fetchall()
 
 @food_router.post("/analyze-meal/")
 async def analyze_meal_balance(
@@ -181,14 +295,24 @@ async def analyze_meal_balance(
 async def suggest_food_swaps(
     current_food: Food,
     user_pref: UserPref,
-    available_foods: List[Food]
+    available_foods: List[Food] = [],
+    goal: str = "lower_kcal",
+    k: int = 3
 ):
-    """Suggest healthier food swaps using AI."""
+    """Suggest the closest foods by macros that are lower in kcal and/or higher in protein.
+    
+    Searches available_foods when given, otherwise the whole catalog.
+    """
+    if goal not in SWAP_GOALS:
+        raise HTTPException(status_code=400, detail=f"goal must be one of {', '.join(SWAP_GOALS)}")
     try:
         current_food_dict = {
+            "id": current_food.id,
             "name": current_food.name,
             "kcal": current_food.kcal,
-            "macros": current_food.macros
+            "macros": current_food.macros,
+            "tags": current_food.tags,
+            "est_price_range": current_food.est_price_range
         }
         
         user_prefs_dict = {
@@ -202,7 +326,10 @@ async def suggest_food_swaps(
                 "id": food.id,
                 "name": food.name,
                 "kcal": food.kcal,
-                "macros": food.macros
+                "macros": food.macros,
+                "category": food.category,
+                "tags": food.tags,
+                "est_price_range": food.est_price_range
             }
             for food in available_foods
         ]
@@ -210,7 +337,9 @@ async def suggest_food_swaps(
         swaps = await nutrition_engine.suggest_food_swaps(
             current_food_dict, 
             user_prefs_dict, 
-            available_foods_dict
+            available_foods_dict,
+            goal,
+            max(1, min(k, 20))
         )
         
         return {"suggestions": swaps}
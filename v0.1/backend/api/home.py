@@ -0,0 +1,139 @@
+from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
+from db.database import catalog_version as db_catalog_version, get_db
+from models.home import HomeScreen
+from services.nutrition_engine import nutrition_engine
+from services.prewarm import prewarmer
+from services.live_updates import live_hub
+from services.wearables import wearable_store
+from services.catalog_sync import foods_json
+from api.wire import spliced_json_response
+from api.user import saved_user_prefs
+
+home_router = APIRouter()
+
+RECENT_LOG_DAYS = 7
+DEFAULT_HEALTH_CONTEXT = {"sleep_hours": 8.0, "activity_level": "moderate", "mood": "normal"}
+# A cold model call for the goals is not allowed to hold up the home screen;
+# the local estimate is served and the call keeps going to fill the cache
+GOALS_TIMEOUT_SECONDS = 2.0
+MACROS = ("protein_g", "carbs_g", "fat_g")
+
+def current_health_context() -> Dict[str, Any]:
+    """Health context from the wearable windows in the engine's shape, or defaults without samples"""
+    context = wearable_store.health_context()
+    if context is None:
+        return DEFAULT_HEALTH_CONTEXT
+    return {
+        "sleep_hours": context["sleep_hours"],
+        "activity_level": context["activity_level"],
+        "mood": context["mood_energy"]
+    }
+
+def read_home_data(known_version: Optional[str] = None, rank: bool = True) -> Dict[str, Any]:
+    """Catalog, saved preferences, recent logs and today's totals, read on one connection.
+
+    The catalog is only read when it is needed for ranking or the client's known_version is stale;
+    foods_json, the catalog encoded by SQLite, is None when the client's copy is current.
+    """
+    now = datetime.now()
+    since = (now - timedelta(days=RECENT_LOG_DAYS)).isoformat()
+    with get_db() as db:
+        version = db_catalog_version(db)
+        changed = version != known_version
+        rows = db.execute("SELECT * FROM foods").fetchall() if rank else []
+        encoded_foods = foods_json(db) if changed else None
+        user_prefs = saved_user_prefs(db)
+        logs = db.execute("""
+            SELECT logs.timestamp, logs.servings, foods.id, foods.name, foods.kcal, foods.protein_g, foods.carbs_g, foods.fat_g
+            FROM logs JOIN foods ON foods.id = logs.food_id
+            WHERE logs.timestamp >= ?
+        """, (since,)).fetchall()
+
+    recent_logs = []
+    today = {"kcal": 0.0, **{macro: 0.0 for macro in MACROS}, "meals": 0}
+    for log in logs:
+        recent_logs.append({
+            "date": log["timestamp"][:10],
+            "food": {
+                "id": log["id"],
+                "name": log["name"],
+                "kcal": log["kcal"],
+                "macros": {macro: log[macro] for macro in MACROS}
+            }
+        })
+        if log["timestamp"][:10] == now.date().isoformat():
+            today["kcal"] += log["kcal"] * log["servings"]
+            for macro in MACROS:
+                today[macro] += log[macro] * log["servings"]
+            today["meals"] += 1
+
+    return {
+        "catalog_version": version,
+        "foods_json": encoded_foods,
+        "foods": [dict(row) for row in rows] if rank else [],
+        "user_prefs": user_prefs,
+        "recent_logs": recent_logs,
+        "today": {key: round(value, 1) for key, value in today.items()}
+    }
+
+async def _daily_goals(user_profile: Dict[str, Any], health_context: Dict[str, Any]) -> Dict[str, Any]:
+    fetch = prewarmer.get_or_fetch("daily_goals", {"user_profile": user_profile, "health_context": health_context})
+    try:
+        return await asyncio.wait_for(asyncio.shield(fetch), GOALS_TIMEOUT_SECONDS)
+    except Exception:
+        return nutrition_engine._fallback_nutrition_goals(user_profile, health_context)
+
+@home_router.get("/", response_model=HomeScreen)
+async def get_home_screen(
+    catalog_version: Optional[str] = None,
+    limit: int = 5,
+    age: int = 30,
+    weight: float = 70,
+    height: float = 170,
+    goals: str = "maintain"
+):
+    """Get everything the app shows on launch in one round trip.
+
+    Returns the catalog version, recommendations, today's totals and the goals still remaining.
+    The full catalog is included only when catalog_version is not the client's cached one.
+    """
+    try:
+        health_context = current_health_context()
+        user_profile = {"age": age, "weight": weight, "height": height, "goals": goals}
+
+        async def local_results():
+            # The live channel keeps the same ranking current; only rank here when it has none to share
+            shared = live_hub.top(limit)
+            data = await asyncio.to_thread(read_home_data, catalog_version, shared is None)
+            if shared is not None:
+                return data, shared
+            recommendations = await asyncio.to_thread(
+                nutrition_engine.local_recommendations,
+                data["user_prefs"], health_context, data["recent_logs"], data["foods"], max(1, min(limit, 20))
+            )
+            return data, recommendations
+
+        # The goals may wait on the model; the catalog, logs and ranking are local
+        (data, recommendations), daily_goals = await asyncio.gather(
+            local_results(), _daily_goals(user_profile, health_context)
+        )
+
+        today = data["today"]
+        remaining = {"calories": round(daily_goals.get("calories", 0) - today["kcal"], 1)}
+        for macro in MACROS:
+            remaining[macro] = round(daily_goals.get(macro, 0) - today[macro], 1)
+
+        # Everything here is built server-side from our own rows; HomeScreen documents the shape
+        return await asyncio.to_thread(spliced_json_response, {
+            "catalog_version": data["catalog_version"],
+            "recommendations": recommendations,
+            "health_context": health_context,
+            "today": today,
+            "goals": daily_goals,
+            "remaining": remaining
+        }, foods=data["foods_json"] or "null")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading home screen: {str(e)}")
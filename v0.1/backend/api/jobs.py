@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from services.job_queue import job_queue
+
+jobs_router = APIRouter()
+
+# Upper bound for a single long-poll, to stay below typical proxy timeouts
+MAX_WAIT_SECONDS = 30.0
+
+@jobs_router.get("/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Get a job's status and result; pass wait=N to long-poll up to N seconds for completion."""
+    job = await job_queue.wait(job_id, min(max(wait, 0), MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or result expired")
+    return job
+
+@jobs_router.get("/")
+async def get_queue_status():
+    """Get job queue counters."""
+    return job_queue.snapshot()
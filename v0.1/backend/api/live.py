@@ -0,0 +1,76 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Any, Dict, List
+import asyncio
+import json
+import logging
+from services.live_updates import MAX_ITEMS, live_hub
+from services.nutrition_engine import nutrition_engine
+from api.home import current_health_context, read_home_data
+
+logger = logging.getLogger(__name__)
+
+live_router = APIRouter()
+
+# A client that cannot take a message within this long is dropped instead of buffered
+SEND_TIMEOUT_SECONDS = 10.0
+
+def _current_recommendations() -> List[Dict[str, Any]]:
+    data = read_home_data()
+    return nutrition_engine.local_recommendations(
+        data["user_prefs"], current_health_context(), data["recent_logs"], data["foods"], MAX_ITEMS
+    )
+
+async def _live_source() -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(_current_recommendations)
+
+live_hub.register_source(_live_source)
+
+@live_router.websocket("/recommendations")
+async def live_recommendations(websocket: WebSocket, limit: int = 5):
+    """Push the top recommendations, then only what changed, whenever health state, logs or the catalog change.
+
+    The first message is a snapshot; later ones are deltas with added items, removed ids and the new order.
+    Idle connections get a heartbeat; a {"type": "ping"} from the client is answered with a pong.
+    """
+    await websocket.accept()
+    subscriber = live_hub.subscribe(limit)
+    if subscriber is None:
+        await websocket.close(code=1013, reason="Too many live connections")
+        return
+
+    async def send() -> None:
+        # The only writer on this socket, so a pong never interleaves with an update
+        while True:
+            message = await live_hub.next_message(subscriber)
+            try:
+                await asyncio.wait_for(websocket.send_text(message), SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                live_hub.stats["slow_closed"] += 1
+                await websocket.close(code=1008, reason="Client too slow")
+                return
+
+    sender = asyncio.create_task(send())
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            text = frame.get("text")
+            if text is None:
+                continue  # binary frames carry nothing we understand
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("type") == "ping":
+                subscriber.pong_due = True
+                subscriber.wake.set()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        # Collect the sender's outcome so a failed send is logged once, not left unretrieved
+        error, = await asyncio.gather(sender, return_exceptions=True)
+        if isinstance(error, Exception) and not isinstance(error, (WebSocketDisconnect, RuntimeError)):
+            logger.warning(f"Live recommendations send failed: {error}")
+        live_hub.unsubscribe(subscriber)
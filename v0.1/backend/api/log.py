@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import List
 from datetime import datetime
 import uuid
 from db.database import get_db
 from models.log import Log
+from services.cooccurrence import cooccurrence
+from services.preferences import preference_store
+from services.live_updates import live_hub
+from api.wire import VARY_ACCEPT, log_response
 import sqlite3
 
 log_router = APIRouter()
 
 @log_router.post("/", response_model=Log)
 async def create_log(
+    request: Request,
+    response: Response,
     food_id: str,
     servings: float = 1.0,
     notes: str = None
@@ -18,8 +24,9 @@ async def create_log(
     with get_db() as db:
         # Verify food exists
         cursor = db.cursor()
-        cursor.execute("SELECT id FROM foods WHERE id = ?", (food_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT * FROM foods WHERE id = ?", (food_id,))
+        food = cursor.fetchone()
+        if not food:
             raise HTTPException(status_code=404, detail="Food not found")
         
         # Create log entry
@@ -32,7 +39,16 @@ async def create_log(
         """, (log_id, food_id, timestamp, servings, notes))
         
         db.commit()
+        cooccurrence.add(food_id, datetime.fromisoformat(timestamp))
+        preference_store.record(dict(food), "log")
+        live_hub.notify("log")
         
+        encoded = log_response(request, [
+            {"id": log_id, "food_id": food_id, "timestamp": timestamp, "servings": servings, "notes": notes}
+        ])
+        if encoded is not None:
+            return encoded
+        response.headers.update(VARY_ACCEPT)
         return Log(
             id=log_id,
             food_id=food_id,
@@ -42,8 +58,8 @@ async def create_log(
         )
 
 @log_router.get("/", response_model=List[Log])
-async def get_logs(limit: int = 50):
-    """Get recent food logs."""
+async def get_logs(request: Request, response: Response, limit: int = 50):
+    """Get recent food logs, as MessagePack or CBOR records when the Accept header asks for it."""
     with get_db() as db:
         cursor = db.cursor()
         cursor.execute("""
@@ -53,6 +69,10 @@ async def get_logs(limit: int = 50):
         """, (limit,))
         
         rows = cursor.fetchall()
+        encoded = log_response(request, rows)
+        if encoded is not None:
+            return encoded
+        response.headers.update(VARY_ACCEPT)
         return [
             Log(
                 id=row["id"],
@@ -1,7 +1,8 @@
 """
 AI-Powered Nutrition Analysis API Endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from contextlib import aclosing
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from models.food import Food
@@ -9,10 +10,65 @@ from models.user_pref import UserPref
 from models.health_context import HealthContext
 from services.nutrition_engine import nutrition_engine
 from services.ai_service import ai_service
+from services.prewarm import prewarmer
+from services.job_queue import job_queue
+from services.cooccurrence import cooccurrence
+from services.preferences import preference_store
+from services.wearables import wearable_store
+from services.timeseries import timeseries_store
+from services.state_classifier import state_classifier
+from services.live_updates import live_hub
+from services.cpu_pool import CpuPoolSaturatedError, cpu_pool
+from api.streaming import event_stream_response
+from api.disconnect import cancel_on_disconnect
 import json
 
 nutrition_router = APIRouter()
 
+# Longest meal plan one request may ask for; each day is CPU-pool work
+MAX_PLAN_DAYS = 14
+
+def _plan_days(days: int) -> int:
+    return max(1, min(days, MAX_PLAN_DAYS))
+
+def _user_prefs_dict(user_pref: UserPref) -> Dict[str, Any]:
+    return {
+        "diet_style": user_pref.diet_style,
+        "dislikes": user_pref.dislikes,
+        "budget": user_pref.budget,
+        "home_area": user_pref.home_area
+    }
+
+def _health_context_dict(health_context: HealthContext) -> Dict[str, Any]:
+    return {
+        "activity_level": health_context.activity_level,
+        "sleep_hours": health_context.sleep_hours,
+        "mood": health_context.mood_energy
+    }
+
+def _foods_dict(foods: List[Food]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": food.id,
+            "name": food.name,
+            "kcal": food.kcal,
+            "macros": food.macros,
+            "category": food.category,
+            "tags": food.tags,
+            "est_price_range": food.est_price_range
+        }
+        for food in foods
+    ]
+
+async def _fetch_daily_goals(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await nutrition_engine.fetch_daily_nutrition_goals(params["user_profile"], params["health_context"])
+
+async def _fetch_cost_tips(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await nutrition_engine.fetch_cost_optimization_tips()
+
+prewarmer.register("daily_goals", _fetch_daily_goals)
+prewarmer.register("cost_optimization", _fetch_cost_tips, static_params=[{}])
+
 @nutrition_router.post("/daily-goals/")
 async def calculate_daily_goals(
     user_profile: Dict[str, Any],
@@ -33,10 +89,14 @@ async def calculate_daily_goals(
             "mood": health_context.mood_energy
         }
         
-        goals = await nutrition_engine.calculate_daily_nutrition_goals(
-            user_profile_dict, 
-            health_context_dict
-        )
+        # Common profiles are served from the pre-warmed cache
+        try:
+            goals = await prewarmer.get_or_fetch("daily_goals", {
+                "user_profile": user_profile_dict,
+                "health_context": health_context_dict
+            })
+        except Exception:
+            goals = nutrition_engine._fallback_nutrition_goals(user_profile_dict, health_context_dict)
         
         return goals
     except Exception as e:
@@ -44,65 +104,112 @@ async def calculate_daily_goals(
 
 @nutrition_router.post("/meal-plan/")
 async def generate_meal_plan(
+    request: Request,
     user_pref: UserPref,
     health_context: HealthContext,
     available_foods: List[Food],
-    days: int = 3
+    days: int = 3,
+    narrate: bool = False
 ):
-    """Generate AI-powered meal plan."""
+    """Generate an optimized meal plan; an empty food list plans over the full catalog."""
     try:
-        user_prefs_dict = {
-            "diet_style": user_pref.diet_style,
-            "dislikes": user_pref.dislikes,
-            "budget": user_pref.budget,
-            "home_area": user_pref.home_area
-        }
-        
-        health_context_dict = {
-            "activity_level": health_context.activity_level,
-            "sleep_hours": health_context.sleep_hours,
-            "mood": health_context.mood_energy
-        }
-        
-        available_foods_dict = [
-            {
-                "id": food.id,
-                "name": food.name,
-                "kcal": food.kcal,
-                "macros": food.macros,
-                "category": food.category,
-                "tags": food.tags
-            }
-            for food in available_foods
-        ]
-        
-        meal_plan = await nutrition_engine.generate_meal_plan(
-            user_prefs_dict, 
-            health_context_dict, 
-            available_foods_dict, 
-            days
-        )
+        meal_plan = await cancel_on_disconnect(request, nutrition_engine.generate_meal_plan(
+            _user_prefs_dict(user_pref), 
+            _health_context_dict(health_context), 
+            _foods_dict(available_foods), 
+            _plan_days(days),
+            narrate
+        ))
         
         return meal_plan
+    except HTTPException:
+        raise
+    except CpuPoolSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating meal plan: {str(e)}")
 
+@nutrition_router.post("/meal-plan/stream")
+async def stream_meal_plan(
+    request: Request,
+    user_pref: UserPref,
+    health_context: HealthContext,
+    available_foods: List[Food],
+    days: int = 3,
+    narrate: bool = False
+):
+    """Stream the meal plan as SSE (or NDJSON), one event per day, then the optional narration."""
+    # Shed load before the stream starts; once headers are sent a 503 is no longer possible
+    if cpu_pool.saturated():
+        raise HTTPException(status_code=503, detail="CPU pool busy", headers={"Retry-After": "1"})
+    events = nutrition_engine.stream_meal_plan(
+        _user_prefs_dict(user_pref),
+        _health_context_dict(health_context),
+        _foods_dict(available_foods),
+        _plan_days(days),
+        narrate
+    )
+    return event_stream_response(request, events)
+
+@nutrition_router.post("/meal-plan/jobs", status_code=202)
+async def enqueue_meal_plan(
+    user_pref: UserPref,
+    health_context: HealthContext,
+    available_foods: List[Food],
+    days: int = 3,
+    narrate: bool = False
+):
+    """Queue a meal plan; poll /api/jobs/{job_id} (optionally with ?wait=N) for the result."""
+    job_id = job_queue.enqueue("meal_plan", {
+        "user_prefs": _user_prefs_dict(user_pref),
+        "health_context": _health_context_dict(health_context),
+        "available_foods": [food.model_dump() for food in available_foods],
+        "days": _plan_days(days),
+        "narrate": narrate
+    })
+    return {"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}
+
 @nutrition_router.post("/trends/")
 async def analyze_nutrition_trends(
+    request: Request,
     consumption_logs: List[Dict[str, Any]],
     time_period: str = "week"
 ):
     """Analyze nutrition trends over time using AI."""
     try:
-        trends = await nutrition_engine.analyze_nutrition_trends(
+        trends = await cancel_on_disconnect(request, nutrition_engine.analyze_nutrition_trends(
             consumption_logs, 
             time_period
-        )
+        ))
         
         return trends
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing trends: {str(e)}")
 
+@nutrition_router.post("/trends/jobs", status_code=202)
+async def enqueue_nutrition_trends(
+    consumption_logs: List[Dict[str, Any]],
+    time_period: str = "week"
+):
+    """Queue a trend report; poll /api/jobs/{job_id} (optionally with ?wait=N) for the result."""
+    job_id = job_queue.enqueue("trends", {"consumption_logs": consumption_logs, "time_period": time_period})
+    return {"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"}
+
+async def _meal_plan_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await nutrition_engine.generate_meal_plan(
+        params["user_prefs"], params["health_context"], params["available_foods"], params["days"],
+        params.get("narrate", False)
+    )
+
+async def _trends_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    # Raises on provider errors so the queue retries with backoff
+    return await nutrition_engine.fetch_nutrition_trends(params["consumption_logs"], params["time_period"])
+
+job_queue.register("meal_plan", _meal_plan_job)
+job_queue.register("trends", _trends_job)
+
 @nutrition_router.post("/balance-score/")
 async def calculate_balance_score(
     consumed_foods: List[Food],
@@ -136,6 +243,7 @@ async def calculate_balance_score(
 
 @nutrition_router.post("/smart-recommendations/")
 async def get_smart_recommendations(
+    request: Request,
     user_pref: UserPref,
     health_context: HealthContext,
     recent_logs: List[Dict[str, Any]],
@@ -143,115 +251,66 @@ async def get_smart_recommendations(
     limit: int = 5
 ):
     """Get smart recommendations considering recent consumption patterns."""
+    async def collect():
+        trend_analysis = {}
+        recommendations = []
+        events = nutrition_engine.stream_smart_recommendations(
+            _user_prefs_dict(user_pref),
+            _health_context_dict(health_context),
+            recent_logs,
+            _foods_dict(available_foods),
+            limit
+        )
+        async with aclosing(events) as stream:
+            async for event, data in stream:
+                if event == "trend_insights":
+                    trend_analysis = data
+                else:
+                    recommendations.append(data)
+        return trend_analysis, recommendations
+    
     try:
-        # Analyze recent patterns
-        if recent_logs:
-            trend_analysis = await nutrition_engine.analyze_nutrition_trends(
-                recent_logs, 
-                "week"
-            )
-        else:
-            trend_analysis = {"trends": [], "concerns": [], "strengths": []}
-        
-        # Get base recommendations
-        user_prefs_dict = {
-            "diet_style": user_pref.diet_style,
-            "dislikes": user_pref.dislikes,
-            "budget": user_pref.budget,
-            "home_area": user_pref.home_area
-        }
-        
-        health_context_dict = {
-            "sleep_hours": health_context.sleep_hours,
-            "activity_level": health_context.activity_level,
-            "mood": health_context.mood_energy
-        }
-        
-        available_foods_dict = [
-            {
-                "id": food.id,
-                "name": food.name,
-                "kcal": food.kcal,
-                "macros": food.macros,
-                "category": food.category,
-                "tags": food.tags
-            }
-            for food in available_foods
-        ]
-        
-        # Enhance prompt with trend analysis
-        enhanced_prompt = f"""
-        Recommend {limit} foods considering:
-        
-        User: {user_prefs_dict}
-        Health: {health_context_dict}
-        Recent trends: {trend_analysis.get('trends', [])}
-        Concerns: {trend_analysis.get('concerns', [])}
-        Strengths: {trend_analysis.get('strengths', [])}
-        
-        Available foods: {[f"{f['name']} ({f['kcal']}kcal)" for f in available_foods_dict[:15]]}
-        
-        Return JSON: [{{"food_id": "food_001", "reason": "Addresses low fiber concern", "score": 0.9}}]
-        """
-        
-        response = await ai_service._call_chatgpt(enhanced_prompt, max_tokens=800)
-        recommendations = ai_service._parse_recommendations(response)
-        
-        # Filter to available foods
-        food_ids = [food.id for food in available_foods]
-        valid_recommendations = [
-            rec for rec in recommendations 
-            if rec.get("food_id") in food_ids
-        ]
+        trend_analysis, recommendations = await cancel_on_disconnect(request, collect())
         
         return {
-            "recommendations": valid_recommendations[:limit],
+            "recommendations": recommendations[:limit],
             "trend_insights": trend_analysis,
             "reasoning": "Based on recent consumption patterns and health context"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting smart recommendations: {str(e)}")
 
+@nutrition_router.post("/smart-recommendations/stream")
+async def stream_smart_recommendations(
+    request: Request,
+    user_pref: UserPref,
+    health_context: HealthContext,
+    recent_logs: List[Dict[str, Any]],
+    available_foods: List[Food],
+    limit: int = 5
+):
+    """Stream trend insights, then each recommendation as SSE (or NDJSON) as soon as it is ready."""
+    events = nutrition_engine.stream_smart_recommendations(
+        _user_prefs_dict(user_pref),
+        _health_context_dict(health_context),
+        recent_logs,
+        _foods_dict(available_foods),
+        limit
+    )
+    return event_stream_response(request, events)
+
 @nutrition_router.get("/cost-optimization/")
 async def get_cost_optimization_tips():
     """Get AI-powered cost optimization tips for food choices."""
     try:
-        prompt = """
-        Provide 5 practical tips for optimizing food costs while maintaining nutrition:
-        
-        Focus on:
-        - Budget-friendly protein sources
-        - Seasonal produce
-        - Meal prep strategies
-        - Smart shopping
-        - Waste reduction
-        
-        Return JSON: {
-            "tips": [
-                {"category": "protein", "tip": "Use eggs and beans as affordable protein sources", "savings": "$20/week"},
-                {"category": "produce", "tip": "Buy seasonal vegetables", "savings": "$15/week"}
-            ],
-            "total_potential_savings": "$50/week"
-        }
-        """
-        
-        response = await ai_service._call_chatgpt(prompt, max_tokens=600)
-        
+        # The prompt never changes, so the warmer keeps this answer fresh in the background
         try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            return json.loads(json_str)
+            return await prewarmer.get_or_fetch("cost_optimization", {})
         except:
-            return {
-                "tips": [
-                    {"category": "general", "tip": "Plan meals weekly to reduce waste", "savings": "$10/week"},
-                    {"category": "protein", "tip": "Buy protein in bulk and freeze", "savings": "$15/week"}
-                ],
-                "total_potential_savings": "$25/week"
-            }
+            return nutrition_engine._fallback_cost_tips()
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting cost optimization tips: {str(e)}")
@@ -268,6 +327,17 @@ async def get_ai_status():
             "total_tokens": usage_stats.get("total_tokens", 0),
             "total_cost": usage_stats.get("total_cost", 0.0),
             "average_cost_per_request": usage_stats.get("average_cost_per_request", 0.0),
+            "prewarm": prewarmer.snapshot(),
+            "cpu_pool": cpu_pool.snapshot(),
+            "swaps": nutrition_engine.swap_stats,
+            "state_picks": nutrition_engine.state_stats,
+            "similarity": nutrition_engine.similarity_index.snapshot(),
+            "cooccurrence": cooccurrence.snapshot(),
+            "preferences": preference_store.snapshot(),
+            "wearables": wearable_store.snapshot(),
+            "timeseries": timeseries_store.snapshot(),
+            "state_classifier": state_classifier.snapshot(),
+            "live": live_hub.snapshot(),
             "features_enabled": [
                 "food_recommendations",
                 "nutrition_analysis", 
@@ -0,0 +1,52 @@
+"""
+Helpers for streaming endpoint results as Server-Sent Events or NDJSON
+"""
+import json
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from services.cancellation import mark_client_gone
+
+logger = logging.getLogger(__name__)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Clients that cannot consume SSE can ask for newline-delimited JSON instead"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def encode_event(event: str, data: Any, ndjson: bool = False) -> str:
+    payload = json.dumps(data, default=str)
+    if ndjson:
+        return json.dumps({"event": event, "data": data}, default=str) + "\n"
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def event_stream_response(request: Request, events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """Stream (event, data) pairs, stopping upstream work as soon as the client goes away"""
+    ndjson = wants_ndjson(request)
+
+    async def body():
+        # aclosing() closes the producer (and any upstream LLM stream) on every exit path,
+        # including cancellation when Starlette notices the disconnect first
+        async with aclosing(events) as stream:
+            async for event, data in stream:
+                if await request.is_disconnected():
+                    mark_client_gone()
+                    logger.info(f"Client disconnected from {request.url.path}, stopping stream")
+                    return
+                yield encode_event(event, data, ndjson)
+        yield encode_event("done", {}, ndjson)
+
+    return StreamingResponse(
+        body(),
+        media_type=NDJSON_MEDIA_TYPE if ndjson else SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,12 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Optional
+from typing import Any, Dict, Optional
 import json
 from db.database import get_db
 from models.user_pref import UserPref
+from services.preferences import preference_store
+from services.live_updates import live_hub
 import sqlite3
 
 user_router = APIRouter()
 
+RECENT_PICKS_LIMIT = 20
+
+def saved_user_prefs(db: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+    """The saved preferences as a plain dict for the services; empty if none were saved.
+
+    Pass db to read on a connection the caller already holds.
+    """
+    if db is None:
+        with get_db() as db:
+            return saved_user_prefs(db)
+    row = db.execute("SELECT * FROM user_prefs ORDER BY id DESC LIMIT 1").fetchone()
+    if not row:
+        return {}
+    return {
+        "diet_style": row["diet_style"],
+        "dislikes": json.loads(row["dislikes"]),
+        "budget": row["budget"],
+        "home_area": row["home_area"]
+    }
+
 @user_router.get("/preferences", response_model=UserPref)
 async def get_user_preferences():
     """Get user preferences."""
@@ -47,4 +69,37 @@ async def update_user_preferences(preferences: UserPref):
         ))
         
         db.commit()
-        return preferences
+    live_hub.notify("preferences")
+    return preferences
+
+@user_router.post("/recommendations/{food_id}/accept")
+async def accept_recommendation(food_id: str):
+    """Record that the user accepted a recommended food."""
+    with get_db() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT * FROM foods WHERE id = ?", (food_id,))
+        food = cursor.fetchone()
+        if not food:
+            raise HTTPException(status_code=404, detail="Food not found")
+        
+        cursor.execute("SELECT recent_picks FROM user_prefs WHERE id = 1")
+        row = cursor.fetchone()
+        if row:
+            picks = [food_id] + [pick for pick in json.loads(row["recent_picks"]) if pick != food_id]
+            cursor.execute("UPDATE user_prefs SET recent_picks = ? WHERE id = 1", (json.dumps(picks[:RECENT_PICKS_LIMIT]),))
+            db.commit()
+    
+    preference_store.record(dict(food), "accept")
+    live_hub.notify("accept")
+    return {"food_id": food_id, "accepted": True}
+
+@user_router.get("/preferences/learned")
+async def get_learned_preferences():
+    """Get the preference weights learned from logs and accepted recommendations."""
+    vector = preference_store.vector()
+    profile = vector.macro_profile()
+    return {
+        "events": vector.events,
+        "top_features": [{"feature": feature, "share": share} for feature, share in vector.top_features(10)],
+        "macro_profile": dict(zip(("protein", "carbs", "fat"), [round(share, 3) for share in profile])) if profile else None
+    }
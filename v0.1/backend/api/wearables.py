@@ -0,0 +1,113 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import Any, Dict, Optional
+import asyncio
+import time
+from models.health_context import HealthContext
+from models.wearable import SampleBatch
+from services.wearables import wearable_store
+from services.timeseries import METRIC_SCALES, timeseries_store
+from services.state_classifier import state_classifier
+from services.state_table import STATE_RULES
+from services.nutrition_engine import nutrition_engine
+from services.live_updates import live_hub
+from api.streaming import event_stream_response
+from api.user import saved_user_prefs
+
+wearables_router = APIRouter()
+
+# Raw reads are capped so a single request cannot inflate months of 1 Hz data
+MAX_RAW_SECONDS = 7 * 86400
+# Idle state streams send a heartbeat this often so proxies keep them open
+HEARTBEAT_SECONDS = 15.0
+
+async def _publish_transition(transition: Dict[str, Any]) -> None:
+    """Send a state change to the stream subscribers together with fresh picks for the new state"""
+    user_prefs = saved_user_prefs()
+    state = transition["to"]
+    foods = await nutrition_engine.state_picks(state, user_prefs.get("home_area"), user_prefs)
+    state_classifier.publish({**transition, "reason": STATE_RULES[state]["reason"], "foods": foods})
+
+@wearables_router.post("/samples")
+async def ingest_samples(batch: SampleBatch):
+    """Ingest a batch of heart-rate, HRV, step and sleep samples from the watch."""
+    samples = {
+        "hr": batch.hr,
+        "hrv": batch.hrv,
+        "steps": batch.steps,
+        "sleep": batch.sleep
+    }
+    context = wearable_store.health_context()
+    result = wearable_store.ingest(samples)
+    result["stored"] = timeseries_store.append(samples)
+    transition = state_classifier.update(samples, utc_offset_minutes=batch.utc_offset_minutes)
+    if transition:
+        await _publish_transition(transition)
+    # Live recommendations only depend on the derived context, not on every sample
+    if transition or wearable_store.health_context() != context:
+        live_hub.notify("health")
+    result["state"] = state_classifier.current()["state"]
+    return result
+
+@wearables_router.get("/health-context", response_model=HealthContext)
+async def get_health_context():
+    """Get the current HealthContext derived from recent wearable samples."""
+    context = wearable_store.health_context()
+    if context is None:
+        raise HTTPException(status_code=404, detail="No recent wearable samples")
+    return HealthContext(**context)
+
+@wearables_router.get("/state")
+async def get_user_state():
+    """Get the detected UserState, its rolling baselines and recent transitions."""
+    return {**state_classifier.current(), "transitions": list(state_classifier.history)}
+
+@wearables_router.get("/state/stream")
+async def stream_user_state(request: Request):
+    """Stream UserState transitions, each with fresh top picks, as they are detected."""
+    async def events():
+        queue = state_classifier.subscribe()
+        try:
+            yield "state", state_classifier.current()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield "heartbeat", {}
+                    continue
+                yield "transition", event
+        finally:
+            state_classifier.unsubscribe(queue)
+    
+    return event_stream_response(request, events())
+
+@wearables_router.get("/stats")
+async def get_signal_stats():
+    """Get sliding-window statistics per signal."""
+    return wearable_store.window_stats()
+
+@wearables_router.get("/series/{metric}")
+async def get_series(metric: str, start: Optional[float] = None, end: Optional[float] = None, step: Optional[float] = None):
+    """Get stored samples for a metric between start and end (epoch seconds, default the last day).
+
+    With step (seconds) the samples are downsampled to [time, mean, min, max, count] buckets.
+    """
+    if metric not in METRIC_SCALES:
+        raise HTTPException(status_code=404, detail=f"metric must be one of {', '.join(METRIC_SCALES)}")
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 86400
+    if step is None and end - start > MAX_RAW_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Ranges over {MAX_RAW_SECONDS // 86400} days need a step")
+    if step is not None and step <= 0:
+        raise HTTPException(status_code=400, detail="step must be positive")
+    
+    series = timeseries_store.get(metric)
+    start_ms, end_ms = int(start * 1000), int(end * 1000)
+    if step is None:
+        samples = await asyncio.to_thread(series.read, start_ms, end_ms)
+        return {"metric": metric, "samples": [[timestamp / 1000, value] for timestamp, value in samples]}
+    buckets = await asyncio.to_thread(series.downsample, start_ms, end_ms, int(step * 1000))
+    return {
+        "metric": metric,
+        "step": step,
+        "buckets": [[bucket[0] / 1000, round(bucket[1], 2)] + bucket[2:] for bucket in buckets]
+    }
@@ -0,0 +1,176 @@
+"""
+Compact binary responses (MessagePack or CBOR) chosen by the Accept header, and the fast
+JSON path for rows read from our own tables
+
+Binary payloads are columnar: the field names are sent once in a fixed order, then one
+array per record, so every client can rely on the same positions. With the media type
+parameter dict=1 (e.g. "application/msgpack; dict=1") tag, area and chain strings are sent
+once in a string table and referenced by index. JSON stays the default.
+
+JSON bodies built from database rows skip the per-row pydantic models: the rows were
+validated when they were written, so a few rows are shaped as dicts and encoded once (with
+orjson when it is installed), and whole catalogs come out of SQLite already encoded and are
+spliced in as they are. Routes keep their response_model for the OpenAPI schema, and request
+bodies are still validated as before.
+"""
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from services.catalog_sync import food_payload
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WIRE_VERSION = 1
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+CBOR_MEDIA_TYPE = "application/cbor"
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {}
+DECODERS: Dict[str, Callable[[bytes], Any]] = {}
+if msgpack is not None:
+    ENCODERS[MSGPACK_MEDIA_TYPE] = msgpack.packb
+    DECODERS[MSGPACK_MEDIA_TYPE] = msgpack.unpackb
+if cbor2 is not None:
+    ENCODERS[CBOR_MEDIA_TYPE] = cbor2.dumps
+    DECODERS[CBOR_MEDIA_TYPE] = cbor2.loads
+ALIASES = {"application/x-msgpack": MSGPACK_MEDIA_TYPE, "application/vnd.msgpack": MSGPACK_MEDIA_TYPE}
+
+# Field order is part of the wire format; only ever append to these
+FOOD_FIELDS = ("id", "name", "category", "tags", "protein_g", "carbs_g", "fat_g", "kcal", "areas", "chains", "est_price_range")
+FOOD_STRING_LISTS = ("tags", "areas", "chains")
+LOG_FIELDS = ("id", "food_id", "timestamp", "servings", "notes")
+
+# Every response on a negotiated route carries this, JSON included, so caches key on Accept
+VARY_ACCEPT = {"Vary": "Accept"}
+
+
+def negotiate(request: Request) -> Optional[Tuple[str, bool]]:
+    """(media type, dictionary-encode strings) for a supported binary Accept, or None for JSON"""
+    ranges = []
+    for position, part in enumerate(request.headers.get("accept", "").split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        options = dict(param.split("=", 1) for param in params if "=" in param)
+        try:
+            quality = float(options.get("q", 1))
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower(), options.get("dict") == "1"))
+    for _, _, media_type, dict_strings in sorted(ranges):
+        media_type = ALIASES.get(media_type, media_type)
+        if media_type in ENCODERS:
+            return media_type, dict_strings
+        if media_type in ("application/json", "application/*", "*/*"):
+            return None
+    return None
+
+
+def food_record(row: Any) -> List[Any]:
+    """A foods row (sqlite row or dict with JSON-string lists) in FOOD_FIELDS order"""
+    return [
+        row["id"], row["name"], row["category"], json.loads(row["tags"]),
+        row["protein_g"], row["carbs_g"], row["fat_g"], row["kcal"],
+        json.loads(row["areas"]), json.loads(row["chains"]), row["est_price_range"]
+    ]
+
+
+def log_record(row: Any) -> List[Any]:
+    """A logs row in LOG_FIELDS order, with the timestamp as epoch seconds"""
+    timestamp = row["timestamp"]
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return [row["id"], row["food_id"], timestamp.timestamp(), row["servings"], row["notes"]]
+
+
+def encode_records(
+    fields: Tuple[str, ...],
+    records: Iterable[List[Any]],
+    dict_strings: bool = False,
+    string_lists: Tuple[str, ...] = ()
+) -> Dict[str, Any]:
+    """The columnar payload: field names once, then rows; optionally with a shared string table"""
+    rows = list(records)
+    payload: Dict[str, Any] = {"v": WIRE_VERSION, "fields": list(fields)}
+    if dict_strings and string_lists:
+        strings: Dict[str, int] = {}
+        columns = [fields.index(name) for name in string_lists]
+        for row in rows:
+            for column in columns:
+                row[column] = [strings.setdefault(value, len(strings)) for value in row[column]]
+        payload["strings"] = list(strings)
+        payload["dict_fields"] = list(string_lists)
+    payload["rows"] = rows
+    return payload
+
+
+def decode_records(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Back to one dict per record, resolving string table references"""
+    fields = payload["fields"]
+    strings = payload.get("strings")
+    columns = [fields.index(name) for name in payload.get("dict_fields", ())] if strings is not None else []
+    records = []
+    for row in payload["rows"]:
+        for column in columns:
+            row[column] = [strings[index] for index in row[column]]
+        records.append(dict(zip(fields, row)))
+    return records
+
+
+def binary_response(
+    request: Request,
+    fields: Tuple[str, ...],
+    records: Iterable[List[Any]],
+    string_lists: Tuple[str, ...] = ()
+) -> Optional[Response]:
+    """The records encoded for the client's Accept header, or None when it wants JSON"""
+    negotiated = negotiate(request)
+    if negotiated is None:
+        return None
+    media_type, dict_strings = negotiated
+    payload = encode_records(fields, records, dict_strings, string_lists)
+    return Response(content=ENCODERS[media_type](payload), media_type=media_type, headers=VARY_ACCEPT)
+
+
+def dumps_json(content: Any) -> bytes:
+    """JSON-encode plain dicts and lists: orjson when installed, the standard library otherwise"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Server-built content as a JSON response, without a second pass through the response model"""
+    return Response(content=dumps_json(content), media_type="application/json", headers=headers)
+
+
+def spliced_json_response(content: Dict[str, Any], **encoded: str) -> Response:
+    """content as a JSON object, plus values that are already JSON text under the given keys"""
+    parts = [dumps_json(content)[1:-1]] if content else []
+    parts.extend(dumps_json(key) + b":" + value.encode() for key, value in encoded.items())
+    return Response(content=b"{" + b",".join(parts) + b"}", media_type="application/json")
+
+
+def food_json_response(rows: Iterable[Any]) -> Response:
+    """Foods rows as the JSON list of Food objects, built straight from the rows, for negotiated routes"""
+    return json_response([food_payload(row) for row in rows], VARY_ACCEPT)
+
+
+def food_response(request: Request, rows: Iterable[Any]) -> Optional[Response]:
+    return binary_response(request, FOOD_FIELDS, (food_record(row) for row in rows), FOOD_STRING_LISTS)
+
+
+def log_response(request: Request, rows: Iterable[Any]) -> Optional[Response]:
+    return binary_response(request, LOG_FIELDS, (log_record(row) for row in rows))
@@ -0,0 +1,97 @@
+"""
+Catalog sync benchmark: a client refreshing a synthetic 50k-food catalog with a full
+GET /api/foods/ vs GET /api/foods/changes when it is 1 and 100 edits behind, and when it is
+older than the compacted journal and starts from the stored snapshot; also times compaction
+
+The server runs as a uvicorn subprocess in a temporary directory; edits are written straight
+to the foods table, as any writer would.
+
+Run from the backend directory:  python benchmarks/catalog_sync.py
+"""
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import CATALOG_SIZE, print_section, synthetic_catalog  # noqa: E402
+from benchmarks.live_connections import free_port, start_server  # noqa: E402
+from benchmarks.state_table import AREAS, load_catalog  # noqa: E402
+from db.database import init_db  # noqa: E402
+from services.catalog_sync import compact_journal  # noqa: E402
+
+RUNS = 5
+KEEP = 1000
+
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def timed(url):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        body = fetch(url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), body
+
+
+def edit(rng, count):
+    with sqlite3.connect("spark.db") as db:
+        for _ in range(count):
+            food_id = f"food_{rng.randrange(CATALOG_SIZE):05d}"
+            db.execute("UPDATE foods SET kcal = kcal + 1 WHERE id = ?", (food_id,))
+
+
+def version(base):
+    return json.loads(fetch(f"{base}/api/foods/changes?since=0"))["version"]
+
+
+def report(label, ms, body):
+    print(f"  {label:<34}{len(body):>14,} bytes {ms:>10.1f}ms")
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    init_db()
+    rng = random.Random(5)
+    foods = synthetic_catalog(CATALOG_SIZE)
+    for food in foods:
+        food["areas"] = rng.sample(AREAS, rng.randint(1, 3))
+    load_catalog(foods, rng)
+
+    print_section(f"Compacting the journal after loading {CATALOG_SIZE:,} foods")
+    result = compact_journal(KEEP)
+    print(f"  folded {result['folded']:,} entries into a snapshot in {result['seconds']:.2f}s")
+    edit(rng, 2000)
+    result = compact_journal(KEEP)
+    print(f"  2,000 edits later: {result['superseded']} superseded, {result['folded']} folded in {result['seconds']:.2f}s")
+
+    port = free_port()
+    server = start_server(port, workdir)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        print_section(f"Refreshing the catalog, median of {RUNS} runs")
+        report("full GET /api/foods/", *timed(f"{base}/api/foods/"))
+        current = version(base)
+        edit(rng, 1)
+        report("1 edit behind", *timed(f"{base}/api/foods/changes?since={current}"))
+        edit(rng, 99)
+        report("100 edits behind", *timed(f"{base}/api/foods/changes?since={current}"))
+        report("older than the journal (snapshot)", *timed(f"{base}/api/foods/changes?since=1"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Co-occurrence benchmark: learn from twenty synthetic years of one person's meal logs, then time updates,
+"goes well with" lookups, ranking affinity and compaction
+
+Run from the backend directory:  python benchmarks/cooccurrence.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+from services.cooccurrence import CooccurrenceModel  # noqa: E402
+
+FOODS = 200
+DAYS = 365 * 20
+LOGS_PER_DAY = 8
+QUERIES = 10_000
+
+
+def synthetic_logs(seed=5):
+    """Meals of 1-3 foods spread over the day; each food has a few habitual partners"""
+    rng = random.Random(seed)
+    partners = {food: rng.sample(range(FOODS), 3) for food in range(FOODS)}
+    start = datetime(2025, 1, 1, 7)
+    for day in range(DAYS):
+        logged = 0
+        while logged < LOGS_PER_DAY:
+            when = start + timedelta(days=day, minutes=rng.randrange(14) * 60)
+            main = rng.randrange(FOODS)
+            meal = [main] + rng.sample(partners[main], rng.choice((0, 1, 2)))
+            for offset, food in enumerate(meal):
+                yield f"food_{food:05d}", when + timedelta(minutes=offset)
+            logged += len(meal)
+
+
+def main():
+    model = CooccurrenceModel()
+    logs = sorted(synthetic_logs(), key=lambda log: log[1])
+
+    print_section(f"Learning from {len(logs):,} logs ({DAYS} days)")
+    start = time.perf_counter()
+    for food_id, when in logs:
+        model.add(food_id, when)
+    elapsed = time.perf_counter() - start
+    stats = model.snapshot()
+    print(f"  {elapsed:.1f}s total, {elapsed / len(logs) * 1e6:.0f}µs per log")
+    print(f"  {stats['pairs']:,} pairs over {stats['foods']:,} foods, {stats['compactions']} compactions, "
+          f"{stats['dropped_pairs']:,} faded pairs dropped")
+
+    print_section("Lookups")
+    rng = random.Random(9)
+    food_ids = [f"food_{food:05d}" for food in range(FOODS)]
+    for label, query in (
+        ("goes_well_with(k=5)", lambda: model.goes_well_with(rng.choice(food_ids), 5)),
+        ("affinity vs 5 recent foods", lambda: model.affinity(rng.choice(food_ids), rng.sample(food_ids, 5))),
+    ):
+        timings = []
+        for _ in range(QUERIES):
+            start = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - start) * 1e6)
+        timings.sort()
+        print(f"  {label:<28} p50 {statistics.median(timings):.1f}µs  p99 {timings[int(len(timings) * 0.99)]:.1f}µs")
+
+    # Habitual partners should dominate each food's list
+    rng = random.Random(5)
+    partners = {food: set(rng.sample(range(FOODS), 3)) for food in range(FOODS)}
+    hits = total = 0
+    for food in range(FOODS):
+        top = [int(other[5:]) for other, _ in model.goes_well_with(f"food_{food:05d}", 3)]
+        hits += len(set(top) & partners[food])
+        total += len(top)
+    print(f"  habitual partners among top-3: {hits / max(1, total):.0%} (random picks: {3 / FOODS:.1%})")
+
+    print_section("Compaction")
+    start = time.perf_counter()
+    model.compact()
+    print(f"  {time.perf_counter() - start:.2f}s, {model.pair_count():,} pairs kept")
+
+
+if __name__ == "__main__":
+    main()
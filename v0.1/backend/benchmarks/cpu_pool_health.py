@@ -0,0 +1,145 @@
+"""
+CPU pool benchmark: /health latency while meal plans over a 50k-food catalog are generated
+
+Each mode runs in its own process:  CPU_POOL_WORKERS=0 plans on threads (sharing the GIL with
+the event loop), otherwise plans run in the process pool against a shared catalog snapshot.
+Run from the backend directory:  python benchmarks/cpu_pool_health.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+APP_PORT = 8093
+CATALOG_SIZE = 50_000
+PLANNERS = 6
+SECONDS = 6
+PLAN_BODY = {
+    "user_pref": {"diet_style": "omnivore", "dislikes": [], "budget": "$$$"},
+    "health_context": {"sleep_hours": 7.0, "activity_level": "moderate", "mood_energy": "normal"},
+    "available_foods": [],
+}
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+def seed_catalog():
+    from benchmarks.meal_planner import synthetic_catalog
+    from db.database import get_db, init_db
+
+    init_db()
+    with get_db() as db:
+        db.executemany("""
+            INSERT OR REPLACE INTO foods
+            (id, name, category, tags, protein_g, carbs_g, fat_g, kcal, areas, chains, est_price_range)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (
+                food["id"], food["name"], food["category"], json.dumps(food["tags"]),
+                food["macros"]["protein_g"], food["macros"]["carbs_g"], food["macros"]["fat_g"],
+                food["kcal"], "[]", "[]", food["est_price_range"]
+            )
+            for food in synthetic_catalog(CATALOG_SIZE)
+        ])
+        db.commit()
+
+
+def health_latencies(client, stop):
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get(f"http://127.0.0.1:{APP_PORT}/health")
+        samples.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+    return samples
+
+
+def run_mode():
+    """Child process: start the app, load it with plans and sample /health"""
+    import httpx
+    import uvicorn
+    from main import app
+
+    os.chdir(tempfile.mkdtemp())
+    seed_catalog()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    with httpx.Client(timeout=60) as client:
+        # First plan compiles the catalog (and publishes it to the pool)
+        client.post(f"http://127.0.0.1:{APP_PORT}/api/nutrition/meal-plan/?days=7", json=PLAN_BODY).raise_for_status()
+
+        stop = threading.Event()
+        idle = []
+        poller = threading.Thread(target=lambda: idle.extend(health_latencies(client, stop)))
+        poller.start()
+        time.sleep(2)
+        stop.set()
+        poller.join()
+
+        stop.clear()
+        plans, rejected = [], [0]
+
+        def planner():
+            with httpx.Client(timeout=60) as own:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    response = own.post(f"http://127.0.0.1:{APP_PORT}/api/nutrition/meal-plan/?days=28", json=PLAN_BODY)
+                    if response.status_code == 503:
+                        rejected[0] += 1
+                        time.sleep(float(response.headers.get("Retry-After", 1)) / 10)
+                        continue
+                    response.raise_for_status()
+                    plans.append((time.perf_counter() - started) * 1000)
+
+        busy = []
+        workers = [threading.Thread(target=planner) for _ in range(PLANNERS)]
+        for worker in workers:
+            worker.start()
+        poller = threading.Thread(target=lambda: busy.extend(health_latencies(client, stop)))
+        poller.start()
+        time.sleep(SECONDS)
+        stop.set()
+        for thread in [poller, *workers]:
+            thread.join()
+
+    def p99(values):
+        return sorted(values)[int(len(values) * 0.99) - 1]
+
+    print(json.dumps({
+        "idle_p50": statistics.median(idle), "idle_p99": p99(idle),
+        "busy_p50": statistics.median(busy), "busy_p99": p99(busy),
+        "plans": len(plans), "plan_p50": statistics.median(plans) if plans else 0, "rejected": rejected[0]
+    }))
+
+
+def main():
+    print_section(f"/health latency (ms) with {PLANNERS} clients planning 28 days over {CATALOG_SIZE:,} foods")
+    print(f"  {'mode':<16}{'idle p50':>9}{'idle p99':>9}{'busy p50':>9}{'busy p99':>9}{'plans':>7}{'plan p50':>10}{'503s':>6}")
+    for label, workers in [("threads", "0"), ("process pool", "2")]:
+        env = {**os.environ, "CPU_POOL_WORKERS": workers, "OPENAI_API_KEY": ""}
+        output = subprocess.run(
+            [sys.executable, __file__, "--child"], env=env, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        r = json.loads(output)
+        print(f"  {label:<16}{r['idle_p50']:>9.1f}{r['idle_p99']:>9.1f}{r['busy_p50']:>9.1f}{r['busy_p99']:>9.1f}"
+              f"{r['plans']:>7}{r['plan_p50']:>10.1f}{r['rejected']:>6}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        run_mode()
+    else:
+        main()
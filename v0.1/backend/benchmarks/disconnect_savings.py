@@ -0,0 +1,89 @@
+"""
+Disconnect benchmark: provider work and tokens saved when clients give up on slow endpoints
+
+Run from the backend directory:  python benchmarks/disconnect_savings.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LLM_PORT = 8099
+APP_PORT = 8096
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{LLM_PORT}/v1")
+os.environ.setdefault("AI_MAX_CONCURRENCY", "2")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.fake_llm_server import start_in_background, stats  # noqa: E402
+from main import app  # noqa: E402
+from services.ai_service import ai_service  # noqa: E402
+
+BASE_URL = f"http://127.0.0.1:{APP_PORT}/api/nutrition"
+FOODS = [
+    {
+        "id": f"food_{i:03d}", "name": f"Food {i}", "category": "bowl", "tags": ["protein"],
+        "macros": {"protein_g": 20.0, "carbs_g": 30.0, "fat_g": 10.0}, "kcal": 300 + i,
+        "availability": {"areas": ["campus"], "chains": ["Local"]}, "est_price_range": "$$"
+    }
+    for i in range(1, 16)
+]
+LOGS = [{"date": f"2024-01-0{i % 7 + 1}", "food": food} for i, food in enumerate(FOODS)]
+CLIENTS = 6
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+def start_app():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+
+def impatient_client(timeout):
+    try:
+        httpx.post(f"{BASE_URL}/trends/", json=LOGS, timeout=timeout)
+    except httpx.TimeoutException:
+        pass
+
+
+def main():
+    os.chdir(tempfile.mkdtemp())
+    start_in_background(LLM_PORT, latency_ms=1500, chunk_delay_ms=10)
+    start_app()
+
+    print_section("Baseline: one patient client")
+    tokens_before = ai_service.total_tokens_used
+    httpx.post(f"{BASE_URL}/trends/", json=LOGS, timeout=60).raise_for_status()
+    print(f"  tokens for a full trend report: {ai_service.total_tokens_used - tokens_before}")
+
+    print_section(f"{CLIENTS} clients giving up after 0.5s (concurrency limit 2)")
+    requests_before = stats["requests"]
+    tokens_before = ai_service.total_tokens_used
+    clients = [threading.Thread(target=impatient_client, args=(0.5,)) for _ in range(CLIENTS)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    time.sleep(2.0)
+
+    cancellations = ai_service.get_usage_stats()["cancellations"]
+    print(f"  upstream requests started:     {stats['requests'] - requests_before}")
+    print(f"  cancelled in flight:           {cancellations['cancelled_in_flight']}")
+    print(f"  cancelled while queued:        {cancellations['cancelled_while_queued']}")
+    print(f"  tokens spent:                  {ai_service.total_tokens_used - tokens_before}")
+    print(f"  tokens saved (estimate):       {cancellations['tokens_saved_estimate']}")
+
+
+if __name__ == "__main__":
+    main()
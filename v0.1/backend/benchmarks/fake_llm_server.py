@@ -0,0 +1,170 @@
+"""
+Fake OpenAI-compatible chat completion server with injectable latency and errors
+
+Run:  python benchmarks/fake_llm_server.py --port 8099 --latency-ms 800 --error-rate 0.2
+Then: OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+app = FastAPI(title="Fake LLM Provider")
+
+settings = {
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+    "error_rate": 0.0,
+    "tail_rate": 0.0,
+    "tail_ms": 0.0,
+    "chunk_delay_ms": 0.0,
+    "noise_rate": 0.0,
+}
+
+# Prose around the JSON with stray brackets, as models sometimes produce
+NOISE_PREFIX = "Sure [based on your profile], here are my picks (see notes]:\n"
+NOISE_SUFFIX = "\nNote: portions may vary [1]. Enjoy!"
+stats = {"requests": 0, "errors": 0}
+
+
+def _fake_content(prompt: str) -> str:
+    """Produce a plausible JSON answer for the prompt"""
+    # Compact prompts list foods as "f1|name|..." rows; legacy prompts use catalog ids
+    food_ids = re.findall(r"^(f\d+)\|", prompt, re.MULTILINE)
+    food_ids = food_ids or list(dict.fromkeys(re.findall(r"\b(food_\d+)\b", prompt)))
+    narrate = re.search(r"^TASK NARRATE days=(\d+)", prompt, re.MULTILINE)
+    if narrate:
+        return json.dumps({
+            "summary": f"A balanced {narrate.group(1)}-day plan close to your calorie target.",
+            "highlights": ["protein at every meal", "no repeats within three days"]
+        })
+    wants_list = re.search(r"^TASK REC\b", prompt, re.MULTILINE) or "Recommend" in prompt
+    if food_ids and wants_list:
+        return "Here you go:\n" + json.dumps([
+            {"food_id": food_id, "reason": "Fits your context", "score": round(0.9 - i * 0.05, 2)}
+            for i, food_id in enumerate(food_ids[:5])
+        ])
+    return json.dumps({"balance_score": 0.8, "strengths": ["good protein"], "improvements": ["add vegetables"]})
+
+
+@app.post("/control")
+async def control(update: dict):
+    """Change latency/error injection at runtime"""
+    for key in settings:
+        if key in update:
+            settings[key] = float(update[key])
+    return settings
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, **settings}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    delay = settings["latency_ms"] + random.uniform(0, settings["jitter_ms"])
+    if random.random() < settings["tail_rate"]:
+        delay += settings["tail_ms"]
+    await asyncio.sleep(delay / 1000)
+
+    if random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "injected failure", "type": "server_error"}})
+
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    content = _fake_content(prompt)
+    if random.random() < settings["noise_rate"]:
+        content = NOISE_PREFIX + content + NOISE_SUFFIX
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+
+    if body.get("stream"):
+        return StreamingResponse(_stream_chunks(content, body.get("model", "fake")), media_type="text/event-stream")
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+async def _stream_chunks(content: str, model: str):
+    """Emit the content as OpenAI-style SSE chunks of ~4 characters"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    for i in range(0, len(content), 4):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[i:i + 4]}, "finish_reason": None}]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        if settings["chunk_delay_ms"]:
+            await asyncio.sleep(settings["chunk_delay_ms"] / 1000)
+    done = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+    }
+    yield f"data: {json.dumps(done)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def start_in_background(port: int = 8099, **overrides) -> uvicorn.Server:
+    """Start the fake provider on a daemon thread (for benchmarks)"""
+    settings.update({key: float(value) for key, value in overrides.items()})
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake LLM provider")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of requests that get --tail-ms extra")
+    parser.add_argument("--tail-ms", type=float, default=0.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0, help="delay between streamed chunks")
+    parser.add_argument("--noise-rate", type=float, default=0.0, help="fraction of answers wrapped in bracketed prose")
+    args = parser.parse_args()
+
+    settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        tail_rate=args.tail_rate,
+        tail_ms=args.tail_ms,
+        chunk_delay_ms=args.chunk_delay_ms,
+        noise_rate=args.noise_rate
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,94 @@
+"""
+Home screen benchmark: the app's launch sequence (catalog, recommendations, meal analysis as
+three sequential requests) against one /api/home/ call, cold (no cached catalog) and with the
+catalog version cached on the client, over a synthetic 50k-food catalog
+
+The server runs as a uvicorn subprocess in a temporary directory. Without an OpenAI key the
+model-backed steps take their local fallbacks, so the times are server work plus loopback;
+the last section adds a mobile round-trip time per request.
+
+Run from the backend directory:  python benchmarks/home_screen.py
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import CATALOG_SIZE, print_section, synthetic_catalog  # noqa: E402
+from benchmarks.live_connections import free_port, start_server  # noqa: E402
+from benchmarks.state_table import AREAS, load_catalog  # noqa: E402
+from db.database import init_db  # noqa: E402
+
+RUNS = 10
+MOBILE_RTT_MS = 100
+USER_PREF = {"diet_style": "omnivore", "dislikes": [], "budget": "$$", "home_area": "downtown"}
+HEALTH_CONTEXT = {"sleep_hours": 8, "activity_level": "moderate", "mood_energy": "normal"}
+
+
+def request(url, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read())
+
+
+def launch_sequence(base):
+    """What App.tsx does on launch: one request after another"""
+    foods = request(f"{base}/api/foods/")
+    request(f"{base}/api/foods/recommend/?limit=5", {"user_pref": USER_PREF, "health_context": HEALTH_CONTEXT})
+    request(f"{base}/api/foods/analyze-meal/?meal_type=lunch", {
+        "meal_foods": foods[:2],
+        "daily_goals": {"calories": 2000, "protein_g": 125, "carbs_g": 225, "fat_g": 67}
+    })
+
+
+def timed(fn, runs=RUNS):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    init_db()
+    rng = random.Random(5)
+    foods = synthetic_catalog(CATALOG_SIZE)
+    for food in foods:
+        food["areas"] = rng.sample(AREAS, rng.randint(1, 3))
+    load_catalog(foods, rng)
+
+    port = free_port()
+    server = start_server(port, workdir)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        version = request(f"{base}/api/home/")["catalog_version"]
+
+        print_section(f"Launch over {CATALOG_SIZE:,} foods, p50 of {RUNS} runs")
+        sequence = timed(lambda: launch_sequence(base))
+        cold = timed(lambda: request(f"{base}/api/home/"))
+        cached = timed(lambda: request(f"{base}/api/home/?catalog_version={version}"))
+        print(f"  3 sequential requests:            {sequence:8.1f}ms")
+        print(f"  /api/home/, no cached catalog:    {cold:8.1f}ms  ({sequence - cold:+.1f}ms saved)")
+        print(f"  /api/home/, catalog version known:{cached:8.1f}ms  ({sequence - cached:+.1f}ms saved)")
+
+        print_section(f"Adding a {MOBILE_RTT_MS}ms round trip per request")
+        print(f"  3 sequential requests:            {sequence + 3 * MOBILE_RTT_MS:8.1f}ms")
+        print(f"  /api/home/, no cached catalog:    {cold + MOBILE_RTT_MS:8.1f}ms")
+        print(f"  /api/home/, catalog version known:{cached + MOBILE_RTT_MS:8.1f}ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Import-time report: imports a module (main by default) in a fresh interpreter with
+python -X importtime and summarizes where the time goes: the total, the time per top-level
+package (self times summed, so nothing is counted twice) and the slowest single modules
+
+Run from the backend directory:  python benchmarks/import_report.py [module]
+"""
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOP = 12
+
+
+def import_times(module: str = "main") -> List[Tuple[str, int, int]]:
+    """(module, self µs, cumulative µs) for everything importing module pulled in, in import order"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(own), int(cumulative)))
+    return entries
+
+
+def import_seconds(module: str = "main") -> float:
+    """Cumulative import time of module alone, without the interpreter's own startup imports"""
+    return next(cumulative for name, _, cumulative in import_times(module) if name == module) / 1e6
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "main"
+    entries = import_times(module)
+    total = next(cumulative for name, _, cumulative in entries if name == module)
+    packages: Dict[str, int] = defaultdict(int)
+    for name, own, _ in entries:
+        packages[name.split(".")[0]] += own
+
+    print_section(f"import {module}: {total / 1000:.0f}ms, {len(entries)} modules loaded")
+    print(f"  {'package':<28}{'ms':>8}{'share':>8}")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:TOP]:
+        print(f"  {package:<28}{own / 1000:>8.1f}{own / total:>8.0%}")
+
+    print_section("Slowest modules (self time)")
+    for name, own, cumulative in sorted(entries, key=lambda entry: -entry[1])[:TOP]:
+        print(f"  {name:<44}{own / 1000:>8.1f}ms  (with imports {cumulative / 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
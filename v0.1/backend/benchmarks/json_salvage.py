@@ -0,0 +1,75 @@
+"""
+Streaming JSON benchmark: salvaged responses and time to first recommendation
+
+Run from the backend directory:  python benchmarks/json_salvage.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from contextlib import aclosing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8099
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+
+from benchmarks.fake_llm_server import start_in_background, settings  # noqa: E402
+from services.ai_service import AIService  # noqa: E402
+
+FOODS = [
+    {"id": f"food_{i:03d}", "name": f"Food {i}", "kcal": 300 + i, "macros": {"protein_g": 20, "carbs_g": 30, "fat_g": 10}}
+    for i in range(1, 21)
+]
+CALLS = 40
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+async def main():
+    start_in_background(PORT, latency_ms=150, chunk_delay_ms=8, noise_rate=0.3)
+    service = AIService()
+    prompt = service._create_recommendation_prompt({}, {}, FOODS, 5)
+
+    print_section(f"Salvage rate ({CALLS} responses, 30% wrapped in bracketed prose)")
+    for _ in range(CALLS):
+        async with aclosing(service.stream_recommendations(prompt, FOODS, max_recommendations=100)) as stream:
+            async for _item in stream:
+                pass
+    stats = service.parse_stats
+    print(f"  responses parsed:            {stats['responses']}")
+    print(f"  legacy extraction failures:  {stats['legacy_failed']}")
+    print(f"  salvaged by streaming parser:{stats['salvaged']:>4}")
+    print(f"  still unparseable:           {stats['failed']}")
+
+    print_section("Time to first item vs full completion")
+    settings.update(noise_rate=0.0)
+    first_item, full = [], []
+    for _ in range(10):
+        started = time.perf_counter()
+        first = None
+        async with aclosing(service.stream_recommendations(prompt, FOODS, max_recommendations=100)) as stream:
+            async for _item in stream:
+                if first is None:
+                    first = time.perf_counter() - started
+        first_item.append(first * 1000)
+        full.append((time.perf_counter() - started) * 1000)
+    print(f"  first item   p50={statistics.median(first_item):7.1f}ms")
+    print(f"  completion   p50={statistics.median(full):7.1f}ms")
+
+    early = []
+    for _ in range(10):
+        started = time.perf_counter()
+        await service.get_food_recommendations({}, {}, FOODS, 2)
+        early.append((time.perf_counter() - started) * 1000)
+    print(f"  top-2 early return p50={statistics.median(early):7.1f}ms (stream closed once 2 items arrived)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
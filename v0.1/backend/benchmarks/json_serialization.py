@@ -0,0 +1,97 @@
+"""
+JSON serialization benchmark: foods rows read from a synthetic catalog to a response body the
+way the food endpoints used to (a validated Food model per row, then FastAPI's response_model
+validation and serialization and JSONResponse) vs the trusted-data paths (a plain dict per
+row encoded once, with the standard library and with orjson, and the whole array built by
+SQLite's JSON functions); prints rows per second for 10k and 50k rows
+
+Run from the backend directory:  python benchmarks/json_serialization.py
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from benchmarks.meal_planner import CATALOG_SIZE, print_section, synthetic_catalog  # noqa: E402
+from benchmarks.state_table import AREAS, load_catalog  # noqa: E402
+from benchmarks.wire_format import json_food  # noqa: E402
+from api.wire import dumps_json, orjson  # noqa: E402
+from db.database import get_db, init_db  # noqa: E402
+from models.food import Food  # noqa: E402
+from services.catalog_sync import food_payload, foods_json  # noqa: E402
+
+RUNS = 3
+SIZES = (10_000, CATALOG_SIZE)
+RESPONSE_FIELD = create_response_field(name="Response_get_foods", type_=List[Food])
+
+
+def read_rows(db, size):
+    return db.execute("SELECT * FROM foods WHERE rowid <= ? ORDER BY id", (size,)).fetchall()
+
+
+def validated(db, size):
+    """The previous path: Food per row, response_model validation, JSONResponse rendering"""
+    foods = [Food(**json_food(row)) for row in read_rows(db, size)]
+    content = asyncio.run(serialize_response(field=RESPONSE_FIELD, response_content=foods))
+    return JSONResponse(content).body
+
+
+def stdlib(db, size):
+    return json.dumps([food_payload(row) for row in read_rows(db, size)], separators=(",", ":")).encode()
+
+
+def fast(db, size):
+    return dumps_json([food_payload(row) for row in read_rows(db, size)])
+
+
+def in_sqlite(db, size):
+    return foods_json(db, "WHERE rowid <= ?", (size,)).encode()
+
+
+def best_of(fn, db, size):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        body = fn(db, size)
+        timings.append(time.perf_counter() - start)
+    return min(timings), body
+
+
+def main():
+    os.chdir(tempfile.mkdtemp())
+    init_db()
+    rng = random.Random(5)
+    foods = synthetic_catalog(CATALOG_SIZE)
+    for food in foods:
+        food["areas"] = rng.sample(AREAS, rng.randint(1, 3))
+    load_catalog(foods, rng)
+
+    paths = [("Food models + response_model", validated), ("dicts + json", stdlib)]
+    if orjson is not None:
+        paths.append(("dicts + orjson", fast))
+    paths.append(("SQLite JSON functions", in_sqlite))
+
+    with get_db() as db:
+        reference = json.loads(validated(db, 100))
+        for size in SIZES:
+            print_section(f"{size:,} rows, read and encoded (best of {RUNS})")
+            baseline = None
+            for label, fn in paths:
+                assert json.loads(fn(db, 100)) == reference
+                seconds, body = best_of(fn, db, size)
+                baseline = baseline or seconds
+                print(f"  {label:<30}{size / seconds:>12,.0f} rows/s {seconds * 1000:>9.1f}ms {len(body):>12,} bytes  x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Live recommendation benchmark: one server process holding 10k idle websocket subscribers;
+prints connect time, server memory per connection, server CPU while the connections sit
+idle with heartbeats, and how long one preference change takes to reach every connection
+
+The server runs as a uvicorn subprocess in a temporary directory with its own database;
+client and server share the machine, so the fan-out time includes client-side parsing.
+
+Run from the backend directory:  python benchmarks/live_connections.py
+"""
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+
+from websockets.asyncio.client import connect  # noqa: E402
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONNECTIONS = 10_000
+CONNECT_CONCURRENCY = 200
+HEARTBEAT_SECONDS = 10
+IDLE_SECONDS = 30
+FANOUT_ROUNDS = 3
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def put_preferences(port, diet_style):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/users/preferences",
+        data=json.dumps({"diet_style": diet_style}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="PUT"
+    )
+    urllib.request.urlopen(request).read()
+
+
+def start_server(port, workdir=None):
+    """uvicorn serving the app from workdir (a fresh temporary directory by default)"""
+    workdir = workdir or tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "LIVE_HEARTBEAT_SECONDS": str(HEARTBEAT_SECONDS),
+        "TIMESERIES_DIR": os.path.join(workdir, "timeseries"),
+        "CPU_POOL_WORKERS": "0"
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND, "--port", str(port),
+         "--backlog", "4096", "--ws-per-message-deflate", "false", "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health").read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+class Client:
+    """One subscriber that counts what it receives"""
+
+    def __init__(self):
+        self.socket = None
+        self.heartbeats = 0
+        self.delta_at = None
+
+    async def open(self, url, semaphore):
+        async with semaphore:
+            self.socket = await connect(url, open_timeout=60, max_queue=4)
+            snapshot = json.loads(await self.socket.recv())
+            assert snapshot["type"] == "snapshot"
+
+    async def read(self):
+        async for raw in self.socket:
+            message = json.loads(raw)
+            if message["type"] == "heartbeat":
+                self.heartbeats += 1
+            elif message["type"] == "delta" and self.delta_at is None:
+                self.delta_at = time.perf_counter()
+
+
+async def run(port, server_pid):
+    url = f"ws://127.0.0.1:{port}/api/live/recommendations?limit=3"
+    base_rss = rss_mb(server_pid)
+
+    print_section(f"Connecting {CONNECTIONS:,} subscribers")
+    clients = [Client() for _ in range(CONNECTIONS)]
+    semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    start = time.perf_counter()
+    await asyncio.gather(*(client.open(url, semaphore) for client in clients))
+    elapsed = time.perf_counter() - start
+    readers = [asyncio.create_task(client.read()) for client in clients]
+    await asyncio.sleep(1)
+    rss = rss_mb(server_pid)
+    print(f"connected + snapshot:  {elapsed:6.1f}s  ({CONNECTIONS / elapsed:,.0f} connections/s)")
+    print(f"server RSS:            {base_rss:6.1f} MB idle -> {rss:6.1f} MB  "
+          f"({(rss - base_rss) * 1024 / CONNECTIONS:.1f} KB per connection)")
+
+    print_section(f"Idle for {IDLE_SECONDS}s, heartbeat every {HEARTBEAT_SECONDS}s")
+    cpu_start = cpu_seconds(server_pid)
+    await asyncio.sleep(IDLE_SECONDS)
+    cpu = cpu_seconds(server_pid) - cpu_start
+    heartbeats = sum(client.heartbeats for client in clients)
+    print(f"heartbeats delivered:  {heartbeats:,}")
+    print(f"server CPU:            {cpu:6.2f}s over {IDLE_SECONDS}s ({cpu / IDLE_SECONDS:.1%} of a core)")
+
+    print_section(f"Fan-out of a preference change, {FANOUT_ROUNDS} rounds")
+    for round_number in range(FANOUT_ROUNDS):
+        for client in clients:
+            client.delta_at = None
+        start = time.perf_counter()
+        await asyncio.to_thread(put_preferences, port, "vegetarian" if round_number % 2 == 0 else "omnivore")
+        deadline = start + 60
+        while time.perf_counter() < deadline and any(client.delta_at is None for client in clients):
+            await asyncio.sleep(0.05)
+        arrivals = sorted(client.delta_at - start for client in clients if client.delta_at is not None)
+        print(f"round {round_number + 1}: {len(arrivals):,} / {CONNECTIONS:,} deltas, first / median / last "
+              f"{arrivals[0] * 1000:.0f} / {arrivals[len(arrivals) // 2] * 1000:.0f} / {arrivals[-1] * 1000:.0f} ms")
+        await asyncio.sleep(2)
+    print("(times include the debounce and the client parsing on the same machine)")
+
+    status = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/api/nutrition/ai-status/").read())
+    print(f"hub stats:             {status['live']}")
+
+    for reader in readers:
+        reader.cancel()
+    await asyncio.gather(*(client.socket.close() for client in clients), return_exceptions=True)
+
+
+if __name__ == "__main__":
+    # Each connection is a file descriptor on both sides
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, CONNECTIONS + 1024)), hard))
+    port = free_port()
+    server = start_server(port)
+    try:
+        asyncio.run(run(port, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,90 @@
+"""
+Meal planner benchmark: 7-day plan over a synthetic 50k-food catalog, and target fit vs the old fallback
+
+Run from the backend directory:  python benchmarks/meal_planner.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.meal_planner import MealPlanner, compile_catalog, daily_targets, plan_meals  # noqa: E402
+
+CATALOG_SIZE = 50_000
+DAYS = 7
+RUNS = 20
+CATEGORIES = ["bowl", "wrap", "salad", "snack", "drink"]
+TAGS = ["protein", "vegetarian", "vegan", "halal", "spicy", "fresh", "pork", "asian", "mediterranean"]
+PROFILES = [
+    ({"diet_style": "omnivore", "budget": "$$", "dislikes": []}, {"activity_level": "moderate"}),
+    ({"diet_style": "vegan", "budget": "$", "dislikes": ["spicy"]}, {"activity_level": "light"}),
+    ({"diet_style": "keto", "budget": "$$$", "dislikes": []}, {"activity_level": "intense"}),
+]
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+def synthetic_catalog(size, seed=7):
+    rng = random.Random(seed)
+    foods = []
+    for i in range(size):
+        category = rng.choice(CATEGORIES)
+        protein, carbs, fat = rng.uniform(2, 50), rng.uniform(2, 90), rng.uniform(1, 40)
+        foods.append({
+            "id": f"food_{i:05d}",
+            "name": f"{category.title()} {i}",
+            "category": category,
+            "tags": rng.sample(TAGS, 2),
+            "macros": {"protein_g": round(protein, 1), "carbs_g": round(carbs, 1), "fat_g": round(fat, 1)},
+            "kcal": int(protein * 4 + carbs * 4 + fat * 9),
+            "est_price_range": rng.choice(["$", "$$", "$$$"]),
+        })
+    return foods
+
+
+def target_error(plan, targets):
+    errors = []
+    for day, totals in plan["daily_totals"].items():
+        errors.append(abs(totals["kcal"] - targets["kcal"]) / targets["kcal"])
+    return statistics.mean(errors) * 100
+
+
+def main():
+    foods = synthetic_catalog(CATALOG_SIZE)
+
+    print_section(f"Compile {CATALOG_SIZE:,} foods (once per catalog version)")
+    started = time.perf_counter()
+    catalog = compile_catalog(foods)
+    print(f"  compile: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    print_section(f"{DAYS}-day plan over {CATALOG_SIZE:,} foods, {RUNS} runs per profile")
+    for user_prefs, health in PROFILES:
+        latencies = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            plan = plan_meals(catalog, user_prefs, health, DAYS)
+            latencies.append((time.perf_counter() - started) * 1000)
+        targets = daily_targets(health, diet=user_prefs["diet_style"])
+        distinct = len({meal["food_id"] for day in range(1, DAYS + 1) for meal in plan[f"day_{day}"].values()})
+        print(f"  {user_prefs['diet_style']:<9} p50={statistics.median(latencies):6.1f}ms  max={max(latencies):6.1f}ms"
+              f"  kcal error={target_error(plan, targets):4.1f}%  distinct foods={distinct}/{DAYS * 4}")
+
+    print_section("Old fallback (foods 0, 1, 2 every day) for comparison")
+    user_prefs, health = PROFILES[0]
+    planner = MealPlanner(catalog)
+    targets = daily_targets(health)
+    first = [catalog.ids.index(food["id"]) for food in foods[:3]]
+    history = [dict(zip(["breakfast", "lunch", "dinner"], first)) for _ in range(DAYS)]
+    plan = planner.render(history, targets)
+    print(f"  kcal error={target_error(plan, targets):4.1f}%  distinct foods=3/{DAYS * 3}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Preference vector benchmark: online updates from synthetic logs, personalization scoring
+over a catalog and write-back, in a scratch database
+
+Run from the backend directory:  python benchmarks/preferences.py
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section, synthetic_catalog  # noqa: E402
+from db.database import init_db  # noqa: E402
+from services.preferences import PreferenceStore  # noqa: E402
+
+CATALOG_SIZE = 5_000
+UPDATES = 200_000
+RANKED = 200
+
+
+def main():
+    # get_db() opens spark.db in the working directory
+    os.chdir(tempfile.mkdtemp())
+    init_db()
+    foods = synthetic_catalog(CATALOG_SIZE)
+    rng = random.Random(5)
+    # A user with habits: most logs come from a small set of favourites
+    favourites = rng.sample(foods, 30)
+    logs = [rng.choice(favourites) if rng.random() < 0.8 else rng.choice(foods) for _ in range(UPDATES)]
+
+    store = PreferenceStore(flush_interval=5.0)
+    print_section(f"Online updates ({UPDATES:,} logs)")
+    start = time.perf_counter()
+    for food in logs:
+        store.record(food, "log")
+    elapsed = time.perf_counter() - start
+    vector = store.vector()
+    print(f"  {UPDATES / elapsed:,.0f} updates/s ({elapsed / UPDATES * 1e6:.1f}µs each), "
+          f"{store.stats['flushes']} flushes, {len(vector.weights)} features kept")
+
+    print_section("Write-back")
+    store._dirty.add(1)
+    start = time.perf_counter()
+    store.flush()
+    print(f"  flush {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    print_section(f"Scoring {RANKED} ranking candidates")
+    timings = []
+    for _ in range(1000):
+        candidates = rng.sample(foods, RANKED)
+        start = time.perf_counter()
+        for food in candidates:
+            vector.score(food)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"  p50 {statistics.median(timings):.2f}ms  p99 {timings[int(len(timings) * 0.99)]:.2f}ms")
+
+    favourite_scores = statistics.mean(vector.score(food) for food in favourites)
+    catalog_scores = statistics.mean(vector.score(food) for food in rng.sample(foods, 1000))
+    print(f"  mean score: favourites {favourite_scores:.3f}, random foods {catalog_scores:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Pre-warm benchmark: latency of hot keys served from the warmer vs waiting on the provider
+
+Run from the backend directory:  python benchmarks/prewarm_latency.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LLM_PORT = 8099
+APP_PORT = 8095
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{LLM_PORT}/v1")
+# Short windows so a run shows misses, fresh hits, stale hits and background refreshes
+os.environ.setdefault("AI_PREWARM_INTERVAL_SECONDS", "1")
+os.environ.setdefault("AI_PREWARM_FRESH_SECONDS", "2")
+os.environ.setdefault("AI_PREWARM_STALE_SECONDS", "60")
+os.environ.setdefault("AI_PREWARM_TOKEN_BUDGET_PER_HOUR", "3000")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.fake_llm_server import start_in_background, stats  # noqa: E402
+from main import app  # noqa: E402
+from services.prewarm import prewarmer  # noqa: E402
+
+BASE_URL = f"http://127.0.0.1:{APP_PORT}/api"
+RECOMMEND = {
+    "user_pref": {"diet_style": "omnivore", "dislikes": [], "budget": "$$", "home_area": "campus"},
+    "health_context": {"sleep_hours": 7.0, "activity_level": "moderate", "mood_energy": "normal"},
+}
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+def start_app():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+
+def timed(call):
+    started = time.perf_counter()
+    call().raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    os.chdir(tempfile.mkdtemp())
+    start_in_background(LLM_PORT, latency_ms=800)
+    start_app()
+    time.sleep(1.5)  # first warm cycle fetches the static cost tips
+
+    with httpx.Client(timeout=30) as client:
+        print_section("Provider latency 800ms")
+        cost = [timed(lambda: client.get(f"{BASE_URL}/nutrition/cost-optimization/")) for _ in range(20)]
+        print(f"  cost-optimization (static, warmed at startup) p50={statistics.median(cost):7.1f}ms")
+
+        recommend = lambda: client.post(f"{BASE_URL}/foods/recommend/", json=RECOMMEND)  # noqa: E731
+        print(f"  recommend cold miss                           {timed(recommend):7.1f}ms")
+        hot = [timed(recommend) for _ in range(20)]
+        print(f"  recommend hot key                        p50={statistics.median(hot):7.1f}ms")
+
+        # Keep requesting past the fresh window: stale answers are served while refreshes run behind
+        latencies = []
+        deadline = time.monotonic() + 8
+        while time.monotonic() < deadline:
+            latencies.append(timed(recommend))
+            time.sleep(0.1)
+        print(f"  recommend over 8s of revalidation        max={max(latencies):7.1f}ms")
+
+    print_section("Warmer stats")
+    snapshot = prewarmer.snapshot()
+    for key in ["fresh_hits", "stale_hits", "misses", "refreshes", "skipped_budget", "tokens_last_hour", "token_budget_per_hour"]:
+        print(f"  {key:<22} {snapshot[key]}")
+    print(f"  provider requests      {stats['requests']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Prompt token benchmark: average prompt tokens per endpoint, legacy templates vs compact prompts
+
+Run from the backend directory:  python benchmarks/prompt_tokens.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.meal_planner import compile_catalog, plan_meals  # noqa: E402
+from services.nutrition_engine import nutrition_engine  # noqa: E402
+from services.prompt_builder import estimate_tokens, prompt_builder  # noqa: E402
+
+LEGACY_SYSTEM = "You are a nutrition expert AI assistant. Provide concise, helpful responses."
+
+CATEGORIES = ["bowl", "wrap", "salad", "snack", "drink"]
+WORDS = ["Chicken", "Teriyaki", "Veggie", "Greek", "Spicy", "Tofu", "Salmon", "Quinoa", "Berry", "Protein"]
+
+
+def make_foods(n, rng):
+    foods = []
+    for i in range(1, n + 1):
+        foods.append({
+            "id": f"food_{i:03d}",
+            "name": " ".join(rng.sample(WORDS, 2)) + " " + rng.choice(CATEGORIES).title(),
+            "category": rng.choice(CATEGORIES),
+            "kcal": rng.randint(120, 800),
+            "macros": {
+                "protein_g": float(rng.randint(2, 50)),
+                "carbs_g": float(rng.randint(5, 90)),
+                "fat_g": float(rng.randint(1, 40))
+            },
+            "tags": rng.sample(["protein", "vegan", "vegetarian", "spicy", "fresh", "asian", "healthy"], 2)
+        })
+    return foods
+
+
+def make_case(rng):
+    return {
+        "user_prefs": {
+            "diet_style": rng.choice(["omnivore", "vegetarian", "vegan", "keto"]),
+            "dislikes": rng.sample(["mushrooms", "olives", "tofu", "spicy"], rng.randint(0, 2)),
+            "budget": rng.choice(["$", "$$", "$$$"]),
+            "home_area": rng.choice(["downtown", "campus"])
+        },
+        "health": {
+            "sleep_hours": rng.choice([5.5, 7.0, 8.0]),
+            "activity_level": rng.choice(["none", "light", "moderate", "intense"]),
+            "mood": rng.choice(["low", "normal", "high"])
+        },
+        "profile": {"age": rng.randint(18, 70), "weight": rng.randint(50, 110), "height": rng.randint(150, 200), "goals": "maintain"},
+        "goals": {"calories": 2000, "protein_g": 120.0, "carbs_g": 250.0, "fat_g": 67.0},
+        "foods": make_foods(rng.randint(20, 60), rng),
+        "trends": {"trends": ["increasing protein"], "concerns": ["low fiber"], "strengths": ["consistent timing"]},
+    }
+
+
+# Legacy templates, reproduced verbatim from the pre-builder code paths
+
+def legacy_recommendations(c):
+    foods_summary = [f"{f['id']}: {f['name']} ({f['kcal']}kcal, {f['macros']['protein_g']}g protein)" for f in c["foods"][:20]]
+    nl = "\n"
+    return f"""
+        Recommend 5 foods based on:
+
+        User: {c['user_prefs'].get('diet_style', 'omnivore')} diet, budget {c['user_prefs'].get('budget', '$$')}, dislikes: {c['user_prefs'].get('dislikes', [])}
+        Health: {c['health'].get('sleep_hours', 8)}h sleep, {c['health'].get('activity_level', 'moderate')} activity, {c['health'].get('mood', 'normal')} mood
+
+        Available foods:
+        {nl.join(foods_summary)}
+
+        Return JSON: [{{"food_id": "food_001", "reason": "High protein for recovery", "score": 0.9}}]
+        """
+
+
+def legacy_daily_goals(c):
+    p, h = c["profile"], c["health"]
+    return f"""
+        Calculate daily nutrition goals for:
+        - Age: {p.get('age', 30)}
+        - Weight: {p.get('weight', 70)}kg
+        - Height: {p.get('height', 170)}cm
+        - Activity: {h.get('activity_level', 'moderate')}
+        - Sleep: {h.get('sleep_hours', 8)} hours
+        - Goals: {p.get('goals', 'maintain')}
+
+        Return JSON: {{
+            "calories": 2000,
+            "protein_g": 150,
+            "carbs_g": 250,
+            "fat_g": 67,
+            "fiber_g": 25,
+            "reasoning": "Based on moderate activity and maintenance goals"
+        }}
+        """
+
+
+def legacy_meal_analysis(c):
+    meal_totals = nutrition_engine._calculate_meal_totals(c["foods"][:3])
+    return f"""
+        Analyze this lunch meal balance:
+
+        Meal totals: {meal_totals}
+        Daily goals: {c['goals']}
+
+        Consider:
+        - Macronutrient ratios
+        - Meal timing appropriateness
+        - Satiety factors
+        - Nutrient density
+
+        Return JSON: {{
+            "balance_score": 0.8,
+            "strengths": ["good protein", "adequate calories"],
+            "weaknesses": ["low fiber", "high sodium"],
+            "suggestions": ["add vegetables", "choose whole grains"],
+            "next_meal_focus": "fiber and micronutrients"
+        }}
+        """
+
+
+def legacy_meal_plan(c):
+    u, h = c["user_prefs"], c["health"]
+    return f"""
+        Create a 3-day meal plan:
+
+        User: {u.get('diet_style', 'omnivore')}, budget {u.get('budget', '$$')}
+        Health: {h.get('activity_level', 'moderate')} activity, {h.get('sleep_hours', 8)}h sleep
+        Available foods: {[f"{f['name']} ({f['kcal']}kcal)" for f in c['foods'][:15]]}
+
+        Return JSON: {{
+            "day_1": {{
+                "breakfast": {{"food_id": "food_001", "reason": "High protein start"}},
+                "lunch": {{"food_id": "food_002", "reason": "Balanced nutrition"}},
+                "dinner": {{"food_id": "food_003", "reason": "Light and healthy"}}
+            }},
+            "day_2": {{...}},
+            "day_3": {{...}},
+            "shopping_list": ["ingredient1", "ingredient2"],
+            "total_weekly_cost": "$45"
+        }}
+        """
+
+
+def new_meal_plan(c):
+    # Planning is local now; the only prompt left narrates the finished plan
+    catalog = compile_catalog(c["foods"])
+    plan = plan_meals(catalog, c["user_prefs"], c["health"], 3)
+    return prompt_builder.meal_plan_narration(c["user_prefs"], c["health"], plan, dict(zip(catalog.ids, catalog.names)))
+
+
+def legacy_trends(c):
+    logs = [{"date": f"2024-01-0{i % 7 + 1}", "food": f} for i, f in enumerate(c["foods"][:14])]
+    period_totals = nutrition_engine._calculate_period_totals(logs)
+    return f"""
+        Analyze nutrition trends over the past week:
+
+        Totals: {period_totals}
+
+        Look for:
+        - Consistent patterns
+        - Nutrient deficiencies
+        - Overconsumption areas
+        - Meal timing patterns
+        - Variety in food choices
+
+        Return JSON: {{
+            "trends": ["increasing protein", "decreasing variety"],
+            "concerns": ["low fiber intake", "high sodium"],
+            "strengths": ["consistent meal timing", "good protein"],
+            "recommendations": ["add more vegetables", "reduce processed foods"],
+            "score": 0.7
+        }}
+        """
+
+
+def legacy_smart_recommendations(c):
+    t = c["trends"]
+    return f"""
+        Recommend 5 foods considering:
+
+        User: {c['user_prefs']}
+        Health: {c['health']}
+        Recent trends: {t.get('trends', [])}
+        Concerns: {t.get('concerns', [])}
+        Strengths: {t.get('strengths', [])}
+
+        Available foods: {[f"{f['name']} ({f['kcal']}kcal)" for f in c['foods'][:15]]}
+
+        Return JSON: [{{"food_id": "food_001", "reason": "Addresses low fiber concern", "score": 0.9}}]
+        """
+
+
+def new_trends(c):
+    logs = [{"date": f"2024-01-0{i % 7 + 1}", "food": f} for i, f in enumerate(c["foods"][:14])]
+    return prompt_builder.trends(nutrition_engine._calculate_period_totals(logs), "week")
+
+
+ENDPOINTS = {
+    "recommendations": (
+        legacy_recommendations,
+        lambda c: prompt_builder.recommendations(c["user_prefs"], c["health"], c["foods"], 5)
+    ),
+    "daily_goals": (legacy_daily_goals, lambda c: prompt_builder.daily_goals(c["profile"], c["health"])),
+    "meal_analysis": (
+        legacy_meal_analysis,
+        lambda c: prompt_builder.meal_analysis("lunch", nutrition_engine._calculate_meal_totals(c["foods"][:3]), c["goals"])
+    ),
+    "meal_plan": (legacy_meal_plan, new_meal_plan),
+    "trends": (legacy_trends, new_trends),
+    "smart_recommendations": (
+        legacy_smart_recommendations,
+        lambda c: prompt_builder.recommendations(c["user_prefs"], c["health"], c["foods"], 5, extra=c["trends"])
+    ),
+}
+
+
+def main():
+    rng = random.Random(42)
+    cases = [make_case(rng) for _ in range(50)]
+    system_tokens = estimate_tokens(prompt_builder.cost_tips().system)
+
+    print(f"{'endpoint':<24}{'before':>8}{'after':>8}{'user only':>11}{'change':>9}{'foods before/after':>20}")
+    print("-" * 80)
+    for endpoint, (legacy, compact) in ENDPOINTS.items():
+        before, after, foods_after = [], [], []
+        for case in cases:
+            before.append(estimate_tokens(LEGACY_SYSTEM) + estimate_tokens(legacy(case)))
+            prompt = compact(case)
+            after.append(prompt.tokens)
+            foods_after.append(len(prompt.id_map))
+        avg_before = sum(before) / len(before)
+        avg_after = sum(after) / len(after)
+        avg_user = avg_after - system_tokens
+        foods_before = {"recommendations": 20, "meal_plan": 15, "smart_recommendations": 15}.get(endpoint, 0)
+        print(
+            f"{endpoint:<24}{avg_before:>8.0f}{avg_after:>8.0f}{avg_user:>11.0f}"
+            f"{(avg_after - avg_before) / avg_before:>+9.0%}"
+            f"{foods_before:>12}/{sum(foods_after) / len(foods_after):.0f}"
+        )
+    print(f"\nShared system prefix: {system_tokens} tokens (identical on every call, cacheable by the provider)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Resilience benchmark: deadlines, circuit breaker and hedging against a fake provider
+
+Run from the backend directory:  python benchmarks/resilience_bench.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8099
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+os.environ.setdefault("AI_DEADLINE_RECOMMENDATIONS", "1.0")
+os.environ.setdefault("AI_BREAKER_FAILURE_THRESHOLD", "3")
+os.environ.setdefault("AI_BREAKER_RESET_SECONDS", "2")
+
+from benchmarks.fake_llm_server import start_in_background, settings  # noqa: E402
+from services.ai_service import AIService  # noqa: E402
+
+FOODS = [
+    {"id": f"food_{i:03d}", "name": f"Food {i}", "kcal": 300 + i, "macros": {"protein_g": 20, "carbs_g": 30, "fat_g": 10}}
+    for i in range(1, 21)
+]
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+async def timed_calls(service: AIService, n: int):
+    latencies = []
+    for _ in range(n):
+        started = time.perf_counter()
+        await service.get_food_recommendations({}, {}, FOODS, 3)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(f"  {label:<38} p50={statistics.median(ordered):8.1f}ms  p95={p95:8.1f}ms  max={ordered[-1]:8.1f}ms")
+
+
+async def main():
+    start_in_background(PORT)
+    service = AIService()
+
+    print_section("Healthy provider (100ms)")
+    settings.update(latency_ms=100, jitter_ms=0, error_rate=0)
+    report("healthy", await timed_calls(service, 10))
+
+    print_section("Provider hangs (5s > 1s deadline)")
+    settings.update(latency_ms=5000)
+    latencies = await timed_calls(service, 10)
+    report("first 3 calls (deadline)", latencies[:3])
+    report("next 7 calls (circuit open)", latencies[3:])
+    print(f"  circuit: {service.guard.breaker.snapshot()}")
+
+    print_section("Recovery via half-open probe")
+    settings.update(latency_ms=100)
+    await asyncio.sleep(2.1)
+    report("after reset timeout", await timed_calls(service, 5))
+    print(f"  circuit: {service.guard.breaker.snapshot()}")
+
+    print_section("Tail latency with and without hedging (100ms, 4% of calls +2s)")
+    settings.update(latency_ms=100, jitter_ms=20, tail_rate=0.04, tail_ms=2000)
+    os.environ["AI_DEADLINE_RECOMMENDATIONS"] = "5.0"
+    for hedge in (False, True):
+        service = AIService()
+        service.guard.hedge_enabled = hedge
+        await timed_calls(service, 30)  # warm the latency window
+        report(f"hedging={'on' if hedge else 'off'}", await timed_calls(service, 100))
+        print(f"  hedges fired: {service.guard.hedges_fired}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
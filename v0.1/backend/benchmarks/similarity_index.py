@@ -0,0 +1,79 @@
+"""
+Similarity index benchmark: build and "more like this" query latency from 10k to 1M foods,
+and LSH recall against exact cosine search
+
+Run from the backend directory:  python benchmarks/similarity_index.py
+"""
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+from services.similarity import SimilarityIndex, cosine  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+QUERIES = 500
+K = 10
+CATEGORIES = ["bowl", "wrap", "salad", "snack", "drink"]
+TAGS = [f"tag{i}" for i in range(40)]
+CHAINS = [f"chain{i}" for i in range(20)]
+
+
+def synthetic_foods(size, seed=11):
+    rng = random.Random(seed)
+    for i in range(size):
+        yield {
+            "id": f"food_{i:07d}",
+            "name": f"Food {i}",
+            "category": rng.choice(CATEGORIES),
+            "tags": rng.sample(TAGS, rng.choice((2, 3))),
+            "chains": [rng.choice(CHAINS)],
+        }
+
+
+def exact_top(index, food_id, k):
+    vector = index.vectors[index.vector_of[food_id]]
+    scores = sorted((cosine(vector, other) for other in index.vectors), reverse=True)
+    return scores[1:k + 1] if len(index.members[index.vector_of[food_id]]) == 1 else scores[:k]
+
+
+def main():
+    rng = random.Random(3)
+    for size in SIZES:
+        print_section(f"{size:,} foods")
+        start = time.perf_counter()
+        index = SimilarityIndex(synthetic_foods(size))
+        stats = index.snapshot()
+        print(f"  build: {time.perf_counter() - start:.1f}s, {stats['distinct_vectors']:,} distinct vectors, mode {stats['mode']}")
+        print(f"  peak RSS so far: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        ids = list(index.vector_of)
+        timings = []
+        for _ in range(QUERIES):
+            food_id = rng.choice(ids)
+            start = time.perf_counter()
+            index.similar(food_id, K)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"  top-{K}: p50 {statistics.median(timings):.2f}ms  p99 {timings[int(len(timings) * 0.99)]:.2f}ms")
+
+        # Recall: share of the exact top-k similarity scores the index returned
+        if size <= 100_000:
+            hits = total = 0
+            for _ in range(50):
+                food_id = rng.choice(ids)
+                got = sorted((item["similarity"] for item in index.similar(food_id, K)), reverse=True)
+                want = [round(score, 3) for score in exact_top(index, food_id, K)]
+                hits += sum(1 for a, b in zip(got, want) if a >= b)
+                total += len(want)
+            print(f"  recall@{K} vs exact cosine: {hits / total:.0%}")
+        del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Smart recommendations benchmark: sequential trends + recommendation calls vs the local fan-out pipeline
+
+The fake provider has a fixed latency, so the gain comes from removing a round trip.
+Run from the backend directory:  python benchmarks/smart_recommendations_latency.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from contextlib import aclosing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8099
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{PORT}/v1")
+
+from benchmarks.fake_llm_server import start_in_background, stats  # noqa: E402
+from services.nutrition_engine import nutrition_engine  # noqa: E402
+from services.prompt_builder import prompt_builder  # noqa: E402
+
+LATENCY_MS = 400
+RUNS = 15
+FOODS = [
+    {
+        "id": f"food_{i:03d}", "name": f"Food {i}", "category": "bowl", "tags": ["protein"] if i % 2 else ["vegan"],
+        "macros": {"protein_g": 10.0 + i, "carbs_g": 30.0, "fat_g": 10.0}, "kcal": 300 + i * 5
+    }
+    for i in range(1, 41)
+]
+LOGS = [
+    {"date": f"2024-01-0{day}", "food": FOODS[(day * 3 + meal) % 10]}
+    for day in range(1, 8) for meal in range(3)
+]
+PREFS = {"diet_style": "omnivore", "dislikes": [], "budget": "$$"}
+HEALTH = {"sleep_hours": 7.0, "activity_level": "moderate", "mood": "normal"}
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+async def sequential(limit=5):
+    """The previous pipeline: LLM trend analysis, then the recommendation call"""
+    trends = await nutrition_engine.analyze_nutrition_trends(LOGS, "week")
+    prompt = prompt_builder.recommendations(PREFS, HEALTH, FOODS, limit, extra={
+        "trends": trends.get("trends", []), "concerns": trends.get("concerns", []), "strengths": trends.get("strengths", [])
+    })
+    async with aclosing(nutrition_engine.ai_service.stream_recommendations(
+        prompt, FOODS, limit, endpoint="smart_recommendations"
+    )) as stream:
+        return [item async for item in stream]
+
+
+async def fan_out(limit=5):
+    async with aclosing(nutrition_engine.stream_smart_recommendations(PREFS, HEALTH, LOGS, FOODS, limit)) as stream:
+        return [data async for event, data in stream if event == "recommendation"]
+
+
+async def measure(pipeline):
+    requests_before = stats["requests"]
+    latencies = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        await pipeline()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies), (stats["requests"] - requests_before) / RUNS
+
+
+async def main():
+    start_in_background(PORT, latency_ms=LATENCY_MS)
+    await fan_out()  # warm the connection pool
+
+    print_section(f"Smart recommendations, provider latency {LATENCY_MS}ms, {len(LOGS)} logs")
+    before_p50, before_calls = await measure(sequential)
+    after_p50, after_calls = await measure(fan_out)
+    print(f"  sequential  p50={before_p50:7.1f}ms  provider calls/request={before_calls:.1f}")
+    print(f"  fan-out     p50={after_p50:7.1f}ms  provider calls/request={after_calls:.1f}")
+    print(f"  speedup: {before_p50 / after_p50:.2f}x")
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        trends = nutrition_engine._local_trend_signals(LOGS)
+    print(f"  local trend signals: {(time.perf_counter() - started):.3f}ms/call -> {trends['concerns']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
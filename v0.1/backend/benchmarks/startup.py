@@ -0,0 +1,75 @@
+"""
+Startup benchmark: time from launching uvicorn to the first healthy response (GET /health),
+on a new database and restarting on an existing one, next to the import time of main alone;
+with --budget-seconds it exits non-zero when the median first start is over budget, so the
+number can be tracked in CI
+
+Each run is a fresh uvicorn subprocess; /health is polled every POLL_SECONDS.
+
+Run from the backend directory:  python benchmarks/startup.py [--budget-seconds 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+from benchmarks.live_connections import BACKEND, free_port  # noqa: E402
+from benchmarks.import_report import import_seconds  # noqa: E402
+
+RUNS = 5
+POLL_SECONDS = 0.01
+TIMEOUT_SECONDS = 60
+
+
+def time_to_healthy(workdir):
+    """Seconds from spawning the server until /health answers 200"""
+    port = free_port()
+    env = {**os.environ, "TIMESERIES_DIR": os.path.join(workdir, "timeseries"), "CPU_POOL_WORKERS": "0"}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND, "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < TIMEOUT_SECONDS:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health") as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(POLL_SECONDS)
+        raise RuntimeError("server did not become healthy")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first healthy response")
+    parser.add_argument("--budget-seconds", type=float, default=None, help="fail when the median first start is slower")
+    args = parser.parse_args()
+
+    print_section(f"Startup, median of {RUNS} runs")
+    imports = statistics.median(import_seconds() for _ in range(RUNS))
+    print(f"  import main:                     {imports * 1000:8.0f}ms")
+
+    workdirs = [tempfile.mkdtemp() for _ in range(RUNS)]
+    first = statistics.median(time_to_healthy(workdir) for workdir in workdirs)
+    print(f"  first healthy response, new db:  {first * 1000:8.0f}ms")
+    restart = statistics.median(time_to_healthy(workdir) for workdir in workdirs)
+    print(f"  first healthy response, restart: {restart * 1000:8.0f}ms")
+
+    if args.budget_seconds is not None and first > args.budget_seconds:
+        print(f"  over the {args.budget_seconds:.1f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
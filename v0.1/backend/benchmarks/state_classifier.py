@@ -0,0 +1,79 @@
+"""
+State classifier benchmark: three simulated days of watch data in one-minute batches, with a
+morning workout, an afternoon stress episode and a short night; prints the transitions and
+the per-sample cost, and how often the state would flap without hysteresis and dwell time
+
+Run from the backend directory:  python benchmarks/state_classifier.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+from services import state_classifier as classifier_module  # noqa: E402
+from services.state_classifier import StateClassifier  # noqa: E402
+from services.wearables import wearable_store  # noqa: E402
+
+DAYS = 3
+
+
+def minute_batches(start, seed=5):
+    """One batch per minute: 1 Hz HR, HRV every 5 minutes, steps per minute, sleep at wake-up"""
+    rng = random.Random(seed)
+    for minute in range(DAYS * 24 * 60):
+        t = start + minute * 60
+        day, hour = divmod(minute // 60, 24)
+        workout = day == DAYS - 1 and 7 <= hour < 8 and minute % 60 < 45
+        stress = day == DAYS - 1 and 14 <= hour < 15
+        borderline = day == DAYS - 2 and 10 <= hour < 13
+        asleep = hour < 7
+        base = 150 if workout else 55 if asleep else 68
+        batch = {"hr": [[t + s, base + rng.gauss(0, 3)] for s in range(60)]}
+        batch["steps"] = [[t + 59, rng.randrange(100, 160) if workout else 0 if asleep else rng.randrange(0, 40)]]
+        if minute % 5 == 0:
+            batch["hrv"] = [[t, max(5.0, rng.gauss(26 if stress else 37 if borderline else 50, 4))]]
+        if hour == 7 and minute % 60 == 0:
+            # Last night's sleep arrives at wake-up; the final night is short
+            batch["sleep"] = [[t, 300 if day == DAYS - 1 else 450]]
+        yield batch
+
+
+def main():
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=DAYS)
+    batches = list(minute_batches(start.timestamp()))
+    samples = sum(len(values) for batch in batches for values in batch.values())
+
+    settings = (
+        ("with hysteresis", classifier_module.DWELL_SECONDS, classifier_module.STRESS_HRV_RATIO),
+        # Same enter and exit threshold, and the candidate state is taken as is
+        ("without hysteresis", 0.0, (classifier_module.STRESS_HRV_RATIO[0],) * 2),
+    )
+    for label, dwell, stress_ratio in settings:
+        classifier_module.DWELL_SECONDS = dwell
+        classifier_module.STRESS_HRV_RATIO = stress_ratio
+        wearable_store.users.clear()
+        classifier = StateClassifier()
+        transitions = []
+        began = time.perf_counter()
+        for batch in batches:
+            wearable_store.ingest(batch)
+            transition = classifier.update(batch)
+            if transition:
+                transitions.append(transition)
+        elapsed = time.perf_counter() - began
+
+        print_section(f"{label}: {samples:,} samples in {len(batches):,} batches")
+        print(f"  {elapsed / samples * 1e6:.2f}µs per sample (window ingest included), "
+              f"{len(transitions)} transitions, {classifier.stats['suppressed']} suppressed")
+        if label == settings[0][0]:
+            for transition in transitions:
+                at = datetime.fromtimestamp(transition["at"]).strftime("day %d %H:%M")
+                print(f"  {at}  {transition['from'] or '-':>12} -> {transition['to']:<12} {transition['signals']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+State table benchmark: offline ranking for every (state, area, diet) over a synthetic catalog,
+then single-row table reads vs ranking the catalog live, in a scratch database
+
+Run from the backend directory:  python benchmarks/state_table.py
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import CATALOG_SIZE, PROFILES, print_section, synthetic_catalog  # noqa: E402
+from db.database import catalog_version, get_db, init_db  # noqa: E402
+from services.state_table import USER_STATES, build_state_table, lookup_state_picks, rank_live, table_version  # noqa: E402
+
+AREAS = ["downtown", "campus", "suburbs", "gym", "airport", "harbor"]
+QUERIES = 2000
+
+
+def load_catalog(foods, rng):
+    with get_db() as db:
+        db.executemany(
+            "INSERT INTO foods VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    food["id"], food["name"], food["category"], json.dumps(food["tags"]),
+                    food["macros"]["protein_g"], food["macros"]["carbs_g"], food["macros"]["fat_g"],
+                    food["kcal"], json.dumps(food["areas"]), "[]", food["est_price_range"]
+                )
+                for food in foods
+            ]
+        )
+        db.commit()
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    # get_db() opens spark.db in the working directory
+    os.chdir(tempfile.mkdtemp())
+    init_db()
+    rng = random.Random(5)
+    foods = synthetic_catalog(CATALOG_SIZE)
+    for food in foods:
+        food["areas"] = rng.sample(AREAS, rng.randint(1, 3))
+    load_catalog(foods, rng)
+
+    print_section(f"Offline build over {CATALOG_SIZE:,} foods")
+    result = build_state_table()
+    print(f"  {result['rows_written']:,} rows in {result['seconds']:.1f}s")
+    result = build_state_table()
+    print(f"  re-run on an unchanged catalog: {result['rows_written']} rows in {result['seconds']:.2f}s")
+
+    with get_db() as db:
+        version = table_version(catalog_version(db))
+    served = [0]
+
+    def query(live):
+        user_prefs = rng.choice(PROFILES)[0]
+        state, area = rng.choice(USER_STATES), rng.choice(AREAS)
+        if live:
+            rank_live(foods, state, area, user_prefs["diet_style"], user_prefs, 3)
+        else:
+            picks = lookup_state_picks(state, area, user_prefs["diet_style"], version, user_prefs, 3)
+            served[0] += picks is not None
+
+    print_section(f"Top-3 for a state and area ({QUERIES} queries)")
+    p50, p99 = timed(lambda: query(False), QUERIES)
+    print(f"  table read     p50 {p50:.3f}ms  p99 {p99:.3f}ms  (answered {served[0] / QUERIES:.0%})")
+    p50, p99 = timed(lambda: query(True), 20)
+    print(f"  live ranking   p50 {p50:.1f}ms  p99 {p99:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Streaming benchmark: time to first byte of the SSE endpoints vs their blocking versions,
+and upstream tokens left unread when the client disconnects mid-stream
+
+Run from the backend directory:  python benchmarks/streaming_ttfb.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LLM_PORT = 8099
+APP_PORT = 8097
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{LLM_PORT}/v1")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from benchmarks.fake_llm_server import start_in_background, stats  # noqa: E402
+from main import app  # noqa: E402
+from services.ai_service import ai_service  # noqa: E402
+
+BASE_URL = f"http://127.0.0.1:{APP_PORT}/api/nutrition"
+FOODS = [
+    {
+        "id": f"food_{i:03d}", "name": f"Food {i}", "category": "bowl", "tags": ["protein"],
+        "macros": {"protein_g": 20.0, "carbs_g": 30.0, "fat_g": 10.0}, "kcal": 300 + i,
+        "availability": {"areas": ["campus"], "chains": ["Local"]}, "est_price_range": "$$"
+    }
+    for i in range(1, 16)
+]
+PREFS = {"diet_style": "omnivore", "dislikes": [], "budget": "$$", "home_area": "campus"}
+HEALTH = {"sleep_hours": 7.0, "activity_level": "moderate", "mood_energy": "normal"}
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f"⏱️  {title}")
+    print(f"{'='*60}")
+
+
+def start_app():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+
+def blocking(client, path, body):
+    started = time.perf_counter()
+    client.post(f"{BASE_URL}{path}", json=body).raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def streamed(client, path, body, first_event):
+    started = time.perf_counter()
+    first = None
+    with client.stream("POST", f"{BASE_URL}{path}", json=body) as response:
+        for line in response.iter_lines():
+            if line.startswith(f"event: {first_event}") and first is None:
+                first = (time.perf_counter() - started) * 1000
+    return first, (time.perf_counter() - started) * 1000
+
+
+def main():
+    # Run against a scratch database so the tracked one is left alone
+    os.chdir(tempfile.mkdtemp())
+    start_in_background(LLM_PORT, latency_ms=200, chunk_delay_ms=15)
+    start_app()
+
+    cases = {
+        # Days come from the local planner; only the closing narration waits on the provider
+        "/meal-plan/": ("day_", {"user_pref": PREFS, "health_context": HEALTH, "available_foods": FOODS}),
+        "/smart-recommendations/": ("recommendation", {
+            "user_pref": PREFS, "health_context": HEALTH, "available_foods": FOODS, "recent_logs": []
+        }),
+    }
+    with httpx.Client(timeout=60) as client:
+        for path, (first_event, body) in cases.items():
+            print_section(path)
+            query = "?narrate=true" if path == "/meal-plan/" else ""
+            full = [blocking(client, f"{path}{query}", body) for _ in range(5)]
+            runs = [streamed(client, f"{path}stream{query}", body, first_event) for _ in range(5)]
+            print(f"  blocking response      p50={statistics.median(full):7.1f}ms")
+            print(f"  stream first {first_event:<9} p50={statistics.median(r[0] for r in runs):7.1f}ms")
+            print(f"  stream complete        p50={statistics.median(r[1] for r in runs):7.1f}ms")
+
+        print_section("Client disconnect after the first recommendation")
+        smart = cases["/smart-recommendations/"][1]
+        tokens_before = ai_service.total_tokens_used
+        client.post(f"{BASE_URL}/smart-recommendations/?limit=10", json=smart).raise_for_status()
+        full_tokens = ai_service.total_tokens_used - tokens_before
+
+        tokens_before = ai_service.total_tokens_used
+        with client.stream("POST", f"{BASE_URL}/smart-recommendations/stream?limit=10", json=smart) as response:
+            for line in response.iter_lines():
+                if line.startswith("event: recommendation"):
+                    break
+        time.sleep(1.0)
+        partial_tokens = ai_service.total_tokens_used - tokens_before
+        print(f"  tokens for a full response:                  {full_tokens}")
+        print(f"  tokens when client left after the first one: {partial_tokens}")
+        print(f"  upstream requests made: {stats['requests']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Swap index benchmark: KD-tree top-k swap queries over a synthetic 50k-food catalog, checked
+against a brute-force scan, plus the cost of incremental catalog edits
+
+Run from the backend directory:  python benchmarks/swap_index.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import CATALOG_SIZE, PROFILES, print_section, synthetic_catalog  # noqa: E402
+from services.macro_index import SWAP_GOALS, MacroIndex  # noqa: E402
+
+QUERIES = 2000
+K = 5
+
+
+def main():
+    foods = synthetic_catalog(CATALOG_SIZE)
+    rng = random.Random(3)
+
+    print_section(f"Build over {CATALOG_SIZE:,} foods")
+    start = time.perf_counter()
+    index = MacroIndex(foods)
+    print(f"  build: {time.perf_counter() - start:.2f}s")
+
+    print_section(f"Top-{K} queries ({QUERIES} per goal)")
+    for goal in SWAP_GOALS:
+        timings = []
+        for _ in range(QUERIES):
+            food = rng.choice(foods)
+            user_prefs = rng.choice(PROFILES)[0]
+            start = time.perf_counter()
+            index.swaps(food, user_prefs, goal, K)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"  {goal:<28} p50 {statistics.median(timings):.3f}ms  p99 {timings[int(len(timings) * 0.99)]:.3f}ms")
+
+    print_section("Correctness vs brute force (50 queries per goal)")
+    # A single leaf holding the whole catalog makes the tree search a linear scan
+    brute_force = MacroIndex(foods, leaf_size=CATALOG_SIZE)
+    mismatches = 0
+    for goal in SWAP_GOALS:
+        for _ in range(50):
+            food = rng.choice(foods)
+            user_prefs = rng.choice(PROFILES)[0]
+            got = [swap["food_id"] for swap in index.swaps(food, user_prefs, goal, K)]
+            mismatches += got != [swap["food_id"] for swap in brute_force.swaps(food, user_prefs, goal, K)]
+    print(f"  mismatched result lists: {mismatches}")
+
+    print_section("Incremental catalog edits")
+    edited = rng.sample(foods, 500)
+    start = time.perf_counter()
+    for food in edited[:200]:
+        index.upsert({**food, "kcal": int(food["kcal"] * 0.8)})
+    for food in edited[200:300]:
+        index.remove(food["id"])
+    elapsed = time.perf_counter() - start
+    print(f"  300 edits applied in {elapsed * 1000:.1f}ms ({elapsed / 300 * 1e6:.0f}µs each), rebuilds so far: {index.rebuilds}")
+
+    current = {food["id"]: food for food in foods}
+    for food in edited[:200]:
+        current[food["id"]] = {**food, "kcal": int(food["kcal"] * 0.8)}
+    for food in edited[200:300]:
+        del current[food["id"]]
+    fresh = MacroIndex(current.values(), leaf_size=CATALOG_SIZE)
+    mismatches = 0
+    for _ in range(100):
+        food = rng.choice(foods)
+        user_prefs = rng.choice(PROFILES)[0]
+        got = [swap["food_id"] for swap in index.swaps(food, user_prefs, "lower_kcal", K)]
+        mismatches += got != [swap["food_id"] for swap in fresh.swaps(food, user_prefs, "lower_kcal", K)]
+    print(f"  mismatches vs a fresh brute-force index: {mismatches}/100")
+
+    timings = []
+    for _ in range(QUERIES):
+        food = rng.choice(foods)
+        start = time.perf_counter()
+        index.swaps(food, PROFILES[0][0], "lower_kcal", K)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"  query with 300 pending edits: p50 {statistics.median(timings):.3f}ms")
+
+    start = time.perf_counter()
+    index.rebuild()
+    print(f"  full rebuild (folds edits into the trees): {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Swap table benchmark: offline build over a synthetic catalog, then table lookups vs live
+KD-tree queries, in a scratch database
+
+Run from the backend directory:  python benchmarks/swap_table.py
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from benchmarks.meal_planner import CATALOG_SIZE as LARGE_CATALOG_SIZE, PROFILES, print_section, synthetic_catalog  # noqa: E402
+from db.database import catalog_version, get_db, init_db  # noqa: E402
+from services.macro_index import SWAP_GOALS, MacroIndex  # noqa: E402
+from services.swap_table import build_swap_table, lookup_swaps  # noqa: E402
+
+CATALOG_SIZE = 5_000
+QUERIES = 2000
+K = 3
+
+
+def load_catalog(foods):
+    with get_db() as db:
+        db.executemany(
+            "INSERT INTO foods VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    food["id"], food["name"], food["category"], json.dumps(food["tags"]),
+                    food["macros"]["protein_g"], food["macros"]["carbs_g"], food["macros"]["fat_g"],
+                    food["kcal"], "[]", "[]", food["est_price_range"]
+                )
+                for food in foods
+            ]
+        )
+        db.commit()
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    # get_db() opens spark.db in the working directory
+    os.chdir(tempfile.mkdtemp())
+    init_db()
+    foods = synthetic_catalog(CATALOG_SIZE)
+    load_catalog(foods)
+    rng = random.Random(5)
+
+    print_section(f"Offline build over {CATALOG_SIZE:,} foods")
+    result = build_swap_table()
+    print(f"  {result['rows_written']:,} rows in {result['seconds']:.1f}s")
+    result = build_swap_table()
+    print(f"  re-run on an unchanged catalog: {result['rows_written']} rows in {result['seconds']:.2f}s")
+
+    with get_db() as db:
+        version = catalog_version(db)
+    index = MacroIndex(foods)
+    large_foods = synthetic_catalog(LARGE_CATALOG_SIZE)
+    large_index = MacroIndex(large_foods)
+
+    def in_diet(catalog, catalog_index, diet):
+        # Users swap foods they eat, so draw from the user's own diet
+        while True:
+            food = rng.choice(catalog)
+            if diet in catalog_index.items[food["id"]].diets:
+                return food
+
+    print_section(f"Top-{K} swaps ({QUERIES} queries)")
+    served = [0]
+
+    def table_query():
+        user_prefs = rng.choice(PROFILES)[0]
+        food = in_diet(foods, index, user_prefs["diet_style"])
+        goal = rng.choice(SWAP_GOALS)
+        served[0] += lookup_swaps(food["id"], user_prefs["diet_style"], goal, version, user_prefs, K) is not None
+
+    def live_query(catalog, catalog_index):
+        user_prefs = rng.choice(PROFILES)[0]
+        food = in_diet(catalog, catalog_index, user_prefs["diet_style"])
+        catalog_index.swaps(food, user_prefs, rng.choice(SWAP_GOALS), K)
+
+    p50, p99 = timed(table_query, QUERIES)
+    print(f"  table lookup               p50 {p50:.3f}ms  p99 {p99:.3f}ms  (answered {served[0] / QUERIES:.0%}, rest fall back)")
+    p50, p99 = timed(lambda: live_query(foods, index), QUERIES)
+    print(f"  live KD-tree, {CATALOG_SIZE:>6,} foods  p50 {p50:.3f}ms  p99 {p99:.3f}ms")
+    p50, p99 = timed(lambda: live_query(large_foods, large_index), QUERIES)
+    print(f"  live KD-tree, {LARGE_CATALOG_SIZE:>6,} foods  p50 {p50:.3f}ms  p99 {p99:.3f}ms")
+
+    mismatches = 0
+    for _ in range(200):
+        food = rng.choice(foods)
+        user_prefs = rng.choice(PROFILES)[0]
+        goal = rng.choice(SWAP_GOALS)
+        cached = lookup_swaps(food["id"], user_prefs["diet_style"], goal, version, user_prefs, K)
+        if cached is not None:
+            mismatches += [swap["food_id"] for swap in cached] != \
+                [swap["food_id"] for swap in index.swaps(food, user_prefs, goal, K)]
+    print(f"  table vs live mismatches: {mismatches}/200")
+
+
+if __name__ == "__main__":
+    main()
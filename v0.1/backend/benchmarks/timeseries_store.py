@@ -0,0 +1,95 @@
+"""
+Time-series store benchmark: a year of 1 Hz heart rate written in hourly chunks to a scratch
+directory, then bytes per sample and range / downsampling query latency
+
+Run from the backend directory:  python benchmarks/timeseries_store.py
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+from services.timeseries import TimeSeriesStore  # noqa: E402
+
+DAYS = 365
+RUNS = 20
+
+
+def heart_rate_hours(start, seed=5):
+    """One hour of integer bpm readings at a time: a random walk around a daily rhythm,
+    with timing jitter and the watch off the wrist for part of most days"""
+    rng = random.Random(seed)
+    bpm = 70.0
+    for hour in range(DAYS * 24):
+        base = start + hour * 3600
+        if hour % 24 in (3, 4) and rng.random() < 0.7:
+            continue  # charging
+        target = 58 if hour % 24 < 7 else 75
+        times, values = [], []
+        for second in range(3600):
+            bpm += (target - bpm) * 0.01 + rng.gauss(0, 0.8)
+            if rng.random() < 0.002:
+                bpm += rng.choice((25, -15))  # stairs, sitting down
+            jitter = rng.randrange(-20, 21) if rng.random() < 0.05 else 0
+            times.append(base + second + jitter / 1000)
+            values.append(round(bpm))
+        yield times, values
+
+
+def timed(fn, runs=RUNS):
+    timings = []
+    for _ in range(runs):
+        begin = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - begin) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[-1]
+
+
+def main():
+    store = TimeSeriesStore(tempfile.mkdtemp(), retention_days=DAYS)
+    end = time.time() // 3600 * 3600
+    start = end - DAYS * 86400
+    series = store.get("hr")
+
+    print_section(f"Write a year of 1 Hz heart rate ({DAYS} days)")
+    samples = 0
+    began = time.perf_counter()
+    for times, values in heart_rate_hours(start):
+        for timestamp, value in zip(times, values):
+            series.append(int(timestamp * 1000), value)
+        samples += len(times)
+    store.flush()
+    elapsed = time.perf_counter() - began
+    size = series.disk_bytes()
+    print(f"  {samples:,} samples in {elapsed:.0f}s (generation included), {len(series.records):,} chunks")
+    print(f"  {size / 1e6:.1f} MB on disk: {size / samples:.3f} bytes/sample "
+          f"(raw 16 bytes/sample, one SQLite row ~30+ bytes)")
+
+    print_section(f"Queries (median / worst of {RUNS})")
+    queries = (
+        ("raw, last hour", lambda: series.read(int((end - 3600) * 1000), int(end * 1000))),
+        ("raw, last day", lambda: series.read(int((end - 86400) * 1000), int(end * 1000))),
+        ("1-min buckets, last day", lambda: series.downsample(int((end - 86400) * 1000), int(end * 1000), 60_000)),
+        ("1-hour buckets, last 30 days", lambda: series.downsample(int((end - 30 * 86400) * 1000), int(end * 1000), 3_600_000)),
+        ("1-day buckets, whole year", lambda: series.downsample(int(start * 1000), int(end * 1000), 86_400_000)),
+    )
+    for label, query in queries:
+        median, worst = timed(query)
+        print(f"  {label:<30} {median:8.2f}ms  {worst:8.2f}ms  ({len(query()):,} points)")
+
+    print_section("Retention")
+    store.retention_days = DAYS - 30
+    began = time.perf_counter()
+    dropped = store.apply_retention(time.time())
+    print(f"  dropped {dropped:,} chunks older than {store.retention_days} days in {(time.perf_counter() - began) * 1000:.0f}ms, "
+          f"{series.disk_bytes() / 1e6:.1f} MB left")
+
+
+if __name__ == "__main__":
+    main()
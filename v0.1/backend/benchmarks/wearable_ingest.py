@@ -0,0 +1,72 @@
+"""
+Wearable ingestion benchmark: a day of 1 Hz heart rate plus HRV, steps and sleep, sent in
+watch-sized batches; times request parsing, ingestion and HealthContext derivation
+
+Run from the backend directory:  python benchmarks/wearable_ingest.py
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import print_section  # noqa: E402
+from models.wearable import SampleBatch  # noqa: E402
+from services.wearables import WearableStore  # noqa: E402
+
+SECONDS = 24 * 60 * 60
+BATCH_SECONDS = 60  # the watch uploads once a minute
+QUERIES = 10_000
+
+
+def synthetic_batches(start, seed=5):
+    """JSON bodies with one minute of samples each"""
+    rng = random.Random(seed)
+    for offset in range(0, SECONDS, BATCH_SECONDS):
+        t = start + offset
+        batch = {
+            "hr": [[t + i, round(rng.gauss(75, 12), 1)] for i in range(BATCH_SECONDS)],
+            "steps": [[t + BATCH_SECONDS - 1, rng.randrange(120)]],
+        }
+        if offset % 300 == 0:
+            batch["hrv"] = [[t, round(rng.gauss(45, 10), 1)]]
+        if offset % 1800 == 0:
+            batch["sleep"] = [[t, rng.choice((0, 0, 0, 30))]]
+        yield json.dumps(batch)
+
+
+def main():
+    store = WearableStore()
+    start = time.time() - SECONDS
+    bodies = list(synthetic_batches(start))
+    samples = sum(sum(len(values) for values in json.loads(body).values()) for body in bodies)
+
+    print_section(f"Ingest {samples:,} samples in {len(bodies):,} batches")
+    started = time.perf_counter()
+    batches = [SampleBatch.model_validate_json(body) for body in bodies]
+    parsed = time.perf_counter() - started
+    started = time.perf_counter()
+    for batch in batches:
+        store.ingest({"hr": batch.hr, "hrv": batch.hrv, "steps": batch.steps, "sleep": batch.sleep})
+    ingested = time.perf_counter() - started
+    print(f"  parse  {samples / parsed:>12,.0f} samples/s")
+    print(f"  ingest {samples / ingested:>12,.0f} samples/s")
+    print(f"  both   {samples / (parsed + ingested):>12,.0f} samples/s")
+
+    print_section(f"HealthContext derivation ({QUERIES:,} queries)")
+    timings = []
+    for _ in range(QUERIES):
+        begin = time.perf_counter()
+        store.health_context()
+        timings.append((time.perf_counter() - begin) * 1e6)
+    timings.sort()
+    print(f"  p50 {statistics.median(timings):.1f}µs  p99 {timings[int(len(timings) * 0.99)]:.1f}µs")
+    print(f"  {store.health_context()}")
+    print(f"  {store.window_stats()['hr']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Wire format benchmark: the 50k-food catalog and a 5-food recommendation as JSON (the current
+nested response) vs MessagePack and CBOR records, with and without the string table;
+prints payload size raw and gzipped, and encode / decode time
+
+Run from the backend directory:  python benchmarks/wire_format.py
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.meal_planner import CATALOG_SIZE, print_section, synthetic_catalog  # noqa: E402
+from benchmarks.state_table import AREAS  # noqa: E402
+from api.wire import (  # noqa: E402
+    CBOR_MEDIA_TYPE, DECODERS, ENCODERS, FOOD_FIELDS, FOOD_STRING_LISTS, MSGPACK_MEDIA_TYPE,
+    decode_records, encode_records, food_record
+)
+
+CHAINS = ["Chipotle", "Panda Express", "Sweetgreen", "Subway", "Local Asian", "Local Mediterranean", "Starbucks"]
+RUNS = 5
+
+
+def db_rows(foods, rng):
+    """The catalog as foods-table rows, lists still JSON strings"""
+    return [
+        {
+            "id": food["id"], "name": food["name"], "category": food["category"], "tags": json.dumps(food["tags"]),
+            **food["macros"], "kcal": food["kcal"],
+            "areas": json.dumps(rng.sample(AREAS, rng.randint(1, 3))),
+            "chains": json.dumps(rng.sample(CHAINS, rng.randint(1, 2))),
+            "est_price_range": food["est_price_range"]
+        }
+        for food in foods
+    ]
+
+
+def json_food(row):
+    """The shape GET /api/foods/ returns today"""
+    return {
+        "id": row["id"], "name": row["name"], "category": row["category"], "tags": json.loads(row["tags"]),
+        "macros": {"protein_g": row["protein_g"], "carbs_g": row["carbs_g"], "fat_g": row["fat_g"]},
+        "kcal": row["kcal"],
+        "availability": {"areas": json.loads(row["areas"]), "chains": json.loads(row["chains"])},
+        "est_price_range": row["est_price_range"]
+    }
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def compare(rows):
+    json_ms, body = best_of(lambda: json.dumps([json_food(row) for row in rows]).encode())
+    json_decode_ms, _ = best_of(lambda: json.loads(body))
+    # decode = parse into one dict per food; unpack = parse only, reading the rows positionally
+    print(f"  {'format':<22}{'bytes':>12}{'gzipped':>12}{'encode':>11}{'decode':>11}{'unpack':>11}")
+    print(f"  {'JSON':<22}{len(body):>12,}{len(gzip.compress(body)):>12,}{json_ms:>9.1f}ms{json_decode_ms:>9.1f}ms")
+    for media_type in (MSGPACK_MEDIA_TYPE, CBOR_MEDIA_TYPE):
+        if media_type not in ENCODERS:
+            print(f"  {media_type}: codec not installed")
+            continue
+        for dict_strings in (False, True):
+            encode, decode = ENCODERS[media_type], DECODERS[media_type]
+            encode_ms, payload = best_of(lambda: encode(encode_records(
+                FOOD_FIELDS, (food_record(row) for row in rows), dict_strings, FOOD_STRING_LISTS
+            )))
+            decode_ms, records = best_of(lambda: decode_records(decode(payload)))
+            unpack_ms, _ = best_of(lambda: decode(payload))
+            assert records[0]["tags"] == json.loads(rows[0]["tags"])
+            label = media_type.split("/")[1] + (" + strings" if dict_strings else "")
+            print(f"  {label:<22}{len(payload):>12,}{len(gzip.compress(payload)):>12,}{encode_ms:>9.1f}ms{decode_ms:>9.1f}ms{unpack_ms:>9.1f}ms")
+
+
+def main():
+    rng = random.Random(5)
+    rows = db_rows(synthetic_catalog(CATALOG_SIZE), rng)
+
+    print_section(f"Full catalog, {CATALOG_SIZE:,} foods (best of {RUNS})")
+    compare(rows)
+
+    print_section("Five recommended foods")
+    compare(rows[:5])
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,15 @@ def get_db() -> Generator[sqlite3.Connection, None, None]:
     finally:
         conn.close()
 
+def journal_version(conn: sqlite3.Connection) -> int:
+    """Latest catalog change number; the food_changes triggers bump it on every insert, update and delete."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'food_changes'").fetchone()
+    return row[0] if row else 0
+
+def catalog_version(conn: sqlite3.Connection) -> str:
+    """Version of the foods table, as the string the precomputed tables and caches are keyed by."""
+    return str(journal_version(conn))
+
 def init_db():
     """Initialize database tables."""
     with get_db() as conn:
@@ -61,4 +70,91 @@ def init_db():
             )
         """)
         
+        # Create jobs table (background AI work, survives restarts)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,  -- JSON string
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after REAL NOT NULL,  -- epoch seconds
+                result TEXT,  -- JSON string
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                expires_at REAL  -- epoch seconds, set once finished
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_runnable ON jobs (status, run_after)")
+        
+        # Create food_swaps table (precomputed swap suggestions, one row per food, diet and goal)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS food_swaps (
+                food_id TEXT NOT NULL,
+                diet_style TEXT NOT NULL,
+                goal TEXT NOT NULL,
+                catalog_version TEXT NOT NULL,
+                swaps TEXT NOT NULL,  -- JSON string
+                PRIMARY KEY (food_id, diet_style, goal)
+            ) WITHOUT ROWID
+        """)
+        
+        # Create state_recommendations table (precomputed top picks per wearable state)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS state_recommendations (
+                user_state TEXT NOT NULL,
+                area TEXT NOT NULL,
+                diet_style TEXT NOT NULL,
+                version TEXT NOT NULL,
+                foods TEXT NOT NULL,  -- JSON string
+                PRIMARY KEY (user_state, area, diet_style)
+            ) WITHOUT ROWID
+        """)
+        
+        # Create preference_vectors table (learned per-user preference weights)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS preference_vectors (
+                user_id INTEGER PRIMARY KEY,
+                vector TEXT NOT NULL,  -- JSON string
+                updated_at TEXT NOT NULL
+            )
+        """)
+        
+        # Create food_changes table (catalog change journal; triggers record every write to foods,
+        # whoever makes it, and AUTOINCREMENT keeps versions increasing across compactions)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS food_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                food_id TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_food_changes_food ON food_changes (food_id, version)")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS food_changes_insert AFTER INSERT ON foods
+            BEGIN INSERT INTO food_changes (food_id) VALUES (NEW.id); END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS food_changes_update AFTER UPDATE ON foods
+            BEGIN INSERT INTO food_changes (food_id) VALUES (NEW.id); END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS food_changes_delete AFTER DELETE ON foods
+            BEGIN INSERT INTO food_changes (food_id, deleted) VALUES (OLD.id, 1); END
+        """)
+        
+        # Create catalog_snapshots table (full catalog as of a version; journal entries up to
+        # floor were compacted away, so clients older than that start from the snapshot)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_snapshots (
+                version INTEGER PRIMARY KEY,
+                floor INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                foods TEXT NOT NULL  -- JSON string
+            )
+        """)
+        
         conn.commit()
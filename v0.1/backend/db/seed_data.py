@@ -2,6 +2,16 @@ import json
 from .database import get_db
 from models.food import Food, FoodCategory, PriceRange, Macros, Availability
 
+SEED_COLUMNS = ("name", "category", "tags", "protein_g", "carbs_g", "fat_g", "kcal", "areas", "chains", "est_price_range")
+# Only rows that differ are written, so a restart does not show up in the catalog change journal
+UPSERT_CHANGED_FOOD = f"""
+    INSERT INTO foods (id, {', '.join(SEED_COLUMNS)})
+    VALUES ({', '.join('?' * (len(SEED_COLUMNS) + 1))})
+    ON CONFLICT (id) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in SEED_COLUMNS)}
+    WHERE ({', '.join(f'foods.{column}' for column in SEED_COLUMNS)})
+        IS NOT ({', '.join(f'excluded.{column}' for column in SEED_COLUMNS)})
+"""
+
 def seed_foods():
     """Seed the database with initial food data."""
     foods_data = [
@@ -62,11 +72,7 @@ def seed_foods():
         
         for food_data in foods_data:
             food = Food(**food_data)
-            cursor.execute("""
-                INSERT OR REPLACE INTO foods 
-                (id, name, category, tags, protein_g, carbs_g, fat_g, kcal, areas, chains, est_price_range)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            cursor.execute(UPSERT_CHANGED_FOOD, (
                 food.id,
                 food.name,
                 food.category,
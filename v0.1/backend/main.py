@@ -1,20 +1,49 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import uvicorn
+from dotenv import load_dotenv
+import logging
+
+# Set up by the entry point, before any service module reads its settings
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
 
 from db import init_db, seed_foods
-from api import food_router, user_router, log_router
+from api import food_router, user_router, log_router, jobs_router, wearables_router, live_router, home_router
 from api.nutrition import nutrition_router
+from services.prewarm import prewarmer
+from services.job_queue import job_queue
+from services.cpu_pool import cpu_pool
+from services.nutrition_engine import nutrition_engine
+from services.cooccurrence import cooccurrence
+from services.preferences import preference_store
+from services.timeseries import timeseries_store
+from services.live_updates import live_hub
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
     seed_foods()
+    cooccurrence.load()
+    preference_store.load()
+    timeseries_store.start()
+    cpu_pool.start()
+    prewarmer.start()
+    job_queue.start()
+    nutrition_engine.refresh_swap_table()
+    nutrition_engine.refresh_state_table()
+    job_queue.enqueue("catalog_compaction", {})
+    live_hub.start()
     yield
     # Shutdown
-    pass
+    await live_hub.stop()
+    await job_queue.stop()
+    await prewarmer.stop()
+    await cpu_pool.stop()
+    await timeseries_store.stop()
+    preference_store.flush()
+    timeseries_store.flush()
 
 app = FastAPI(
     title="Spark Food API",
@@ -37,6 +66,10 @@ app.include_router(food_router, prefix="/api/foods", tags=["foods"])
 app.include_router(user_router, prefix="/api/users", tags=["users"])
 app.include_router(log_router, prefix="/api/logs", tags=["logs"])
 app.include_router(nutrition_router, prefix="/api/nutrition", tags=["nutrition"])
+app.include_router(jobs_router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(wearables_router, prefix="/api/wearables", tags=["wearables"])
+app.include_router(live_router, prefix="/api/live", tags=["live"])
+app.include_router(home_router, prefix="/api/home", tags=["home"])
 
 @app.get("/")
 async def root():
@@ -47,4 +80,6 @@ async def health_check():
     return {"status": "healthy"}
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    import uvicorn
+    # Live messages are small; per-message deflate would cost ~100 KB of zlib state per websocket
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, ws_per_message_deflate=False)
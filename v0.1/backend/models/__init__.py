@@ -2,5 +2,7 @@ from .food import Food
 from .user_pref import UserPref
 from .log import Log
 from .health_context import HealthContext
+from .wearable import SampleBatch
+from .home import HomeScreen
 
-__all__ = ["Food", "UserPref", "Log", "HealthContext"]
+__all__ = ["Food", "UserPref", "Log", "HealthContext", "SampleBatch", "HomeScreen"]
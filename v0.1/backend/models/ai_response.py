@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+class RecommendationItem(BaseModel):
+    food_id: str
+    reason: str = ""
+    score: float = 0.5
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from .food import Food
+
+class HomeScreen(BaseModel):
+    """Everything the app shows on launch; foods is None when the client's catalog is current"""
+    catalog_version: str
+    foods: Optional[List[Food]] = None
+    recommendations: List[Dict[str, Any]]
+    health_context: Dict[str, Any]
+    today: Dict[str, float]
+    goals: Dict[str, Any]
+    remaining: Dict[str, float]
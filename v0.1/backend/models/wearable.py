@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
+
+class SampleBatch(BaseModel):
+    """Watch samples as [epoch_seconds, value] pairs, one list per signal"""
+    hr: List[Tuple[float, float]] = []  # beats per minute
+    hrv: List[Tuple[float, float]] = []  # RMSSD in ms
+    steps: List[Tuple[float, float]] = []  # steps since the previous sample
+    sleep: List[Tuple[float, float]] = []  # minutes asleep in the segment ending at the timestamp
+    utc_offset_minutes: Optional[int] = None  # the wearer's local time zone, for time-of-day states
@@ -2,28 +2,44 @@
 AI Service for ChatGPT API integration with cost optimization
 """
 import os
-import json
-from typing import Dict, List, Optional, Any
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Any, Union
 import logging
 
-# Load environment variables
-load_dotenv()
+from models.ai_response import RecommendationItem
+from .cancellation import client_gone
+from .json_stream import IncrementalJSONParser, extract_json, legacy_extract, validate_items
+from .prompt_builder import BuiltPrompt, estimate_tokens, prompt_builder
+from .resilience import ProviderGuard
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tokens spent by the current task, for callers that meter their own spend (e.g. the pre-warmer)
+_usage_meter: ContextVar[Optional[List[int]]] = ContextVar("usage_meter", default=None)
+
+
+@contextmanager
+def metered() -> Iterator[List[int]]:
+    """Count tokens spent inside the block; the total is in the yielded list's first item"""
+    meter = [0]
+    token = _usage_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _usage_meter.reset(token)
+
 class AIService:
     def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key:
-            self.client = OpenAI(api_key=api_key)
-            self.ai_enabled = True
-        else:
-            self.client = None
-            self.ai_enabled = False
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        self.base_url = os.getenv("OPENAI_BASE_URL") or None
+        self._client: Optional["AsyncOpenAI"] = None
+        self.ai_enabled = bool(self.api_key)
+        if not self.ai_enabled:
             logger.warning("OpenAI API key not found. AI features will use fallback mode.")
         
         # Cost optimization settings
@@ -31,14 +47,37 @@ class AIService:
         self.model = "gpt-3.5-turbo"  # Use cheaper model
         self.temperature = 0.7
         
+        # Deadlines, circuit breaker and hedging around the provider
+        self.guard = ProviderGuard.from_env()
+        
         # Track usage for cost monitoring
         self.total_tokens_used = 0
         self.total_cost = 0.0
         
+        # Responses the old first/last-bracket extraction would have dropped
+        self.parse_stats = {"responses": 0, "legacy_failed": 0, "salvaged": 0, "failed": 0}
+        
+        # Provider calls in flight at once; extra calls queue here and are dropped if their request is cancelled
+        self.max_concurrency = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        
+        # Work abandoned because the HTTP client went away
+        self.cancellation_stats = {"cancelled_in_flight": 0, "cancelled_while_queued": 0, "tokens_saved_estimate": 0}
+        self._completion_tokens: Dict[str, List[int]] = {}  # endpoint -> [calls, completion tokens]
+        
+    @property
+    def client(self) -> Optional["AsyncOpenAI"]:
+        """The OpenAI client, created on first use; importing openai costs more than the rest of startup"""
+        if self._client is None and self.ai_enabled:
+            from openai import AsyncOpenAI
+            # Retries are handled by the circuit breaker and deadlines, not the client
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+    
     def count_tokens(self, text: str) -> int:
         """Count tokens in text for cost estimation (simplified)"""
         # Rough estimation: 1 token ≈ 4 characters for English text
-        return len(text) // 4
+        return estimate_tokens(text)
     
     def estimate_cost(self, prompt_tokens: int, completion_tokens: int) -> float:
         """Estimate cost based on token usage"""
@@ -60,29 +99,64 @@ class AIService:
     ) -> List[Dict[str, Any]]:
         """Get AI-powered food recommendations"""
         
+        try:
+            return await self.fetch_food_recommendations(
+                user_prefs, health_context, available_foods, max_recommendations
+            )
+        except Exception as e:
+            logger.error(f"Error getting recommendations: {e}")
+            return self._fallback_recommendations(available_foods, max_recommendations)
+    
+    async def fetch_food_recommendations(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        available_foods: List[Dict[str, Any]],
+        max_recommendations: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Get recommendations from the model, raising instead of falling back"""
+        
         # Create optimized prompt
         prompt = self._create_recommendation_prompt(
             user_prefs, health_context, available_foods, max_recommendations
         )
         
-        try:
-            response = await self._call_chatgpt(prompt, max_tokens=800)
-            
-            # Parse and validate response
-            recommendations = self._parse_recommendations(response)
-            
-            # Filter to available foods only
-            food_ids = [food["id"] for food in available_foods]
-            valid_recommendations = [
-                rec for rec in recommendations 
-                if rec.get("food_id") in food_ids
-            ]
-            
-            return valid_recommendations[:max_recommendations]
-            
-        except Exception as e:
-            logger.error(f"Error getting recommendations: {e}")
-            return self._fallback_recommendations(available_foods, max_recommendations)
+        # Stop reading as soon as enough valid recommendations have arrived
+        recommendations = []
+        async with aclosing(self.stream_recommendations(prompt, available_foods, max_recommendations)) as stream:
+            async for recommendation in stream:
+                recommendations.append(recommendation)
+        
+        return recommendations
+    
+    async def stream_recommendations(
+        self,
+        prompt: BuiltPrompt,
+        available_foods: List[Dict[str, Any]],
+        max_recommendations: int = 5,
+        endpoint: str = "recommendations"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield validated recommendations as soon as each one is complete in the stream"""
+        food_ids = {food["id"] for food in available_foods}
+        parser = IncrementalJSONParser("[")
+        received = []
+        emitted = set()
+        completed = False
+        
+        async with aclosing(self._stream_chatgpt(prompt, max_tokens=800, endpoint=endpoint)) as stream:
+            async for delta in stream:
+                received.append(delta)
+                items = prompt.decode_items(validate_items(parser.feed(delta), RecommendationItem))
+                for item in items:
+                    if item["food_id"] in food_ids and item["food_id"] not in emitted:
+                        emitted.add(item["food_id"])
+                        yield item
+                        if len(emitted) >= max_recommendations:
+                            return
+            completed = True
+        
+        if completed:
+            self._record_parse("".join(received), "[", len(emitted) > 0)
     
     async def analyze_nutrition_balance(
         self, 
@@ -94,7 +168,7 @@ class AIService:
         prompt = self._create_nutrition_analysis_prompt(consumed_foods, user_goals)
         
         try:
-            response = await self._call_chatgpt(prompt, max_tokens=600)
+            response = await self._call_chatgpt(prompt, max_tokens=600, endpoint="nutrition_analysis")
             return self._parse_nutrition_analysis(response)
         except Exception as e:
             logger.error(f"Error analyzing nutrition: {e}")
@@ -110,52 +184,174 @@ class AIService:
         prompt = self._create_meal_improvement_prompt(current_meal, user_prefs)
         
         try:
-            response = await self._call_chatgpt(prompt, max_tokens=500)
+            response = await self._call_chatgpt(prompt, max_tokens=500, endpoint="meal_improvements")
             return self._parse_meal_improvements(response)
         except Exception as e:
             logger.error(f"Error suggesting improvements: {e}")
             return {"suggestions": [], "reasoning": "Unable to analyze meal"}
     
-    async def _call_chatgpt(self, prompt: str, max_tokens: int = 1000) -> str:
+    async def _call_chatgpt(
+        self,
+        prompt: Union[str, BuiltPrompt],
+        max_tokens: int = 1000,
+        endpoint: str = "default"
+    ) -> str:
         """Make API call to ChatGPT with cost optimization"""
         
         if not self.ai_enabled or not self.client:
             raise Exception("AI service not available - no API key provided")
         
-        # Truncate prompt if too long
-        prompt_tokens = self.count_tokens(prompt)
-        if prompt_tokens > 2000:  # Leave room for response
-            # Truncate prompt to fit within token limit
-            max_prompt_tokens = 2000 - max_tokens
-            prompt = self._truncate_text(prompt, max_prompt_tokens)
-            prompt_tokens = self.count_tokens(prompt)
+        # Built prompts are already budgeted per section; free text is cut at line boundaries
+        if not isinstance(prompt, BuiltPrompt):
+            prompt = prompt_builder.raw(prompt, budget=max(1, 2000 - max_tokens))
+        prompt_tokens = prompt.tokens
         
+        queued = True
         try:
-            response = self.client.chat.completions.create(
+            async with self._slots:
+                queued = False
+                return await self.guard.run(
+                    endpoint,
+                    lambda: self._request_completion(prompt, prompt_tokens, max_tokens, endpoint)
+                )
+        except asyncio.CancelledError:
+            self._record_cancellation(endpoint, prompt_tokens, max_tokens, queued=queued)
+            raise
+        except Exception as e:
+            logger.error(f"ChatGPT API error ({endpoint}): {e}")
+            raise
+    
+    async def _request_completion(
+        self,
+        prompt: BuiltPrompt,
+        prompt_tokens: int,
+        max_tokens: int,
+        endpoint: str = "default"
+    ) -> str:
+        """Send a single completion request and track its usage"""
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=prompt.messages(),
+            max_tokens=max_tokens,
+            temperature=self.temperature
+        )
+        
+        self._track_usage(prompt_tokens, response.usage.completion_tokens, endpoint)
+        return response.choices[0].message.content
+    
+    async def _stream_chatgpt(
+        self,
+        prompt: Union[str, BuiltPrompt],
+        max_tokens: int = 1000,
+        endpoint: str = "default"
+    ) -> AsyncIterator[str]:
+        """Stream completion text deltas from ChatGPT"""
+        
+        if not self.ai_enabled or not self.client:
+            raise Exception("AI service not available - no API key provided")
+        
+        if not isinstance(prompt, BuiltPrompt):
+            prompt = prompt_builder.raw(prompt, budget=max(1, 2000 - max_tokens))
+        prompt_tokens = prompt.tokens
+        
+        opened = []
+        received = []
+        
+        async def open_stream():
+            stream = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a nutrition expert AI assistant. Provide concise, helpful responses."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=prompt.messages(),
                 max_tokens=max_tokens,
-                temperature=self.temperature
+                temperature=self.temperature,
+                stream=True
             )
-            
-            # Track usage
-            completion_tokens = response.usage.completion_tokens
-            total_tokens = response.usage.total_tokens
-            
-            self.total_tokens_used += total_tokens
-            cost = self.estimate_cost(prompt_tokens, completion_tokens)
-            self.total_cost += cost
-            
-            logger.info(f"API call: {total_tokens} tokens, ${cost:.4f}")
-            
-            return response.choices[0].message.content
-            
+            opened.append(stream)
+            return stream
+        
+        queued = True
+        completed = False
+        try:
+            async with self._slots:
+                queued = False
+                async with aclosing(self.guard.stream(endpoint, open_stream)) as chunks:
+                    async for chunk in chunks:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            received.append(delta)
+                            yield delta
+                completed = True
+        except asyncio.CancelledError:
+            self._record_cancellation(endpoint, prompt_tokens, max_tokens, queued, self.count_tokens("".join(received)))
+            raise
+        except GeneratorExit:
+            # Closed early: either the caller had enough items or the client disconnected
+            if client_gone():
+                self._record_cancellation(endpoint, prompt_tokens, max_tokens, queued, self.count_tokens("".join(received)))
+            raise
         except Exception as e:
-            logger.error(f"ChatGPT API error: {e}")
+            logger.error(f"ChatGPT streaming error ({endpoint}): {e}")
             raise
+        finally:
+            # Closing the HTTP response stops generation we no longer need
+            for stream in opened:
+                await stream.response.aclose()
+            # Streamed responses carry no usage block; estimate from the text received
+            if opened:
+                self._track_usage(prompt_tokens, self.count_tokens("".join(received)), endpoint if completed else None)
+    
+    def _track_usage(self, prompt_tokens: int, completion_tokens: int, endpoint: Optional[str] = None) -> None:
+        """Track token usage and estimated cost"""
+        total_tokens = prompt_tokens + completion_tokens
+        self.total_tokens_used += total_tokens
+        cost = self.estimate_cost(prompt_tokens, completion_tokens)
+        self.total_cost += cost
+        
+        meter = _usage_meter.get()
+        if meter is not None:
+            meter[0] += total_tokens
+        
+        # Only complete responses inform the expected completion size
+        if endpoint:
+            calls = self._completion_tokens.setdefault(endpoint, [0, 0])
+            calls[0] += 1
+            calls[1] += completion_tokens
+        
+        logger.info(f"API call: {total_tokens} tokens, ${cost:.4f}")
+    
+    def _record_cancellation(
+        self,
+        endpoint: str,
+        prompt_tokens: int,
+        max_tokens: int,
+        queued: bool,
+        received_tokens: int = 0
+    ) -> None:
+        """Count work dropped for a departed client and the tokens it would have cost"""
+        calls, completion_tokens = self._completion_tokens.get(endpoint, (0, 0))
+        expected_completion = completion_tokens // calls if calls else max_tokens // 2
+        
+        if queued:
+            # Never sent: the prompt is saved too
+            self.cancellation_stats["cancelled_while_queued"] += 1
+            saved = prompt_tokens + expected_completion
+        else:
+            self.cancellation_stats["cancelled_in_flight"] += 1
+            saved = max(0, expected_completion - received_tokens)
+        self.cancellation_stats["tokens_saved_estimate"] += saved
+        logger.info(f"Cancelled {endpoint} call ({'queued' if queued else 'in flight'}), ~{saved} tokens saved")
+    
+    def _record_parse(self, response: str, root: str, parsed: bool) -> None:
+        """Count parse outcomes, including responses the legacy extraction would have lost"""
+        self.parse_stats["responses"] += 1
+        legacy_ok = legacy_extract(response, root) is not None
+        if not legacy_ok:
+            self.parse_stats["legacy_failed"] += 1
+        if parsed and not legacy_ok:
+            self.parse_stats["salvaged"] += 1
+        if not parsed:
+            self.parse_stats["failed"] += 1
     
     def _create_recommendation_prompt(
         self, 
@@ -163,118 +359,58 @@ class AIService:
         health_context: Dict[str, Any],
         available_foods: List[Dict[str, Any]],
         max_recommendations: int
-    ) -> str:
+    ) -> BuiltPrompt:
         """Create optimized prompt for food recommendations"""
-        
-        # Format available foods concisely
-        foods_summary = []
-        for food in available_foods[:20]:  # Limit to first 20 foods
-            foods_summary.append(f"{food['id']}: {food['name']} ({food['kcal']}kcal, {food['macros']['protein_g']}g protein)")
-        
-        prompt = f"""
-        Recommend {max_recommendations} foods based on:
-        
-        User: {user_prefs.get('diet_style', 'omnivore')} diet, budget {user_prefs.get('budget', '$$')}, dislikes: {user_prefs.get('dislikes', [])}
-        Health: {health_context.get('sleep_hours', 8)}h sleep, {health_context.get('activity_level', 'moderate')} activity, {health_context.get('mood', 'normal')} mood
-        
-        Available foods:
-        {chr(10).join(foods_summary)}
-        
-        Return JSON: [{{"food_id": "food_001", "reason": "High protein for recovery", "score": 0.9}}]
-        """
-        
-        return prompt
+        return prompt_builder.recommendations(user_prefs, health_context, available_foods, max_recommendations)
     
     def _create_nutrition_analysis_prompt(
         self, 
         consumed_foods: List[Dict[str, Any]], 
         user_goals: Dict[str, Any]
-    ) -> str:
+    ) -> BuiltPrompt:
         """Create prompt for nutrition analysis"""
-        
-        # Calculate totals
-        total_calories = sum(food.get('kcal', 0) for food in consumed_foods)
-        total_protein = sum(food.get('macros', {}).get('protein_g', 0) for food in consumed_foods)
-        total_carbs = sum(food.get('macros', {}).get('carbs_g', 0) for food in consumed_foods)
-        total_fat = sum(food.get('macros', {}).get('fat_g', 0) for food in consumed_foods)
-        
-        prompt = f"""
-        Analyze nutrition for these foods (total: {total_calories} kcal, {total_protein}g protein, {total_carbs}g carbs, {total_fat}g fat):
-        
-        {[food['name'] for food in consumed_foods]}
-        
-        User goals: {user_goals}
-        
-        Return JSON: {{"balance_score": 0.8, "strengths": ["high protein"], "improvements": ["add vegetables"], "next_meal_suggestions": ["salad"]}}
-        """
-        
-        return prompt
+        return prompt_builder.nutrition_analysis(consumed_foods, user_goals)
     
     def _create_meal_improvement_prompt(
         self, 
         current_meal: Dict[str, Any], 
         user_prefs: Dict[str, Any]
-    ) -> str:
+    ) -> BuiltPrompt:
         """Create prompt for meal improvement suggestions"""
-        
-        prompt = f"""
-        Suggest improvements for this meal: {current_meal.get('name', 'Unknown')}
-        Nutrition: {current_meal.get('macros', {})}
-        
-        User preferences: {user_prefs}
-        
-        Return JSON: {{"suggestions": ["add vegetables", "reduce sodium"], "reasoning": "Meal lacks fiber and has high sodium"}}
-        """
-        
-        return prompt
+        return prompt_builder.meal_improvements(current_meal, user_prefs)
     
     def _parse_recommendations(self, response: str) -> List[Dict[str, Any]]:
         """Parse ChatGPT response into recommendation format"""
-        try:
-            # Extract JSON from response
-            start = response.find('[')
-            end = response.rfind(']') + 1
-            json_str = response[start:end]
-            
-            recommendations = json.loads(json_str)
-            return recommendations if isinstance(recommendations, list) else []
-            
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Error parsing recommendations: {e}")
-            return []
+        recommendations = validate_items(extract_json(response, "["), RecommendationItem)
+        self._record_parse(response, "[", bool(recommendations))
+        if not recommendations:
+            logger.error("Error parsing recommendations: no valid items in response")
+        return recommendations
+    
+    def _parse_object(self, response: str, fallback: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """Parse a JSON object response, returning fallback when nothing usable was found"""
+        parsed = extract_json(response, "{")
+        self._record_parse(response, "{", bool(parsed))
+        if not parsed:
+            logger.error(f"Error parsing {label}: no JSON object in response")
+            return fallback
+        return parsed
     
     def _parse_nutrition_analysis(self, response: str) -> Dict[str, Any]:
         """Parse nutrition analysis response"""
-        try:
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            
-            return json.loads(json_str)
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Error parsing nutrition analysis: {e}")
-            return {"balance_score": 0.5, "strengths": [], "improvements": []}
+        return self._parse_object(
+            response,
+            {"balance_score": 0.5, "strengths": [], "improvements": []},
+            "nutrition analysis"
+        )
     
     def _parse_meal_improvements(self, response: str) -> Dict[str, Any]:
         """Parse meal improvement suggestions"""
-        try:
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            
-            return json.loads(json_str)
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Error parsing meal improvements: {e}")
-            return {"suggestions": [], "reasoning": "Unable to analyze"}
-    
-    def _truncate_text(self, text: str, max_tokens: int) -> str:
-        """Truncate text to fit within token limit"""
-        # Rough estimation: 1 token ≈ 4 characters
-        max_chars = max_tokens * 4
-        if len(text) <= max_chars:
-            return text
-        
-        return text[:max_chars] + "..."
+        return self._parse_object(
+            response,
+            {"suggestions": [], "reasoning": "Unable to analyze"},
+            "meal improvements"
+        )
     
     def _fallback_recommendations(self, available_foods: List[Dict[str, Any]], max_recommendations: int) -> List[Dict[str, Any]]:
         """Fallback recommendations when AI fails"""
@@ -304,7 +440,10 @@ class AIService:
             "total_tokens": self.total_tokens_used,
             "total_cost": round(self.total_cost, 4),
             "model": self.model if self.ai_enabled else "none",
-            "average_cost_per_request": round(self.total_cost / max(1, self.total_tokens_used / 1000), 4) if self.total_tokens_used > 0 else 0
+            "average_cost_per_request": round(self.total_cost / max(1, self.total_tokens_used / 1000), 4) if self.total_tokens_used > 0 else 0,
+            "resilience": self.guard.snapshot(),
+            "parsing": dict(self.parse_stats),
+            "cancellations": dict(self.cancellation_stats)
         }
 
 # Global instance
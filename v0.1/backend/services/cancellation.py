@@ -0,0 +1,15 @@
+"""
+Request-scoped flag telling AI calls that the HTTP client has gone away
+"""
+from contextvars import ContextVar
+
+_client_gone: ContextVar[bool] = ContextVar("client_gone", default=False)
+
+
+def mark_client_gone() -> None:
+    """Mark the current request as abandoned by its client"""
+    _client_gone.set(True)
+
+
+def client_gone() -> bool:
+    return _client_gone.get()
@@ -0,0 +1,139 @@
+"""
+Catalog delta sync: what changed in the foods table since a client's version
+
+Triggers on foods append every insert, update and delete to the food_changes journal, so
+edits made by any writer are picked up; the journal's AUTOINCREMENT number is the catalog
+version. A client sends the version it has and gets the rows changed after it, one per
+food. Compaction keeps the journal short: superseded entries for the same food are dropped,
+and entries older than the last JOURNAL_KEEP are folded into a stored snapshot of the whole
+catalog, which is what a client from before that point starts from.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from db.database import get_db, journal_version
+
+JOURNAL_KEEP = int(os.getenv("CATALOG_JOURNAL_KEEP", 1000))
+# The Food shape built by SQLite's JSON functions, so a whole catalog is encoded without a
+# Python object per row; tags, areas and chains are stored as JSON already
+FOOD_JSON = """json_object(
+    'id', id, 'name', name, 'category', category, 'tags', json(tags),
+    'macros', json_object('protein_g', protein_g, 'carbs_g', carbs_g, 'fat_g', fat_g),
+    'kcal', kcal,
+    'availability', json_object('areas', json(areas), 'chains', json(chains)),
+    'est_price_range', est_price_range
+)"""
+
+
+def food_payload(row: Any) -> Dict[str, Any]:
+    """A foods row in the API's Food shape; rows come from our own table, so no validation"""
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "category": row["category"],
+        "tags": json.loads(row["tags"]),
+        "macros": {"protein_g": row["protein_g"], "carbs_g": row["carbs_g"], "fat_g": row["fat_g"]},
+        "kcal": row["kcal"],
+        "availability": {"areas": json.loads(row["areas"]), "chains": json.loads(row["chains"])},
+        "est_price_range": row["est_price_range"]
+    }
+
+
+def foods_json(db, where: str = "", params: tuple = ()) -> str:
+    """Foods rows (optionally filtered by a WHERE clause) as one JSON array text, ordered by id"""
+    return db.execute(
+        f"SELECT json_group_array({FOOD_JSON}) FROM (SELECT * FROM foods {where} ORDER BY id)", params
+    ).fetchone()[0]
+
+
+def _latest_snapshot(db) -> Optional[Any]:
+    return db.execute("SELECT version, floor, foods FROM catalog_snapshots ORDER BY version DESC LIMIT 1").fetchone()
+
+
+def _changed_since(db, since: int) -> Dict[str, Any]:
+    upserts: List[Dict[str, Any]] = []
+    deletes: List[str] = []
+    # The latest entry per food decides; the row itself is read from foods as it is now
+    for row in db.execute("""
+        SELECT changed.food_id, foods.*
+        FROM (SELECT DISTINCT food_id FROM food_changes WHERE version > ?) AS changed
+        LEFT JOIN foods ON foods.id = changed.food_id
+        ORDER BY changed.food_id
+    """, (since,)):
+        if row["id"] is None:
+            deletes.append(row["food_id"])
+        else:
+            upserts.append(food_payload(row))
+    return {"upserts": upserts, "deletes": deletes}
+
+
+def changes_since(since: Optional[int]) -> Dict[str, Any]:
+    """Upserts and deletes after version since.
+
+    A client from before the compaction floor (or with no version) gets reset=True: it should
+    replace its catalog with snapshot, given already encoded as JSON text in snapshot_json, and
+    then apply the upserts and deletes like any other client.
+    """
+    with get_db() as db:
+        db.execute("BEGIN")  # version, snapshot and journal from one read snapshot
+        version = journal_version(db)
+        snapshot = _latest_snapshot(db)
+        floor = snapshot["floor"] if snapshot else 0
+        entries = db.execute("SELECT COUNT(*) FROM food_changes").fetchone()[0]
+        if since is not None and floor <= since <= version:
+            result = {"version": version, "reset": False, **_changed_since(db, since)}
+        elif snapshot is not None:
+            result = {
+                "version": version,
+                "reset": True,
+                "snapshot_version": snapshot["version"],
+                "snapshot_json": snapshot["foods"],
+                **_changed_since(db, snapshot["version"])
+            }
+        else:
+            result = {
+                "version": version,
+                "reset": True,
+                "snapshot_version": version,
+                "snapshot_json": foods_json(db),
+                "upserts": [],
+                "deletes": []
+            }
+        db.rollback()
+    result["journal_entries"] = entries
+    return result
+
+
+def compact_journal(keep: int = JOURNAL_KEEP) -> Dict[str, Any]:
+    """Drop superseded journal entries, and fold all but the newest keep into a snapshot"""
+    started = time.perf_counter()
+    with get_db() as db:
+        db.execute("BEGIN IMMEDIATE")
+        superseded = db.execute("""
+            DELETE FROM food_changes
+            WHERE version NOT IN (SELECT MAX(version) FROM food_changes GROUP BY food_id)
+        """).rowcount
+        entries = db.execute("SELECT COUNT(*) FROM food_changes").fetchone()[0]
+        folded = 0
+        snapshot_version = None
+        if entries > keep:
+            floor = db.execute(
+                "SELECT version FROM food_changes ORDER BY version DESC LIMIT 1 OFFSET ?", (keep,)
+            ).fetchone()[0]
+            snapshot_version = journal_version(db)
+            db.execute(
+                "INSERT OR REPLACE INTO catalog_snapshots (version, floor, created_at, foods) VALUES (?, ?, ?, ?)",
+                (snapshot_version, floor, datetime.now().isoformat(), foods_json(db))
+            )
+            db.execute("DELETE FROM catalog_snapshots WHERE version < ?", (snapshot_version,))
+            folded = db.execute("DELETE FROM food_changes WHERE version <= ?", (floor,)).rowcount
+        db.commit()
+    return {
+        "superseded": superseded,
+        "folded": folded,
+        "snapshot_version": snapshot_version,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,157 @@
+"""
+Item-item co-occurrence learned from consumption logs
+
+Foods logged in the same meal window count fully towards each other, foods logged the same
+day partially. Weights decay with a half-life measured in log time; instead of touching every
+weight, new weight is added scaled up by the decay accrued so far and reads scale back down,
+which keeps relative order fixed so each food's top partners can be maintained in place.
+"""
+import math
+import os
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from db.database import get_db
+
+logger = logging.getLogger(__name__)
+
+MEAL_WINDOW = timedelta(minutes=90)
+MEAL_WEIGHT = 1.0
+SAME_DAY_WEIGHT = 0.25
+# Same-day logs a new log is paired with, which bounds the work per update
+MAX_DAY_LOGS = 50
+# Partners kept per food for "goes well with" answers
+TOP_PARTNERS = 20
+# Compaction folds the decay into the weights and drops pairs that faded below this
+MIN_WEIGHT = 0.05
+COMPACT_EVERY = 5000
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+class CooccurrenceModel:
+    """Sparse symmetric co-occurrence weights with lazy exponential decay"""
+
+    def __init__(self, half_life_days: float = 30.0):
+        self.decay_rate = math.log(2) / (half_life_days * 86400)
+        self.pairs: Dict[str, Dict[str, float]] = {}
+        self.top: Dict[str, List[Tuple[float, str]]] = {}  # best partners per food, by stored weight
+        self._recent: Deque[Tuple[datetime, str]] = deque(maxlen=MAX_DAY_LOGS)  # today's logs
+        self._epoch: Optional[datetime] = None  # stored weights are relative to this time
+        self._clock: Optional[datetime] = None  # latest log time seen
+        self.updates_since_compaction = 0
+        self.stats = {"logs": 0, "pair_updates": 0, "compactions": 0, "dropped_pairs": 0}
+
+    @classmethod
+    def from_env(cls) -> "CooccurrenceModel":
+        return cls(half_life_days=_env_float("COOCCURRENCE_HALF_LIFE_DAYS", 30.0))
+
+    def load(self) -> None:
+        """Learn from every existing log, oldest first"""
+        with get_db() as db:
+            rows = db.execute("SELECT food_id, timestamp FROM logs ORDER BY timestamp").fetchall()
+        for row in rows:
+            self.add(row["food_id"], datetime.fromisoformat(row["timestamp"]))
+        logger.info(f"Co-occurrence model loaded {len(rows)} logs, {self.pair_count()} pairs")
+
+    def _growth(self, when: datetime) -> float:
+        return math.exp(self.decay_rate * (when - self._epoch).total_seconds())
+
+    def add(self, food_id: str, when: datetime) -> None:
+        """Record one log: pair it with the foods logged earlier the same day"""
+        if self._epoch is None:
+            self._epoch = when
+        self._clock = max(self._clock or when, when)
+        while self._recent and self._recent[0][0].date() != when.date():
+            self._recent.popleft()
+
+        growth = self._growth(when)
+        for logged_at, other in self._recent:
+            if other == food_id:
+                continue
+            weight = MEAL_WEIGHT if abs(when - logged_at) <= MEAL_WINDOW else SAME_DAY_WEIGHT
+            self._bump(food_id, other, weight * growth)
+            self._bump(other, food_id, weight * growth)
+        self._recent.append((when, food_id))
+        self.stats["logs"] += 1
+
+        if self.updates_since_compaction >= COMPACT_EVERY:
+            self.compact()
+
+    def _bump(self, food_id: str, other: str, amount: float) -> None:
+        partners = self.pairs.setdefault(food_id, {})
+        weight = partners[other] = partners.get(other, 0.0) + amount
+        self.updates_since_compaction += 1
+        self.stats["pair_updates"] += 1
+
+        # Keep the top list sorted best first; it is short, so this is constant work
+        top = self.top.setdefault(food_id, [])
+        top[:] = [entry for entry in top if entry[1] != other]
+        if len(top) < TOP_PARTNERS or weight > top[-1][0]:
+            top.append((weight, other))
+            top.sort(reverse=True)
+            del top[TOP_PARTNERS:]
+
+    def compact(self) -> None:
+        """Fold the accrued decay into the weights, drop faded pairs and rebuild the top lists"""
+        if self._clock is None:
+            return
+        shrink = 1 / self._growth(self._clock)
+        dropped = 0
+        for food_id in list(self.pairs):
+            partners = {
+                other: weight * shrink
+                for other, weight in self.pairs[food_id].items()
+                if weight * shrink >= MIN_WEIGHT
+            }
+            dropped += len(self.pairs[food_id]) - len(partners)
+            if partners:
+                self.pairs[food_id] = partners
+                self.top[food_id] = sorted(((weight, other) for other, weight in partners.items()), reverse=True)[:TOP_PARTNERS]
+            else:
+                del self.pairs[food_id]
+                self.top.pop(food_id, None)
+        self._epoch = self._clock
+        self.updates_since_compaction = 0
+        self.stats["compactions"] += 1
+        self.stats["dropped_pairs"] += dropped
+
+    def weight(self, food_id: str, other: str) -> float:
+        """Current decayed co-occurrence weight of a pair"""
+        stored = self.pairs.get(food_id, {}).get(other, 0.0)
+        return stored / self._growth(self._clock) if stored else 0.0
+
+    def goes_well_with(self, food_id: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Foods most often eaten with food_id, with their decayed weights"""
+        top = self.top.get(food_id, [])[:k]
+        if not top:
+            return []
+        shrink = 1 / self._growth(self._clock)
+        return [(other, round(weight * shrink, 3)) for weight, other in top]
+
+    def affinity(self, food_id: str, context: Iterable[str]) -> float:
+        """How well food_id goes with the foods in context, in [0, 1] per context food"""
+        top = self.top.get(food_id)
+        if not top:
+            return 0.0
+        best = top[0][0]
+        partners = self.pairs[food_id]
+        return sum(partners.get(other, 0.0) / best for other in context)
+
+    def pair_count(self) -> int:
+        return sum(len(partners) for partners in self.pairs.values()) // 2
+
+    def snapshot(self) -> Dict[str, float]:
+        return {**self.stats, "foods": len(self.pairs), "pairs": self.pair_count()}
+
+
+# Global instance
+cooccurrence = CooccurrenceModel.from_env()
@@ -0,0 +1,180 @@
+"""
+Managed process pool for CPU-bound work, so planning and scoring never block the event loop
+"""
+import asyncio
+import os
+import pickle
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CpuPoolSaturatedError(Exception):
+    """Raised when the pool already has its maximum of queued and running tasks."""
+
+
+@dataclass(frozen=True)
+class SharedRef:
+    """Handle to an object published once into shared memory"""
+    name: str
+    size: int
+
+
+# Worker side: objects unpickled from shared memory, by block name
+_attached: Dict[str, Any] = {}
+
+
+def load_shared(ref: SharedRef) -> Any:
+    """Get a published object inside a worker, reading shared memory only the first time"""
+    if ref.name not in _attached:
+        # Spawned workers share the parent's resource tracker, so attaching registers nothing new
+        # and the parent's unlink is the one cleanup
+        block = SharedMemory(name=ref.name)
+        try:
+            _attached.clear()  # a new version replaces the old one
+            _attached[ref.name] = pickle.loads(block.buf[:ref.size])
+        finally:
+            block.close()
+    return _attached[ref.name]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+class CpuPool:
+    """Process pool with a bound on queued work and shared-memory publishing of large inputs"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 8):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._published: Dict[str, SharedMemory] = {}  # key -> current block
+        self._retired: Dict[str, SharedMemory] = {}  # block name -> replaced block still in use
+        self._users: Dict[str, int] = {}  # block name -> calls holding it
+        self._lock = threading.Lock()  # publish runs on a thread
+        self._depth = 0
+        self.stats = {"submitted": 0, "rejected": 0, "inline": 0, "published": 0}
+
+    @classmethod
+    def from_env(cls) -> "CpuPool":
+        workers = _env_int("CPU_POOL_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1)))
+        return cls(workers=workers, max_queue=_env_int("CPU_POOL_MAX_QUEUE", workers * 4))
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def saturated(self) -> bool:
+        return self.running and self._depth >= self.max_queue
+
+    def start(self) -> None:
+        """Start the workers; with CPU_POOL_WORKERS=0 work runs on threads instead"""
+        if self._executor is None and self.workers > 0:
+            # Spawned workers start clean instead of inheriting the server's threads and loop
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+
+    async def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+        with self._lock:
+            for block in [*self._published.values(), *self._retired.values()]:
+                self._unlink(block)
+            self._published.clear()
+            self._retired.clear()
+            self._users.clear()
+
+    def publish(self, key: str, obj: Any) -> Optional[SharedRef]:
+        """Copy obj into shared memory once; workers load it on first use.
+
+        Replaces earlier versions of key. A replaced block stays until the last call holding it
+        (see acquire) is released, since a worker that has not attached yet still opens it by name.
+        """
+        if not self.running:
+            return None
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        block = SharedMemory(create=True, size=max(1, len(data)))
+        block.buf[:len(data)] = data
+
+        with self._lock:
+            previous = self._published.pop(key, None)
+            self._published[key] = block
+            if previous is not None:
+                if self._users.get(previous.name):
+                    self._retired[previous.name] = previous
+                else:
+                    self._unlink(previous)
+            self.stats["published"] += 1
+        return SharedRef(block.name, len(data))
+
+    def acquire(self, ref: SharedRef) -> None:
+        """Keep ref's block alive until release, even if a newer version is published meanwhile"""
+        with self._lock:
+            self._users[ref.name] = self._users.get(ref.name, 0) + 1
+
+    def release(self, ref: SharedRef) -> None:
+        with self._lock:
+            users = self._users.get(ref.name, 0) - 1
+            if users > 0:
+                self._users[ref.name] = users
+                return
+            self._users.pop(ref.name, None)
+            retired = self._retired.pop(ref.name, None)
+            if retired is not None:
+                self._unlink(retired)
+
+    @staticmethod
+    def _unlink(block: SharedMemory) -> None:
+        # Workers already attached keep their own copy; unlinking only drops the name
+        block.close()
+        block.unlink()
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in a worker process, or on a thread when the pool is not started"""
+        if not self.running:
+            self.stats["inline"] += 1
+            return await asyncio.to_thread(fn, *args)
+        if self._depth >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise CpuPoolSaturatedError(f"CPU pool busy ({self._depth} tasks queued or running)")
+
+        with self._lock:
+            self._depth += 1
+        self.stats["submitted"] += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._finished(None)
+            raise
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _finished(self, future: Optional[Future]) -> None:
+        # Counted down when the work ends, not when the caller stops waiting: cancelling the
+        # await only withdraws a call that has not started, a running one keeps its worker
+        with self._lock:
+            self._depth -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "workers": self.workers if self.running else 0,
+            "depth": self._depth,
+            "max_queue": self.max_queue,
+            "retired_blocks": len(self._retired)
+        }
+
+
+# Global instance
+cpu_pool = CpuPool.from_env()
@@ -0,0 +1,60 @@
+"""
+Diet and dislike eligibility rules shared by local recommendation code
+"""
+import json
+from typing import Any, Dict, List
+
+# A food qualifies for a restricted diet if it carries one of these tags
+DIET_TAGS = {
+    "vegetarian": {"vegetarian", "vegan", "plant-based"},
+    "vegan": {"vegan", "plant-based"},
+}
+# ...or is excluded outright if it carries one of these
+DIET_EXCLUDED_TAGS = {
+    "halal": {"pork", "bacon", "ham", "alcohol"},
+}
+KETO_MAX_CARBS_G = 15.0
+
+
+def food_tags(food: Dict[str, Any]) -> List[str]:
+    """Tags of a food dict, whether decoded or still a JSON string from the DB"""
+    tags = food.get("tags") or []
+    if isinstance(tags, str):
+        tags = json.loads(tags)
+    return [tag.lower() for tag in tags]
+
+
+def food_macro(food: Dict[str, Any], name: str) -> float:
+    """Macro value from nested macros or flat DB columns"""
+    macros = food.get("macros")
+    if isinstance(macros, dict) and name in macros:
+        return float(macros[name] or 0)
+    if macros is not None and hasattr(macros, name):
+        return float(getattr(macros, name) or 0)
+    return float(food.get(name) or 0)
+
+
+def is_eligible(food: Dict[str, Any], diet_style: str = "omnivore", dislikes: List[str] = ()) -> bool:
+    """Check a food against a diet style and the user's dislikes"""
+    tags = set(food_tags(food))
+
+    required = DIET_TAGS.get(diet_style)
+    if required and not tags & required:
+        return False
+    if tags & DIET_EXCLUDED_TAGS.get(diet_style, set()):
+        return False
+    if diet_style == "keto" and food_macro(food, "carbs_g") > KETO_MAX_CARBS_G:
+        return False
+
+    name = food.get("name", "").lower()
+    for dislike in dislikes:
+        dislike = dislike.lower()
+        if dislike in tags or dislike in name:
+            return False
+    return True
+
+
+def eligible_foods(foods: List[Dict[str, Any]], user_prefs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    diet_style = user_prefs.get("diet_style") or "omnivore"
+    dislikes = user_prefs.get("dislikes") or []
+    return [food for food in foods if is_eligible(food, diet_style, dislikes)]
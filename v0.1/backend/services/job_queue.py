@@ -0,0 +1,277 @@
+"""
+Durable SQLite-backed job queue with asyncio workers for long-running AI tasks
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from db.database import get_db
+from .ai_service import ai_service
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+class JobQueue:
+    """Jobs live in the jobs table; workers claim them one at a time and retry failures with backoff"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_attempts: int = 3,
+        backoff_base: float = 2.0,
+        backoff_max: float = 60.0,
+        result_ttl: float = 3600.0,
+        poll_interval: float = 1.0
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, List[asyncio.Event]] = {}  # job id -> one event per waiting request
+        self.stats = {"enqueued": 0, "succeeded": 0, "failed": 0, "retried": 0, "recovered": 0, "expired": 0}
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        # Provider calls made by jobs go through the AI service's concurrency slots; by default
+        # jobs may only occupy half of them so interactive requests never queue behind a backlog
+        default_workers = max(1, ai_service.max_concurrency // 2)
+        return cls(
+            workers=int(_env_float("AI_JOB_WORKERS", default_workers)),
+            max_attempts=int(_env_float("AI_JOB_MAX_ATTEMPTS", 3)),
+            backoff_base=_env_float("AI_JOB_BACKOFF_SECONDS", 2.0),
+            result_ttl=_env_float("AI_JOB_RESULT_TTL_SECONDS", 3600.0)
+        )
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, params: Dict[str, Any]) -> str:
+        """Persist a job and wake a worker; returns the job id"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        with get_db() as db:
+            db.execute("""
+                INSERT INTO jobs (id, kind, params, status, max_attempts, run_after, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (job_id, kind, json.dumps(params, default=str), QUEUED, self.max_attempts, time.time(), now, now))
+            db.commit()
+
+        self.stats["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job, or None if unknown or its result expired"""
+        with get_db() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll: return once the job finished or the timeout elapsed"""
+        job = self.get(job_id)
+        if job is None or job["status"] in FINISHED or timeout <= 0:
+            return job
+        # Jobs finish on this event loop, so nothing can complete between the read and this
+        event = asyncio.Event()
+        waiters = self._finished.setdefault(job_id, [])
+        waiters.append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters.remove(event)
+            if not waiters and self._finished.get(job_id) is waiters:
+                del self._finished[job_id]
+        return self.get(job_id)
+
+    def _recover(self) -> None:
+        """Requeue jobs that were running when the process stopped, and drop expired results"""
+        with get_db() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, run_after = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, time.time(), datetime.now().isoformat(), RUNNING)
+            )
+            self.stats["recovered"] += cursor.rowcount
+            db.commit()
+        if self.stats["recovered"]:
+            logger.info(f"Requeued {self.stats['recovered']} interrupted jobs")
+        self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        with get_db() as db:
+            cursor = db.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+            self.stats["expired"] += cursor.rowcount
+            db.commit()
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the next runnable job to running"""
+        with get_db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? AND run_after <= ? ORDER BY run_after LIMIT 1",
+                (QUEUED, time.time())
+            ).fetchone()
+            if row is None:
+                db.rollback()
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, datetime.now().isoformat(), row["id"])
+            )
+            db.commit()
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _next_run_in(self) -> float:
+        """Seconds until the earliest delayed job becomes runnable"""
+        with get_db() as db:
+            row = db.execute("SELECT MIN(run_after) AS run_after FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+        if row["run_after"] is None:
+            return self.poll_interval
+        return max(0.0, min(self.poll_interval, row["run_after"] - time.time()))
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _finish(self, job: Dict[str, Any], status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with get_db() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    datetime.now().isoformat(),
+                    time.time() + self.result_ttl,
+                    job["id"]
+                )
+            )
+            db.commit()
+        self.stats[status] += 1
+        for event in self._finished.pop(job["id"], []):
+            event.set()
+
+    def _retry_later(self, job: Dict[str, Any], error: str) -> None:
+        with get_db() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, updated_at = ? WHERE id = ?",
+                (QUEUED, error, time.time() + self._backoff(job["attempts"]), datetime.now().isoformat(), job["id"])
+            )
+            db.commit()
+        self.stats["retried"] += 1
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            self._finish(job, FAILED, error=f"Unknown job kind: {job['kind']}")
+            return
+        try:
+            result = await handler(json.loads(job["params"]))
+        except asyncio.CancelledError:
+            # Shutting down: leave it running so the next start requeues it
+            raise
+        except Exception as e:
+            logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            if job["attempts"] < job["max_attempts"]:
+                self._retry_later(job, str(e))
+            else:
+                self._finish(job, FAILED, error=str(e))
+            return
+        self._finish(job, SUCCEEDED, result=result)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = self._claim()
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_run_in())
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. "database is locked" while claiming or finishing; a claimed job is requeued on restart
+                logger.error(f"Job worker error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _janitor(self) -> None:
+        while True:
+            await asyncio.sleep(max(60.0, self.result_ttl / 10))
+            self._purge_expired()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._recover()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._janitor()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        with get_db() as db:
+            rows = db.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "by_status": {row["status"]: row["count"] for row in rows}
+        }
+
+
+# Global instance
+job_queue = JobQueue.from_env()
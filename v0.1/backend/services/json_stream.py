@@ -0,0 +1,136 @@
+"""
+Incremental JSON extraction from LLM output that may mix prose and JSON
+"""
+import json
+import logging
+from typing import Any, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+_OPENERS = {"[": "]", "{": "}"}
+
+
+class IncrementalJSONParser:
+    """Emits top-level JSON members as soon as each one is complete.
+
+    Text outside JSON is skipped. For an array root every completed element is emitted;
+    for an object root every completed member is emitted as a (key, value) tuple.
+    A malformed element is dropped without losing the rest of the response.
+    """
+
+    def __init__(self, root: str = "["):
+        if root not in _OPENERS:
+            raise ValueError("root must be '[' or '{'")
+        self.root = root
+        self.items_emitted = 0
+        self.errors = 0
+        self._stack: List[str] = []
+        self._element: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk of text and return the members completed by it"""
+        completed: List[Any] = []
+        for ch in chunk:
+            self._consume(ch, completed)
+        self.items_emitted += len(completed)
+        return completed
+
+    def _reset(self) -> None:
+        self._stack = []
+        self._element = []
+        self._in_string = False
+        self._escape = False
+
+    def _consume(self, ch: str, completed: List[Any]) -> None:
+        stack = self._stack
+        if not stack:
+            # Scanning prose for the start of a root value
+            if ch == self.root:
+                stack.append(ch)
+                self._element = []
+            return
+
+        if self._in_string:
+            self._element.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+            return
+
+        if ch == '"':
+            self._in_string = True
+            self._element.append(ch)
+        elif ch in _OPENERS:
+            stack.append(ch)
+            self._element.append(ch)
+        elif ch in "]}":
+            if _OPENERS[stack[-1]] != ch:
+                # Mismatched bracket: this candidate is not JSON, go back to scanning
+                self.errors += 1
+                self._reset()
+                return
+            stack.pop()
+            if not stack:
+                self._flush(completed)
+                return
+            self._element.append(ch)
+            if len(stack) == 1:
+                # A nested container just closed at the top level, so the member is complete
+                self._flush(completed)
+        elif ch == "," and len(stack) == 1:
+            self._flush(completed)
+        elif len(stack) == 1 and not self._element and ch.isspace():
+            return
+        else:
+            self._element.append(ch)
+
+    def _flush(self, completed: List[Any]) -> None:
+        text = "".join(self._element).strip()
+        self._element = []
+        if not text:
+            return
+        try:
+            if self.root == "[":
+                completed.append(json.loads(text))
+            else:
+                completed.extend(json.loads("{" + text + "}").items())
+        except json.JSONDecodeError:
+            self.errors += 1
+
+
+def legacy_extract(text: str, root: str = "[") -> Optional[Any]:
+    """The old first-opener/last-closer extraction, kept to measure how many responses we salvage"""
+    try:
+        start = text.find(root)
+        end = text.rfind(_OPENERS[root]) + 1
+        value = json.loads(text[start:end])
+        return value if isinstance(value, list if root == "[" else dict) else None
+    except (json.JSONDecodeError, ValueError):
+        return None
+
+
+def extract_json(text: str, root: str = "[") -> Any:
+    """Extract the JSON array (as a list) or object (as a dict) from a full response"""
+    parser = IncrementalJSONParser(root)
+    members = parser.feed(text)
+    if root == "[":
+        return members
+    return dict(members)
+
+
+def validate_items(items: List[Any], model: Type[BaseModel]) -> List[dict]:
+    """Keep the items that match the schema, normalized to plain dicts"""
+    valid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item).model_dump())
+        except ValidationError as e:
+            logger.debug(f"Dropping invalid {model.__name__}: {e}")
+    return valid
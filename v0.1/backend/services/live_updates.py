@@ -0,0 +1,235 @@
+"""
+Live recommendation updates pushed to connected clients
+
+One hub keeps the current top recommendations. Logs, preference and health-state changes
+call notify(); bursts are debounced into one recompute, and the catalog version is polled
+on the heartbeat so out-of-band catalog edits are picked up too. Each connection only
+holds the ids it was last sent and a wake-up event. Its message is built when the socket
+is ready to send, so a slow client gets one delta from its last state to the newest list
+instead of a growing backlog.
+"""
+import asyncio
+import json
+import os
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from db.database import catalog_version, get_db
+
+logger = logging.getLogger(__name__)
+
+Source = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+# Recommendations computed per refresh; each connection gets its own top-N slice of them
+MAX_ITEMS = 10
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+class Subscriber:
+    """Per-connection state: what this client has seen and whether it needs waking"""
+
+    __slots__ = ("limit", "sent", "version", "wake", "last_sent_at", "heartbeat_due", "pong_due")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.sent: List[str] = []
+        self.version = -1  # hub version this client is on; -1 until the first snapshot
+        self.wake = asyncio.Event()
+        self.last_sent_at = time.monotonic()
+        self.heartbeat_due = False
+        self.pong_due = False
+
+
+class LiveHub:
+    """Current top recommendations and the connections subscribed to them"""
+
+    def __init__(self, debounce: float = 0.25, heartbeat: float = 25.0, max_connections: int = 20000):
+        self.debounce = debounce
+        self.heartbeat = heartbeat
+        self.max_connections = max_connections
+        self.current: List[Dict[str, Any]] = []
+        self.version = 0
+        self.subscribers: Set[Subscriber] = set()
+        self._source: Optional[Source] = None
+        self._reasons: Set[str] = set()
+        self._dirty: Optional[asyncio.Event] = None
+        self._refreshing = False
+        self._tasks: List[asyncio.Task] = []
+        self._catalog: Optional[str] = None
+        self._messages: Dict[Tuple[int, int, int], Tuple[Optional[str], List[str]]] = {}
+        self.stats = {
+            "notifications": 0, "refreshes": 0, "changes": 0, "deltas": 0, "snapshots": 0,
+            "heartbeats": 0, "rejected": 0, "slow_closed": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "LiveHub":
+        return cls(
+            debounce=_env_float("LIVE_DEBOUNCE_SECONDS", 0.25),
+            heartbeat=_env_float("LIVE_HEARTBEAT_SECONDS", 25.0),
+            max_connections=int(_env_float("LIVE_MAX_CONNECTIONS", 20000))
+        )
+
+    def register_source(self, source: Source) -> None:
+        """The coroutine that computes the current top recommendations"""
+        self._source = source
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._dirty = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._refresh_loop()), asyncio.create_task(self._heartbeat_loop())]
+        self.notify("startup")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self, reason: str) -> None:
+        """Something the recommendations depend on changed"""
+        self.stats["notifications"] += 1
+        self._reasons.add(reason)
+        if self._dirty is not None:
+            self._dirty.set()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self._dirty.wait()
+            # Let a burst of changes settle into one recompute
+            await asyncio.sleep(self.debounce)
+            self._dirty.clear()
+            reasons, self._reasons = self._reasons, set()
+            self._refreshing = True
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Live recommendation refresh failed ({', '.join(sorted(reasons))}): {e}")
+            finally:
+                self._refreshing = False
+
+    async def refresh(self) -> bool:
+        """Recompute the recommendations and wake every connection if they changed"""
+        if self._source is None:
+            return False
+        items = (await self._source())[:MAX_ITEMS]
+        self.stats["refreshes"] += 1
+        if items == self.current:
+            return False
+        self.current = items
+        self.version += 1
+        self._messages = {}
+        self.stats["changes"] += 1
+        for subscriber in self.subscribers:
+            subscriber.wake.set()
+        return True
+
+    def top(self, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """The current recommendations if nothing changed since they were computed, else None"""
+        if not self._tasks or self.version == 0 or self._reasons or self._refreshing or limit > MAX_ITEMS:
+            return None
+        return self.current[:limit]
+
+    async def _heartbeat_loop(self) -> None:
+        # One timer for all connections instead of one per connection
+        while True:
+            await asyncio.sleep(self.heartbeat / 2)
+            now = time.monotonic()
+            for subscriber in self.subscribers:
+                if now - subscriber.last_sent_at >= self.heartbeat:
+                    subscriber.heartbeat_due = True
+                    subscriber.wake.set()
+            try:
+                version = await asyncio.to_thread(self._catalog_version)
+            except Exception as e:
+                logger.error(f"Catalog version check failed: {e}")
+                continue
+            if self._catalog is not None and version != self._catalog:
+                self.notify("catalog")
+            self._catalog = version
+
+    def _catalog_version(self) -> str:
+        with get_db() as db:
+            return catalog_version(db)
+
+    def subscribe(self, limit: int) -> Optional[Subscriber]:
+        """Register a connection; None when the process is at its connection limit"""
+        if len(self.subscribers) >= self.max_connections:
+            self.stats["rejected"] += 1
+            return None
+        subscriber = Subscriber(min(max(1, limit), MAX_ITEMS))
+        self.subscribers.add(subscriber)
+        subscriber.wake.set()  # send the snapshot right away
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    async def next_message(self, subscriber: Subscriber) -> str:
+        """Wait until there is something to send to this connection; returns it JSON-encoded"""
+        while True:
+            await subscriber.wake.wait()
+            subscriber.wake.clear()
+            message = None
+            if subscriber.pong_due:
+                subscriber.pong_due = False
+                message = json.dumps({"type": "pong"})
+                if subscriber.version != self.version:
+                    subscriber.wake.set()  # the update goes out next
+            elif subscriber.version != self.version:
+                message = self._update(subscriber)
+            if message is None and subscriber.heartbeat_due:
+                message = json.dumps({"type": "heartbeat", "version": self.version})
+                self.stats["heartbeats"] += 1
+            subscriber.heartbeat_due = False
+            if message is not None:
+                subscriber.last_sent_at = time.monotonic()
+                return message
+
+    def _update(self, subscriber: Subscriber) -> Optional[str]:
+        """Snapshot for a new connection, otherwise what changed in its top-N since its last message.
+
+        Connections on the same version with the same limit hold the same ids, so each
+        (from, to, limit) message is built and encoded once per fan-out.
+        """
+        key = (subscriber.version, self.version, subscriber.limit)
+        if key not in self._messages:
+            self._messages[key] = self._encode_update(subscriber)
+        message, ids = self._messages[key]
+        subscriber.version = self.version
+        subscriber.sent = ids
+        if message is not None:
+            self.stats["snapshots" if key[0] < 0 else "deltas"] += 1
+        return message
+
+    def _encode_update(self, subscriber: Subscriber) -> Tuple[Optional[str], List[str]]:
+        top = self.current[:subscriber.limit]
+        ids = [item["food_id"] for item in top]
+        if subscriber.version < 0:
+            return json.dumps({"type": "snapshot", "version": self.version, "items": top}), ids
+        if ids == subscriber.sent:
+            return None, ids  # the change was below this connection's top-N
+        previous, current = set(subscriber.sent), set(ids)
+        return json.dumps({
+            "type": "delta",
+            "version": self.version,
+            "added": [item for item in top if item["food_id"] not in previous],
+            "removed": [food_id for food_id in subscriber.sent if food_id not in current],
+            "order": ids
+        }), ids
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "connections": len(self.subscribers), "version": self.version}
+
+
+# Global instance
+live_hub = LiveHub.from_env()
@@ -0,0 +1,330 @@
+"""
+KD-tree over normalized kcal/macro vectors for instant "similar but healthier" swap queries
+
+One tree per diet style holds only the foods eligible for that diet. Catalog edits go to a
+small delta (new or changed foods, scanned linearly) plus tombstones for replaced or removed
+ones; the trees are rebuilt once the pending edits grow past a fraction of the catalog.
+"""
+import heapq
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .eligibility import food_macro, food_tags
+from .meal_planner import PRICE_TIERS, _diets_for
+
+# Vector axes
+AXES = ("kcal", "protein_g", "carbs_g", "fat_g")
+KCAL, PROTEIN, CARBS, FAT = range(4)
+
+LEAF_SIZE = 16
+# Rebuild once pending edits exceed this share of the catalog (and at least REBUILD_MIN)
+REBUILD_FRACTION = 0.05
+REBUILD_MIN = 256
+
+SWAP_GOALS = ("lower_kcal", "higher_protein", "lower_kcal_higher_protein", "similar")
+# Minimum change for a swap to count as "lower kcal" / "higher protein"
+MIN_KCAL_DROP = 0.10
+MIN_PROTEIN_GAIN = 0.10
+
+Box = Tuple[List[float], List[float]]
+
+
+class IndexedFood:
+    __slots__ = ("id", "name", "category", "raw", "tier", "tags", "diets")
+
+    def __init__(self, food: Dict[str, Any]):
+        self.id = food.get("id")
+        self.name = food.get("name", "")
+        self.category = str(food.get("category", ""))
+        self.raw = (
+            float(food.get("kcal") or 0),
+            food_macro(food, "protein_g"),
+            food_macro(food, "carbs_g"),
+            food_macro(food, "fat_g")
+        )
+        self.tier = PRICE_TIERS.get(food.get("est_price_range"), 2)
+        self.tags = frozenset(food_tags(food))
+        self.diets = _diets_for(self.tags, self.raw[CARBS])
+
+    def same_as(self, other: "IndexedFood") -> bool:
+        return (self.raw, self.tier, self.tags, self.name, self.category) == \
+            (other.raw, other.tier, other.tags, other.name, other.category)
+
+
+class _Node:
+    __slots__ = ("lo", "hi", "axis", "split", "left", "right", "items")
+
+    def __init__(self, lo, hi, axis=-1, split=0.0, left=None, right=None, items=None):
+        self.lo, self.hi = lo, hi
+        self.axis, self.split = axis, split
+        self.left, self.right = left, right
+        self.items = items
+
+
+class KDTree:
+    """Static KD-tree over (raw vector, item) pairs; distances use per-axis scales"""
+
+    def __init__(self, entries: List[Tuple[Tuple[float, ...], IndexedFood]], leaf_size: int = LEAF_SIZE):
+        self.size = len(entries)
+        self.root = self._build(entries, leaf_size) if entries else None
+
+    def _build(self, entries, leaf_size):
+        lo = [min(vector[axis] for vector, _ in entries) for axis in range(4)]
+        hi = [max(vector[axis] for vector, _ in entries) for axis in range(4)]
+        if len(entries) <= leaf_size:
+            return _Node(lo, hi, items=entries)
+        # Split on the widest axis at the median
+        axis = max(range(4), key=lambda a: hi[a] - lo[a])
+        entries.sort(key=lambda entry: entry[0][axis])
+        middle = len(entries) // 2
+        return _Node(
+            lo, hi, axis, entries[middle][0][axis],
+            self._build(entries[:middle], leaf_size),
+            self._build(entries[middle:], leaf_size)
+        )
+
+    def search(
+        self,
+        query: Sequence[float],
+        scales: Sequence[float],
+        box: Box,
+        k: int,
+        accept: Callable[[IndexedFood], bool],
+        results: List[Tuple[float, int, IndexedFood]]
+    ) -> None:
+        """Best-first k-nearest search restricted to box; merges into the max-heap `results`"""
+        if self.root is None:
+            return
+        box_lo, box_hi = box
+        frontier = [(0.0, 0, self.root)]
+        counter = 1
+        while frontier:
+            bound, _, node = heapq.heappop(frontier)
+            if len(results) >= k and bound >= -results[0][0]:
+                break
+            if node.items is not None:
+                for vector, item in node.items:
+                    if not (box_lo[0] <= vector[0] <= box_hi[0] and box_lo[1] <= vector[1] <= box_hi[1]
+                            and box_lo[2] <= vector[2] <= box_hi[2] and box_lo[3] <= vector[3] <= box_hi[3]):
+                        continue
+                    distance = 0.0
+                    for axis in range(4):
+                        delta = (vector[axis] - query[axis]) / scales[axis]
+                        distance += delta * delta
+                    if (len(results) < k or distance < -results[0][0]) and accept(item):
+                        heapq.heappush(results, (-distance, id(item), item))
+                        if len(results) > k:
+                            heapq.heappop(results)
+                continue
+            for child in (node.left, node.right):
+                distance = _box_distance(query, scales, child.lo, child.hi, box)
+                if distance is not None and (len(results) < k or distance < -results[0][0]):
+                    heapq.heappush(frontier, (distance, counter, child))
+                    counter += 1
+
+
+def _box_distance(query, scales, lo, hi, box: Box) -> Optional[float]:
+    """Squared scaled distance from query to the node box clipped by the constraint box, None if disjoint"""
+    box_lo, box_hi = box
+    distance = 0.0
+    for axis in range(4):
+        low = lo[axis] if lo[axis] > box_lo[axis] else box_lo[axis]
+        high = hi[axis] if hi[axis] < box_hi[axis] else box_hi[axis]
+        if low > high:
+            return None
+        value = query[axis]
+        if value < low:
+            delta = (low - value) / scales[axis]
+        elif value > high:
+            delta = (value - high) / scales[axis]
+        else:
+            continue
+        distance += delta * delta
+    return distance
+
+
+class MacroIndex:
+    """Per-diet KD-trees with an incremental delta for catalog edits
+
+    Not thread-safe: apply edits and run queries from one thread at a time.
+    """
+
+    def __init__(self, foods: Iterable[Dict[str, Any]] = (), leaf_size: int = LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self.items: Dict[str, IndexedFood] = {}
+        self._trees: Dict[str, KDTree] = {}
+        self._delta: Dict[str, IndexedFood] = {}
+        self._tombstones: set = set()
+        self.scales = [1.0, 1.0, 1.0, 1.0]
+        self.rebuilds = 0
+        for food in foods:
+            item = IndexedFood(food)
+            self.items[item.id] = item
+        self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def rebuild(self) -> None:
+        """Recompute the axis scales and rebuild every diet's tree, folding in pending edits"""
+        items = list(self.items.values())
+        if items:
+            for axis in range(4):
+                values = [item.raw[axis] for item in items]
+                mean = sum(values) / len(values)
+                spread = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+                self.scales[axis] = spread or 1.0
+        diets = set().union(*(item.diets for item in items))
+        self._trees = {
+            diet: KDTree([(item.raw, item) for item in items if diet in item.diets], self.leaf_size)
+            for diet in diets
+        }
+        self._delta.clear()
+        self._tombstones.clear()
+        self.rebuilds += 1
+
+    def upsert(self, food: Dict[str, Any]) -> bool:
+        """Add or update a food; returns False when nothing changed"""
+        item = IndexedFood(food)
+        current = self.items.get(item.id)
+        if current is not None and current.same_as(item):
+            return False
+        if current is not None and item.id not in self._delta:
+            self._tombstones.add(item.id)
+        self.items[item.id] = item
+        self._delta[item.id] = item
+        self._maybe_rebuild()
+        return True
+
+    def remove(self, food_id: str) -> bool:
+        if food_id not in self.items:
+            return False
+        del self.items[food_id]
+        if self._delta.pop(food_id, None) is None or food_id in self._tombstones:
+            self._tombstones.add(food_id)
+        self._maybe_rebuild()
+        return True
+
+    def sync(self, foods: Iterable[Dict[str, Any]]) -> int:
+        """Apply the difference between the index and a full catalog listing; returns edits applied"""
+        if not self.items:
+            # First load: build directly instead of growing a delta
+            for food in foods:
+                item = IndexedFood(food)
+                self.items[item.id] = item
+            self.rebuild()
+            return len(self.items)
+        seen = set()
+        edits = 0
+        for food in foods:
+            seen.add(food["id"])
+            edits += self.upsert(food)
+        for food_id in [food_id for food_id in self.items if food_id not in seen]:
+            edits += self.remove(food_id)
+        return edits
+
+    def _maybe_rebuild(self) -> None:
+        pending = len(self._delta) + len(self._tombstones)
+        if pending > max(REBUILD_MIN, REBUILD_FRACTION * len(self.items)):
+            self.rebuild()
+
+    def nearest(
+        self,
+        query: Sequence[float],
+        k: int = 3,
+        diet: str = "omnivore",
+        box: Optional[Box] = None,
+        accept: Callable[[IndexedFood], bool] = lambda item: True
+    ) -> List[Tuple[float, IndexedFood]]:
+        """k nearest eligible foods within the constraint box, nearest first"""
+        box = box or ([-math.inf] * 4, [math.inf] * 4)
+        tombstones = self._tombstones
+
+        def live(item: IndexedFood) -> bool:
+            return item.id not in tombstones and accept(item)
+
+        results: List[Tuple[float, int, IndexedFood]] = []
+        tree = self._trees.get(diet)
+        if tree is not None:
+            tree.search(query, self.scales, box, k, live, results)
+
+        # Pending edits are few; scan them directly
+        box_lo, box_hi = box
+        for item in self._delta.values():
+            if diet not in item.diets or not accept(item):
+                continue
+            if not all(box_lo[axis] <= item.raw[axis] <= box_hi[axis] for axis in range(4)):
+                continue
+            distance = sum(((item.raw[axis] - query[axis]) / self.scales[axis]) ** 2 for axis in range(4))
+            if len(results) < k or distance < -results[0][0]:
+                heapq.heappush(results, (-distance, id(item), item))
+                if len(results) > k:
+                    heapq.heappop(results)
+
+        return [(math.sqrt(-negative), item) for negative, _, item in sorted(results, reverse=True)]
+
+    def swaps(
+        self,
+        food: Dict[str, Any],
+        user_prefs: Dict[str, Any],
+        goal: str = "lower_kcal",
+        k: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Foods closest in macro space to `food` that improve on it for the goal"""
+        current = IndexedFood(food)
+        allowed = swap_filter(user_prefs)
+        matches = self.neighbours(
+            current,
+            user_prefs.get("diet_style") or "omnivore",
+            goal,
+            k,
+            lambda item: allowed(item.name, item.tags, item.tier)
+        )
+        return [describe_swap(current, item, distance) for distance, item in matches]
+
+    def neighbours(
+        self,
+        current: IndexedFood,
+        diet: str,
+        goal: str,
+        k: int,
+        accept: Callable[[IndexedFood], bool] = lambda item: True
+    ) -> List[Tuple[float, IndexedFood]]:
+        """Nearest foods of a diet that improve on `current` for the goal"""
+        lo, hi = [-math.inf] * 4, [math.inf] * 4
+        if goal in ("lower_kcal", "lower_kcal_higher_protein"):
+            hi[KCAL] = current.raw[KCAL] * (1 - MIN_KCAL_DROP)
+        if goal in ("higher_protein", "lower_kcal_higher_protein"):
+            lo[PROTEIN] = current.raw[PROTEIN] * (1 + MIN_PROTEIN_GAIN) + 1.0
+        return self.nearest(current.raw, k, diet, (lo, hi), lambda item: item.id != current.id and accept(item))
+
+
+def swap_filter(user_prefs: Dict[str, Any]) -> Callable[[str, Iterable[str], int], bool]:
+    """Budget and dislike check for a candidate swap, given its name, tags and price tier"""
+    max_tier = PRICE_TIERS.get(user_prefs.get("budget"), 2)
+    dislikes = [dislike.lower() for dislike in user_prefs.get("dislikes") or []]
+
+    def allowed(name: str, tags: Iterable[str], tier: int) -> bool:
+        if tier > max_tier:
+            return False
+        name = name.lower()
+        return not any(dislike in tags or dislike in name for dislike in dislikes)
+
+    return allowed
+
+
+def describe_swap(current: IndexedFood, item: IndexedFood, distance: float) -> Dict[str, Any]:
+    kcal_change = item.raw[KCAL] - current.raw[KCAL]
+    protein_change = item.raw[PROTEIN] - current.raw[PROTEIN]
+    gains = []
+    if kcal_change < 0:
+        gains.append(f"{-kcal_change:.0f} fewer kcal")
+    if protein_change > 0:
+        gains.append(f"{protein_change:.0f}g more protein")
+    return {
+        "food_id": item.id,
+        "name": item.name,
+        "improvement": " and ".join(gains) or "similar macros",
+        "nutrition_gain": f"{kcal_change:+.0f} kcal, {protein_change:+.0f}g protein",
+        "similarity": round(1 / (1 + distance), 3)
+    }
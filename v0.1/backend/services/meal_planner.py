@@ -0,0 +1,363 @@
+"""
+Deterministic local meal-plan optimizer
+
+Picks breakfast, lunch, dinner and snacks for N days from the full eligible catalog so each
+day lands close to kcal and macro targets, under the user's budget tier and variety rules.
+Per slot a shortlist is built once by walking outward from the slot's kcal target in a
+kcal-sorted catalog; each day then starts greedy and is improved by coordinate descent
+over the shortlists.
+"""
+import bisect
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .cpu_pool import SharedRef, load_shared
+from .eligibility import DIET_EXCLUDED_TAGS, DIET_TAGS, KETO_MAX_CARBS_G, food_macro
+
+SLOTS = ("breakfast", "lunch", "dinner", "snacks")
+
+# Share of the daily targets per slot
+SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.30, "snacks": 0.10}
+
+# Categories that suit a slot; other categories are used only if a slot runs short
+SLOT_CATEGORIES = {
+    "breakfast": {"drink", "bowl", "wrap", "snack"},
+    "lunch": {"bowl", "wrap", "salad"},
+    "dinner": {"bowl", "salad", "wrap"},
+    "snacks": {"snack", "drink"},
+}
+
+PRICE_TIERS = {"$": 1, "$$": 2, "$$$": 3}
+# Rough cost per item by price tier, for the weekly cost estimate
+TIER_COST = {1: 8.0, 2: 14.0, 3: 22.0}
+
+# Share of calories from protein, carbs and fat
+MACRO_SPLITS = {
+    "omnivore": (0.25, 0.45, 0.30),
+    "keto": (0.25, 0.05, 0.70),
+}
+
+SHORTLIST_SIZE = 30
+# Foods examined per slot when building a shortlist, before giving up on preferred categories
+MAX_SCAN = 4000
+SEARCH_PASSES = 3
+
+# Objective weights: squared relative error per target, plus penalties
+TARGET_WEIGHTS = {"kcal": 2.0, "protein_g": 1.0, "carbs_g": 0.6, "fat_g": 0.6}
+RECENT_REPEAT_PENALTY = 1.0  # food already used within the variety window
+REPEAT_PENALTY = 0.05  # per earlier use in the plan
+SAME_CATEGORY_PENALTY = 0.02  # per other slot of the same category that day
+PRICE_PENALTY = 0.01  # per price tier step, so cheaper options win ties
+
+
+@dataclass
+class CatalogSnapshot:
+    """Column-oriented catalog sorted by kcal, compiled once per catalog version"""
+    ids: List[str]
+    names: List[str]
+    categories: List[str]
+    kcal: List[float]
+    protein: List[float]
+    carbs: List[float]
+    fat: List[float]
+    tiers: List[int]
+    tags: List[frozenset]
+    diets: List[frozenset]  # diet styles the food is eligible for
+    by_diet: Dict[str, List[int]]  # kcal-sorted indexes of the foods eligible for each diet
+    kcal_by_diet: Dict[str, List[float]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _diets_for(tags: frozenset, carbs: float) -> frozenset:
+    diets = {"omnivore"}
+    for diet, required in DIET_TAGS.items():
+        if tags & required:
+            diets.add(diet)
+    for diet, excluded in DIET_EXCLUDED_TAGS.items():
+        if not tags & excluded:
+            diets.add(diet)
+    if carbs <= KETO_MAX_CARBS_G:
+        diets.add("keto")
+    return frozenset(diets)
+
+
+def compile_catalog(foods: Sequence[Dict[str, Any]]) -> CatalogSnapshot:
+    """Build a kcal-sorted snapshot from food dicts (API models or flat DB rows)"""
+    rows = []
+    for food in foods:
+        tags = food.get("tags") or []
+        if isinstance(tags, str):
+            tags = json.loads(tags)
+        tags = frozenset(tag.lower() for tag in tags)
+        carbs = food_macro(food, "carbs_g")
+        rows.append((
+            float(food.get("kcal") or 0),
+            food["id"],
+            food.get("name", ""),
+            str(food.get("category", "")),
+            food_macro(food, "protein_g"),
+            carbs,
+            food_macro(food, "fat_g"),
+            PRICE_TIERS.get(food.get("est_price_range"), 2),
+            tags,
+            _diets_for(tags, carbs)
+        ))
+    rows.sort(key=lambda row: row[0])
+    columns = list(zip(*rows)) if rows else [[] for _ in range(10)]
+    by_diet: Dict[str, List[int]] = {}
+    for index, diets in enumerate(columns[9]):
+        for diet in diets:
+            by_diet.setdefault(diet, []).append(index)
+    return CatalogSnapshot(
+        by_diet=by_diet,
+        kcal_by_diet={diet: [columns[0][i] for i in indexes] for diet, indexes in by_diet.items()},
+        kcal=list(columns[0]),
+        ids=list(columns[1]),
+        names=list(columns[2]),
+        categories=list(columns[3]),
+        protein=list(columns[4]),
+        carbs=list(columns[5]),
+        fat=list(columns[6]),
+        tiers=list(columns[7]),
+        tags=list(columns[8]),
+        diets=list(columns[9])
+    )
+
+
+def daily_targets(
+    health_context: Dict[str, Any],
+    goals: Optional[Dict[str, Any]] = None,
+    diet: str = "omnivore"
+) -> Dict[str, float]:
+    """Daily kcal and macro targets, from explicit goals or the activity level"""
+    protein_share, carbs_share, fat_share = MACRO_SPLITS.get(diet, MACRO_SPLITS["omnivore"])
+    if goals and goals.get("calories"):
+        calories = float(goals["calories"])
+    else:
+        calories = float({"none": 1800, "light": 2000, "moderate": 2200, "intense": 2600}.get(
+            health_context.get("activity_level", "moderate"), 2200
+        ))
+    goals = goals or {}
+    return {
+        "kcal": calories,
+        "protein_g": float(goals.get("protein_g") or calories * protein_share / 4),
+        "carbs_g": float(goals.get("carbs_g") or calories * carbs_share / 4),
+        "fat_g": float(goals.get("fat_g") or calories * fat_share / 9)
+    }
+
+
+class MealPlanner:
+    """Plans days over a compiled catalog snapshot"""
+
+    def __init__(self, catalog: CatalogSnapshot, variety_days: int = 3):
+        self.catalog = catalog
+        self.variety_days = variety_days
+
+    def _admissible(self, index: int, max_tier: int, dislikes: Sequence[str]) -> bool:
+        catalog = self.catalog
+        if catalog.tiers[index] > max_tier:
+            return False
+        if dislikes:
+            name = catalog.names[index].lower()
+            tags = catalog.tags[index]
+            for dislike in dislikes:
+                if dislike in tags or dislike in name:
+                    return False
+        return True
+
+    def _slot_distance(self, index: int, target: Dict[str, float]) -> float:
+        catalog = self.catalog
+        values = (catalog.kcal[index], catalog.protein[index], catalog.carbs[index], catalog.fat[index])
+        distance = 0.0
+        for value, (name, weight) in zip(values, TARGET_WEIGHTS.items()):
+            goal = target[name] or 1.0
+            distance += weight * ((value - goal) / goal) ** 2
+        return distance
+
+    def shortlist(
+        self,
+        slot: str,
+        target: Dict[str, float],
+        diet: str,
+        max_tier: int,
+        dislikes: Sequence[str]
+    ) -> List[int]:
+        """Best-fitting admissible foods for a slot, scanning outward from its kcal target"""
+        catalog = self.catalog
+        preferred = SLOT_CATEGORIES[slot]
+        indexes = catalog.by_diet.get(diet, [])
+        kcal = catalog.kcal_by_diet.get(diet, [])
+        center = bisect.bisect_left(kcal, target["kcal"])
+        low, high = center - 1, center
+        matches: List[int] = []
+        others: List[int] = []
+        scanned = 0
+        pool = SHORTLIST_SIZE * 8
+
+        while (low >= 0 or high < len(indexes)) and len(matches) < pool and scanned < MAX_SCAN:
+            # Take whichever neighbour is closer in kcal
+            if high >= len(indexes) or (low >= 0 and target["kcal"] - kcal[low] <= kcal[high] - target["kcal"]):
+                position, low = low, low - 1
+            else:
+                position, high = high, high + 1
+            index = indexes[position]
+            scanned += 1
+            if not self._admissible(index, max_tier, dislikes):
+                continue
+            if catalog.categories[index] in preferred:
+                matches.append(index)
+            elif len(others) < pool:
+                others.append(index)
+
+        candidates = matches if len(matches) >= SHORTLIST_SIZE else matches + others
+        candidates.sort(key=lambda index: self._slot_distance(index, target))
+        return candidates[:SHORTLIST_SIZE]
+
+    def _day_cost(
+        self,
+        picks: Dict[str, int],
+        targets: Dict[str, float],
+        recent: set,
+        uses: Dict[int, int]
+    ) -> float:
+        catalog = self.catalog
+        totals = {"kcal": 0.0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0}
+        penalty = 0.0
+        categories: Dict[str, int] = {}
+        for index in picks.values():
+            totals["kcal"] += catalog.kcal[index]
+            totals["protein_g"] += catalog.protein[index]
+            totals["carbs_g"] += catalog.carbs[index]
+            totals["fat_g"] += catalog.fat[index]
+            if index in recent:
+                penalty += RECENT_REPEAT_PENALTY
+            penalty += REPEAT_PENALTY * uses.get(index, 0) + PRICE_PENALTY * catalog.tiers[index]
+            categories[catalog.categories[index]] = categories.get(catalog.categories[index], 0) + 1
+        penalty += SAME_CATEGORY_PENALTY * sum(count - 1 for count in categories.values())
+        # The same food twice in one day is worse than any recent repeat
+        penalty += 2 * RECENT_REPEAT_PENALTY * (len(picks) - len(set(picks.values())))
+
+        error = 0.0
+        for name, weight in TARGET_WEIGHTS.items():
+            goal = targets[name] or 1.0
+            error += weight * ((totals[name] - goal) / goal) ** 2
+        return error + penalty
+
+    def plan(
+        self,
+        days: int,
+        targets: Dict[str, float],
+        diet: str = "omnivore",
+        budget: str = "$$",
+        dislikes: Sequence[str] = ()
+    ) -> List[Dict[str, int]]:
+        """Return one {slot: catalog index} dict per day"""
+        max_tier = PRICE_TIERS.get(budget, 2)
+        dislikes = [dislike.lower() for dislike in dislikes]
+        shortlists = {}
+        for slot in SLOTS:
+            slot_target = {name: value * SLOT_SHARES[slot] for name, value in targets.items()}
+            shortlists[slot] = self.shortlist(slot, slot_target, diet, max_tier, dislikes)
+        slots = [slot for slot in SLOTS if shortlists[slot]]
+        if not slots:
+            return [{} for _ in range(days)]
+
+        history: List[Dict[str, int]] = []
+        uses: Dict[int, int] = {}
+        for _ in range(days):
+            recent = {index for day in history[-self.variety_days:] for index in day.values()}
+
+            # Greedy start: best-fitting shortlisted food per slot not used recently
+            picks = {}
+            for slot in slots:
+                fresh = [index for index in shortlists[slot] if index not in recent and index not in picks.values()]
+                picks[slot] = (fresh or shortlists[slot])[0]
+
+            # Local search: re-pick one slot at a time against the whole day
+            best = self._day_cost(picks, targets, recent, uses)
+            for _ in range(SEARCH_PASSES):
+                improved = False
+                for slot in slots:
+                    current = picks[slot]
+                    for index in shortlists[slot]:
+                        if index == current:
+                            continue
+                        picks[slot] = index
+                        cost = self._day_cost(picks, targets, recent, uses)
+                        if cost < best:
+                            best, current, improved = cost, index, True
+                    picks[slot] = current
+                if not improved:
+                    break
+
+            history.append(dict(picks))
+            for index in picks.values():
+                uses[index] = uses.get(index, 0) + 1
+        return history
+
+    def totals(self, picks: Dict[str, int]) -> Dict[str, float]:
+        catalog = self.catalog
+        return {
+            "kcal": round(sum(catalog.kcal[i] for i in picks.values()), 1),
+            "protein_g": round(sum(catalog.protein[i] for i in picks.values()), 1),
+            "carbs_g": round(sum(catalog.carbs[i] for i in picks.values()), 1),
+            "fat_g": round(sum(catalog.fat[i] for i in picks.values()), 1)
+        }
+
+    def render(self, history: List[Dict[str, int]], targets: Dict[str, float]) -> Dict[str, Any]:
+        """Plan in the API's day_N shape, with shopping list, cost and per-day totals"""
+        catalog = self.catalog
+        plan: Dict[str, Any] = {}
+        shopping: Dict[str, None] = {}
+        cost = 0.0
+        for day, picks in enumerate(history, start=1):
+            meals = {}
+            for slot, index in picks.items():
+                meals[slot] = {
+                    "food_id": catalog.ids[index],
+                    "reason": f"{catalog.kcal[index]:.0f} kcal, {catalog.protein[index]:.0f}g protein toward the {slot} target"
+                }
+                shopping[catalog.names[index]] = None
+                cost += TIER_COST[catalog.tiers[index]]
+            plan[f"day_{day}"] = meals
+        plan["shopping_list"] = list(shopping)
+        plan["total_weekly_cost"] = f"${cost * 7 / max(len(history), 1):.0f}"
+        plan["daily_targets"] = {name: round(value, 1) for name, value in targets.items()}
+        plan["daily_totals"] = {f"day_{day}": self.totals(picks) for day, picks in enumerate(history, start=1)}
+        return plan
+
+
+def plan_meals(
+    catalog: CatalogSnapshot,
+    user_prefs: Dict[str, Any],
+    health_context: Dict[str, Any],
+    days: int = 3,
+    goals: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Plan N days for a user over a compiled catalog"""
+    planner = MealPlanner(catalog)
+    diet = user_prefs.get("diet_style") or "omnivore"
+    targets = daily_targets(health_context, goals, diet)
+    history = planner.plan(
+        days,
+        targets,
+        diet=diet,
+        budget=user_prefs.get("budget") or "$$",
+        dislikes=user_prefs.get("dislikes") or []
+    )
+    return planner.render(history, targets)
+
+
+def plan_meals_task(
+    catalog: Union[CatalogSnapshot, SharedRef],
+    user_prefs: Dict[str, Any],
+    health_context: Dict[str, Any],
+    days: int = 3
+) -> Dict[str, Any]:
+    """Process-pool entry point; a shared catalog is loaded once per worker"""
+    if isinstance(catalog, SharedRef):
+        catalog = load_shared(catalog)
+    return plan_meals(catalog, user_prefs, health_context, days)
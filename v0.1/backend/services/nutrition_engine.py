@@ -1,16 +1,53 @@
 """
 AI-Powered Nutrition Engine using ChatGPT API
 """
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timedelta
+import asyncio
 import logging
+from db.database import catalog_version, get_db
 from .ai_service import ai_service
+from .eligibility import eligible_foods, food_macro
+from .cooccurrence import cooccurrence
+from .cpu_pool import CpuPoolSaturatedError, SharedRef, cpu_pool
+from .preferences import preference_store
+from .job_queue import job_queue
+from .macro_index import MacroIndex
+from .swap_table import lookup_swaps
+from .state_table import ANY_AREA, lookup_state_picks, rank_live, table_version
+from .similarity import SimilarityIndex, build_similarity_index, diversify
+from .meal_planner import CatalogSnapshot, compile_catalog, plan_meals_task
+from .json_stream import extract_json
+from .prompt_builder import prompt_builder
 
 logger = logging.getLogger(__name__)
 
+# Ranking boost per unit of co-occurrence affinity with recently logged foods
+COOCCURRENCE_BOOST = 0.3
+# Ranking boost for a perfect match with the user's learned preferences
+PREFERENCE_BOOST = 0.3
+# Foods sent to the model per requested recommendation
+CANDIDATES_PER_RECOMMENDATION = 3
+MIN_CANDIDATES = 12
+# Wait between tries when the CPU pool is too busy to take a background index build
+POOL_RETRY_SECONDS = 1.0
+
 class NutritionEngine:
     def __init__(self):
         self.ai_service = ai_service
+        self._catalog: Optional[Tuple[str, CatalogSnapshot, Optional[SharedRef]]] = None
+        self._catalog_lock = asyncio.Lock()
+        self.swap_index = MacroIndex()
+        self._swap_index_version: Optional[str] = None
+        self._swap_index_lock = asyncio.Lock()
+        self._swap_table_requested: Optional[str] = None
+        self.swap_stats = {"table": 0, "live": 0}
+        self._state_table_requested: Optional[str] = None
+        self.state_stats = {"table": 0, "live": 0}
+        self.similarity_index = SimilarityIndex()
+        self._similarity_version: Optional[str] = None
+        self._similarity_build: Optional[asyncio.Task] = None
         
     async def calculate_daily_nutrition_goals(
         self, 
@@ -19,32 +56,31 @@ class NutritionEngine:
     ) -> Dict[str, Any]:
         """Calculate personalized daily nutrition goals using AI"""
         
-        prompt = f"""
-        Calculate daily nutrition goals for:
-        - Age: {user_profile.get('age', 30)}
-        - Weight: {user_profile.get('weight', 70)}kg
-        - Height: {user_profile.get('height', 170)}cm
-        - Activity: {health_context.get('activity_level', 'moderate')}
-        - Sleep: {health_context.get('sleep_hours', 8)} hours
-        - Goals: {user_profile.get('goals', 'maintain')}
-        
-        Return JSON: {{
-            "calories": 2000,
-            "protein_g": 150,
-            "carbs_g": 250,
-            "fat_g": 67,
-            "fiber_g": 25,
-            "reasoning": "Based on moderate activity and maintenance goals"
-        }}
-        """
-        
         try:
-            response = await self.ai_service._call_chatgpt(prompt, max_tokens=400)
-            return self._parse_nutrition_goals(response)
+            return await self.fetch_daily_nutrition_goals(user_profile, health_context)
         except Exception as e:
             logger.error(f"Error calculating nutrition goals: {e}")
             return self._fallback_nutrition_goals(user_profile, health_context)
     
+    async def fetch_daily_nutrition_goals(
+        self,
+        user_profile: Dict[str, Any],
+        health_context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Get daily goals from the model, raising instead of falling back"""
+        prompt = prompt_builder.daily_goals(user_profile, health_context)
+        response = await self.ai_service._call_chatgpt(prompt, max_tokens=400, endpoint="daily_goals")
+        return self._parse_nutrition_goals(response)
+    
+    async def fetch_cost_optimization_tips(self) -> Dict[str, Any]:
+        """Get cost tips from the model; the prompt is static, so the answer is cacheable"""
+        prompt = prompt_builder.cost_tips()
+        response = await self.ai_service._call_chatgpt(prompt, max_tokens=600, endpoint="cost_optimization")
+        tips = extract_json(response, "{")
+        if not tips:
+            raise ValueError("No JSON object in response")
+        return tips
+    
     async def analyze_meal_balance(
         self, 
         meal_foods: List[Dict[str, Any]], 
@@ -56,29 +92,10 @@ class NutritionEngine:
         # Calculate meal totals
         meal_totals = self._calculate_meal_totals(meal_foods)
         
-        prompt = f"""
-        Analyze this {meal_type} meal balance:
-        
-        Meal totals: {meal_totals}
-        Daily goals: {daily_goals}
-        
-        Consider:
-        - Macronutrient ratios
-        - Meal timing appropriateness
-        - Satiety factors
-        - Nutrient density
-        
-        Return JSON: {{
-            "balance_score": 0.8,
-            "strengths": ["good protein", "adequate calories"],
-            "weaknesses": ["low fiber", "high sodium"],
-            "suggestions": ["add vegetables", "choose whole grains"],
-            "next_meal_focus": "fiber and micronutrients"
-        }}
-        """
+        prompt = prompt_builder.meal_analysis(meal_type, meal_totals, daily_goals)
         
         try:
-            response = await self.ai_service._call_chatgpt(prompt, max_tokens=500)
+            response = await self.ai_service._call_chatgpt(prompt, max_tokens=500, endpoint="meal_analysis")
             return self._parse_meal_analysis(response)
         except Exception as e:
             logger.error(f"Error analyzing meal balance: {e}")
@@ -88,71 +105,205 @@ class NutritionEngine:
         self, 
         current_food: Dict[str, Any], 
         user_prefs: Dict[str, Any],
-        available_foods: List[Dict[str, Any]]
+        available_foods: List[Dict[str, Any]],
+        goal: str = "lower_kcal",
+        k: int = 3
     ) -> List[Dict[str, Any]]:
-        """Suggest healthier food swaps using AI"""
+        """Suggest the foods nearest in macro space that improve on current_food for the goal.
         
-        prompt = f"""
-        Suggest 3 healthier alternatives to: {current_food['name']}
-        
-        Current nutrition: {current_food.get('macros', {})} - {current_food.get('kcal', 0)} kcal
-        
-        User preferences: {user_prefs}
+        Catalog swaps come from the precomputed table when it covers the food; the live
+        index answers the rest and any request that sends its own food list.
+        """
         
-        Available alternatives: {[f"{f['name']} ({f['kcal']}kcal)" for f in available_foods[:10]]}
+        if available_foods:
+            return MacroIndex(available_foods).swaps(current_food, user_prefs, goal, k)
+        
+        version = self._catalog_version()
+        self.refresh_swap_table(version)
+        diet = user_prefs.get("diet_style") or "omnivore"
+        swaps = lookup_swaps(current_food.get("id"), diet, goal, version, user_prefs, k)
+        if swaps is not None:
+            self.swap_stats["table"] += 1
+            return swaps
+        self.swap_stats["live"] += 1
+        index = await self._synced_swap_index(version)
+        return index.swaps(current_food, user_prefs, goal, k)
+    
+    def refresh_swap_table(self, version: Optional[str] = None) -> None:
+        """Queue a swap table build once per catalog version; the job skips rows already current"""
+        version = version or self._catalog_version()
+        if version != self._swap_table_requested:
+            job_queue.enqueue("swap_table", {"version": version})
+            self._swap_table_requested = version
+    
+    async def state_picks(
+        self,
+        user_state: str,
+        area: Optional[str],
+        user_prefs: Dict[str, Any],
+        k: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Top foods for a detected wearable state in an area, read from the precomputed table.
         
-        Return JSON: [
-            {{
-                "food_id": "food_002",
-                "name": "Grilled Chicken Salad",
-                "improvement": "Lower calories, higher protein",
-                "nutrition_gain": "More fiber, less sodium"
-            }}
-        ]
+        Keys the table does not cover yet (first start, new area, heavy filtering) are ranked
+        live over the catalog.
         """
+        version = table_version(self._catalog_version())
+        self.refresh_state_table(version)
+        area = (area or ANY_AREA).lower()
+        diet = user_prefs.get("diet_style") or "omnivore"
+        picks = lookup_state_picks(user_state, area, diet, version, user_prefs, k)
+        if picks is not None:
+            self.state_stats["table"] += 1
+            return picks
+        self.state_stats["live"] += 1
+        return await asyncio.to_thread(self._rank_state_live, user_state, area, diet, user_prefs, k)
+    
+    def refresh_state_table(self, version: Optional[str] = None) -> None:
+        """Queue a state table build once per catalog and rules version"""
+        version = version or table_version(self._catalog_version())
+        if version != self._state_table_requested:
+            job_queue.enqueue("state_table", {"version": version})
+            self._state_table_requested = version
+    
+    def _rank_state_live(self, user_state: str, area: str, diet: str, user_prefs: Dict[str, Any], k: int) -> List[Dict[str, Any]]:
+        with get_db() as db:
+            foods = [dict(row) for row in db.execute("SELECT * FROM foods")]
+        return rank_live(foods, user_state, area, diet, user_prefs, k)
+    
+    async def _synced_swap_index(self, version: str) -> MacroIndex:
+        """The catalog-wide swap index, brought up to date when the foods table changed"""
+        if version != self._swap_index_version:
+            async with self._swap_index_lock:
+                if version != self._swap_index_version:
+                    edits = await asyncio.to_thread(self._sync_swap_index)
+                    logger.info(f"Swap index synced with {edits} catalog edits")
+                    self._swap_index_version = version
+        return self.swap_index
+    
+    def _sync_swap_index(self) -> int:
+        with get_db() as db:
+            return self.swap_index.sync(dict(row) for row in db.execute("SELECT * FROM foods"))
+    
+    async def similar_foods(self, food_id: str, k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Catalog foods that share the most tags, category and chains with food_id; None if unknown.
         
-        try:
-            response = await self.ai_service._call_chatgpt(prompt, max_tokens=600)
-            return self._parse_food_swaps(response)
-        except Exception as e:
-            logger.error(f"Error suggesting food swaps: {e}")
-            return []
+        After a catalog change the previous index keeps answering while the new one is built in
+        the background; only the first build, and foods the previous index does not know yet,
+        wait for it.
+        """
+        version = self._catalog_version()
+        if version != self._similarity_version:
+            build = self._refresh_similarity_index(version)
+            if self._similarity_version is None or food_id not in self.similarity_index.vector_of:
+                await asyncio.shield(build)
+        if food_id not in self.similarity_index.vector_of:
+            return None
+        return self.similarity_index.similar(food_id, k)
+    
+    def _refresh_similarity_index(self, version: str) -> asyncio.Task:
+        """The index build in progress, or a new one for version; the result is swapped in when done"""
+        if self._similarity_build is None or self._similarity_build.done():
+            self._similarity_build = asyncio.ensure_future(self._swap_in_similarity_index(version))
+            self._similarity_build.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._similarity_build
+    
+    async def _swap_in_similarity_index(self, version: str) -> None:
+        # Built in the CPU pool: a large catalog takes long enough to stall the event loop on a thread
+        while True:
+            try:
+                index = await cpu_pool.run(build_similarity_index)
+                break
+            except CpuPoolSaturatedError:
+                await asyncio.sleep(POOL_RETRY_SECONDS)
+            except Exception as e:
+                logger.error(f"Error building similarity index: {e}")
+                raise
+        self.similarity_index, self._similarity_version = index, version
     
     async def generate_meal_plan(
         self, 
         user_prefs: Dict[str, Any],
         health_context: Dict[str, Any],
         available_foods: List[Dict[str, Any]],
-        days: int = 3
+        days: int = 3,
+        narrate: bool = False
     ) -> Dict[str, Any]:
-        """Generate AI-powered meal plan"""
-        
-        prompt = f"""
-        Create a {days}-day meal plan:
-        
-        User: {user_prefs.get('diet_style', 'omnivore')}, budget {user_prefs.get('budget', '$$')}
-        Health: {health_context.get('activity_level', 'moderate')} activity, {health_context.get('sleep_hours', 8)}h sleep
-        Available foods: {[f"{f['name']} ({f['kcal']}kcal)" for f in available_foods[:15]]}
-        
-        Return JSON: {{
-            "day_1": {{
-                "breakfast": {{"food_id": "food_001", "reason": "High protein start"}},
-                "lunch": {{"food_id": "food_002", "reason": "Balanced nutrition"}},
-                "dinner": {{"food_id": "food_003", "reason": "Light and healthy"}}
-            }},
-            "day_2": {{...}},
-            "day_3": {{...}},
-            "shopping_list": ["ingredient1", "ingredient2"],
-            "total_weekly_cost": "$45"
-        }}
-        """
+        """Generate a meal plan with the local optimizer"""
+        plan = {}
+        async with aclosing(self.stream_meal_plan(user_prefs, health_context, available_foods, days, narrate)) as stream:
+            async for key, value in stream:
+                plan[key] = value
+        return plan
+    
+    async def stream_meal_plan(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        available_foods: List[Dict[str, Any]],
+        days: int = 3,
+        narrate: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield plan members (day_1, day_2, ..., shopping_list), then an optional LLM narration"""
+        
+        # Planning is local and deterministic and runs in the CPU pool; the model only narrates the finished plan
+        async with self._catalog_snapshot(available_foods) as (catalog, shared):
+            plan = await cpu_pool.run(plan_meals_task, shared or catalog, user_prefs, health_context, days)
+        for key, value in plan.items():
+            yield key, value
+        
+        if narrate and self.ai_service.ai_enabled:
+            foods_by_id = dict(zip(catalog.ids, catalog.names))
+            prompt = prompt_builder.meal_plan_narration(user_prefs, health_context, plan, foods_by_id)
+            try:
+                response = await self.ai_service._call_chatgpt(prompt, max_tokens=300, endpoint="meal_plan")
+                narration = extract_json(response, "{")
+                if narration:
+                    yield "narration", narration
+            except Exception as e:
+                logger.error(f"Error narrating meal plan: {e}")
+    
+    @asynccontextmanager
+    async def _catalog_snapshot(
+        self,
+        available_foods: List[Dict[str, Any]]
+    ) -> AsyncIterator[Tuple[CatalogSnapshot, Optional[SharedRef]]]:
+        """Compile the request's foods, or the full catalog when none were sent.
         
+        The full catalog is compiled and published to the CPU pool's shared memory once per
+        version, so plan calls pass a small reference instead of pickling the catalog. The
+        reference is held until the block exits, so publishing a newer version meanwhile does
+        not unlink it under a running plan.
+        """
+        if available_foods:
+            yield compile_catalog(available_foods), None
+            return
+        
+        version = self._catalog_version()
+        async with self._catalog_lock:
+            if self._catalog is None or self._catalog[0] != version:
+                self._catalog = (version, await asyncio.to_thread(self._compile_db_catalog), None)
+            version, catalog, shared = self._catalog
+            if cpu_pool.running and shared is None:
+                shared = await asyncio.to_thread(cpu_pool.publish, "catalog", catalog)
+                self._catalog = (version, catalog, shared)
+            if not cpu_pool.running:
+                shared = None
+            if shared is not None:
+                cpu_pool.acquire(shared)
         try:
-            response = await self.ai_service._call_chatgpt(prompt, max_tokens=1000)
-            return self._parse_meal_plan(response)
-        except Exception as e:
-            logger.error(f"Error generating meal plan: {e}")
-            return self._fallback_meal_plan(available_foods, days)
+            yield catalog, shared
+        finally:
+            if shared is not None:
+                cpu_pool.release(shared)
+    
+    def _catalog_version(self) -> str:
+        with get_db() as db:
+            return catalog_version(db)
+    
+    def _compile_db_catalog(self) -> CatalogSnapshot:
+        with get_db() as db:
+            return compile_catalog([dict(row) for row in db.execute("SELECT * FROM foods")])
     
     async def analyze_nutrition_trends(
         self, 
@@ -161,36 +312,209 @@ class NutritionEngine:
     ) -> Dict[str, Any]:
         """Analyze nutrition trends over time using AI"""
         
-        # Calculate period totals
+        try:
+            return await self.fetch_nutrition_trends(consumption_logs, time_period)
+        except Exception as e:
+            logger.error(f"Error analyzing trends: {e}")
+            return self._fallback_trend_analysis(self._calculate_period_totals(consumption_logs))
+    
+    async def fetch_nutrition_trends(
+        self,
+        consumption_logs: List[Dict[str, Any]],
+        time_period: str = "week"
+    ) -> Dict[str, Any]:
+        """Get a trend analysis from the model, raising instead of falling back"""
         period_totals = self._calculate_period_totals(consumption_logs)
+        prompt = prompt_builder.trends(period_totals, time_period)
+        response = await self.ai_service._call_chatgpt(prompt, max_tokens=600, endpoint="trends")
+        return self._parse_trend_analysis(response)
+    
+    async def stream_smart_recommendations(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        recent_logs: List[Dict[str, Any]],
+        available_foods: List[Dict[str, Any]],
+        limit: int = 5
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield trend insights, then each recommendation as soon as it is complete"""
+        
+        # Trend signals and candidate retrieval are local and independent, so run them together;
+        # the single LLM call then gets both at once
+        trend_analysis, candidates = await asyncio.gather(
+            asyncio.to_thread(self._local_trend_signals, recent_logs),
+            asyncio.to_thread(self._retrieve_candidates, user_prefs, health_context, available_foods)
+        )
+        yield "trend_insights", trend_analysis
+        
+        candidates = self._rank_candidates(candidates, trend_analysis, recent_logs)
+        # Keep near-identical foods from crowding the shortlist the model chooses from
+        candidates = diversify(candidates, max(MIN_CANDIDATES, limit * CANDIDATES_PER_RECOMMENDATION))
+        
+        prompt = prompt_builder.recommendations(
+            user_prefs,
+            health_context,
+            candidates,
+            limit,
+            extra={
+                "trends": trend_analysis.get("trends", []),
+                "concerns": trend_analysis.get("concerns", []),
+                "strengths": trend_analysis.get("strengths", [])
+            }
+        )
         
-        prompt = f"""
-        Analyze nutrition trends over the past {time_period}:
-        
-        Totals: {period_totals}
-        
-        Look for:
-        - Consistent patterns
-        - Nutrient deficiencies
-        - Overconsumption areas
-        - Meal timing patterns
-        - Variety in food choices
-        
-        Return JSON: {{
-            "trends": ["increasing protein", "decreasing variety"],
-            "concerns": ["low fiber intake", "high sodium"],
-            "strengths": ["consistent meal timing", "good protein"],
-            "recommendations": ["add more vegetables", "reduce processed foods"],
-            "score": 0.7
-        }}
-        """
-        
+        emitted = 0
         try:
-            response = await self.ai_service._call_chatgpt(prompt, max_tokens=600)
-            return self._parse_trend_analysis(response)
+            async with aclosing(self.ai_service.stream_recommendations(
+                prompt, candidates, limit, endpoint="smart_recommendations"
+            )) as stream:
+                async for recommendation in stream:
+                    emitted += 1
+                    yield "recommendation", recommendation
         except Exception as e:
-            logger.error(f"Error analyzing trends: {e}")
-            return self._fallback_trend_analysis(period_totals)
+            logger.error(f"Error getting smart recommendations: {e}")
+            if not emitted:
+                for recommendation in self.ai_service._fallback_recommendations(candidates or available_foods, limit):
+                    yield "recommendation", recommendation
+
+    def local_recommendations(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        recent_logs: List[Dict[str, Any]],
+        available_foods: List[Dict[str, Any]],
+        limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Top foods from local retrieval and ranking alone, without a model call"""
+        trend_analysis = self._local_trend_signals(recent_logs)
+        candidates = self._retrieve_candidates(user_prefs, health_context, available_foods)
+        ranked = diversify(self._rank_candidates(candidates, trend_analysis, recent_logs), limit)
+        return [
+            {
+                "food_id": food["id"],
+                "name": food["name"],
+                "kcal": food.get("kcal"),
+                "protein_g": food_macro(food, "protein_g")
+            }
+            for food in ranked
+        ]
+
+    def _local_trend_signals(self, recent_logs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Derive trend insights from log aggregates without a model call"""
+        if not recent_logs:
+            return {"trends": [], "concerns": [], "strengths": [], "recommendations": [], "score": 0.5}
+        
+        period_totals = self._calculate_period_totals(recent_logs)
+        trends, concerns, strengths = [], [], []
+        
+        # Share of calories from each macro (4/4/9 kcal per gram)
+        macro_kcal = {
+            "protein": period_totals["total_protein"] * 4,
+            "carbs": period_totals["total_carbs"] * 4,
+            "fat": period_totals["total_fat"] * 9
+        }
+        macro_total = sum(macro_kcal.values())
+        if macro_total > 0:
+            protein_share = macro_kcal["protein"] / macro_total
+            if protein_share < 0.15:
+                concerns.append("low protein")
+            elif protein_share >= 0.25:
+                strengths.append("high protein")
+            if macro_kcal["fat"] / macro_total > 0.35:
+                concerns.append("high fat")
+            if macro_kcal["carbs"] / macro_total > 0.6:
+                concerns.append("high carbs")
+        
+        avg_calories = period_totals["avg_daily_calories"]
+        if avg_calories < 1200:
+            concerns.append("low calories")
+        elif avg_calories > 3000:
+            concerns.append("high calories")
+        
+        # Calorie direction: earlier half of the logged days vs the later half
+        daily_calories: Dict[Any, float] = {}
+        for log in recent_logs:
+            daily_calories[log.get("date")] = daily_calories.get(log.get("date"), 0) + log.get("food", {}).get("kcal", 0)
+        days = [daily_calories[day] for day in sorted(daily_calories, key=str)]
+        if len(days) >= 4:
+            half = len(days) // 2
+            earlier = sum(days[:half]) / half
+            later = sum(days[half:]) / (len(days) - half)
+            if earlier and later > earlier * 1.15:
+                trends.append("calories rising")
+            elif earlier and later < earlier * 0.85:
+                trends.append("calories falling")
+        
+        distinct_foods = {log.get("food", {}).get("id") or log.get("food", {}).get("name") for log in recent_logs}
+        if len(recent_logs) >= 4 and len(distinct_foods) / len(recent_logs) < 0.5:
+            concerns.append("low variety")
+        if period_totals["days_logged"] > 3:
+            trends.append("consistent logging")
+        if period_totals["meals_logged"] > 5:
+            strengths.append("regular logging")
+        
+        return {
+            "trends": trends,
+            "concerns": concerns,
+            "strengths": strengths,
+            "recommendations": [f"address {concern}" for concern in concerns] or ["maintain current habits"],
+            "score": round(max(0.0, 1.0 - 0.15 * len(concerns)), 2)
+        }
+    
+    def _retrieve_candidates(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        available_foods: List[Dict[str, Any]]
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Score eligible foods against the health context, best first"""
+        activity = health_context.get("activity_level", "moderate")
+        low_energy = health_context.get("mood") == "low" or health_context.get("sleep_hours", 8) < 6
+        
+        scored = []
+        for food in eligible_foods(available_foods, user_prefs):
+            kcal = food.get("kcal") or 1
+            protein_density = food_macro(food, "protein_g") * 4 / kcal
+            score = protein_density
+            if activity == "intense":
+                score += protein_density
+            if low_energy:
+                score += min(kcal, 600) / 1200
+            scored.append((score, food))
+        
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return scored
+    
+    def _rank_candidates(
+        self,
+        candidates: List[Tuple[float, Dict[str, Any]]],
+        trend_analysis: Dict[str, Any],
+        recent_logs: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Re-rank retrieved candidates by the concerns found in recent logs and learned preferences"""
+        concerns = set(trend_analysis.get("concerns", []))
+        recent_ids = {log.get("food", {}).get("id") for log in recent_logs}
+        preferences = preference_store.vector()
+        
+        def adjusted(pair: Tuple[float, Dict[str, Any]]) -> float:
+            score, food = pair
+            kcal = food.get("kcal") or 1
+            if "low protein" in concerns:
+                score += food_macro(food, "protein_g") * 4 / kcal
+            if "high fat" in concerns:
+                score -= food_macro(food, "fat_g") * 9 / kcal
+            if "high carbs" in concerns:
+                score -= food_macro(food, "carbs_g") * 4 / kcal
+            if "low calories" in concerns:
+                score += min(kcal, 600) / 1200
+            if "low variety" in concerns and food.get("id") in recent_ids:
+                score -= 0.5
+            # Favor foods people usually eat alongside what was logged recently
+            score += COOCCURRENCE_BOOST * cooccurrence.affinity(food.get("id"), recent_ids) / max(1, len(recent_ids))
+            score += PREFERENCE_BOOST * preferences.score(food)
+            return score
+        
+        return [food for _, food in sorted(candidates, key=adjusted, reverse=True)]
     
     def _calculate_meal_totals(self, meal_foods: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calculate total nutrition for a meal"""
@@ -256,63 +580,23 @@ class NutritionEngine:
     
     def _parse_nutrition_goals(self, response: str) -> Dict[str, Any]:
         """Parse nutrition goals response"""
-        try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Error parsing nutrition goals: {e}")
-            return self._fallback_nutrition_goals({}, {})
+        return self.ai_service._parse_object(response, self._fallback_nutrition_goals({}, {}), "nutrition goals")
     
     def _parse_meal_analysis(self, response: str) -> Dict[str, Any]:
         """Parse meal analysis response"""
-        try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Error parsing meal analysis: {e}")
-            return {"balance_score": 0.5, "strengths": [], "weaknesses": [], "suggestions": []}
-    
-    def _parse_food_swaps(self, response: str) -> List[Dict[str, Any]]:
-        """Parse food swap suggestions"""
-        try:
-            import json
-            start = response.find('[')
-            end = response.rfind(']') + 1
-            json_str = response[start:end]
-            return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Error parsing food swaps: {e}")
-            return []
-    
-    def _parse_meal_plan(self, response: str) -> Dict[str, Any]:
-        """Parse meal plan response"""
-        try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Error parsing meal plan: {e}")
-            return self._fallback_meal_plan([], 3)
+        return self.ai_service._parse_object(
+            response,
+            {"balance_score": 0.5, "strengths": [], "weaknesses": [], "suggestions": []},
+            "meal analysis"
+        )
     
     def _parse_trend_analysis(self, response: str) -> Dict[str, Any]:
         """Parse trend analysis response"""
-        try:
-            import json
-            start = response.find('{')
-            end = response.rfind('}') + 1
-            json_str = response[start:end]
-            return json.loads(json_str)
-        except Exception as e:
-            logger.error(f"Error parsing trend analysis: {e}")
-            return {"trends": [], "concerns": [], "strengths": [], "recommendations": [], "score": 0.5}
+        return self.ai_service._parse_object(
+            response,
+            {"trends": [], "concerns": [], "strengths": [], "recommendations": [], "score": 0.5},
+            "trend analysis"
+        )
     
     def _fallback_nutrition_goals(self, user_profile: Dict[str, Any], health_context: Dict[str, Any]) -> Dict[str, Any]:
         """Fallback nutrition goals calculation"""
@@ -362,20 +646,14 @@ class NutritionEngine:
             "next_meal_focus": "balance"
         }
     
-    def _fallback_meal_plan(self, available_foods: List[Dict[str, Any]], days: int) -> Dict[str, Any]:
-        """Fallback meal plan"""
-        plan = {}
-        for day in range(1, days + 1):
-            plan[f"day_{day}"] = {
-                "breakfast": {"food_id": available_foods[0]["id"] if available_foods else "none", "reason": "Available option"},
-                "lunch": {"food_id": available_foods[1]["id"] if len(available_foods) > 1 else "none", "reason": "Available option"},
-                "dinner": {"food_id": available_foods[2]["id"] if len(available_foods) > 2 else "none", "reason": "Available option"}
-            }
-        
+    def _fallback_cost_tips(self) -> Dict[str, Any]:
+        """Fallback cost optimization tips"""
         return {
-            **plan,
-            "shopping_list": ["basic ingredients"],
-            "total_weekly_cost": "$30"
+            "tips": [
+                {"category": "general", "tip": "Plan meals weekly to reduce waste", "savings": "$10/week"},
+                {"category": "protein", "tip": "Buy protein in bulk and freeze", "savings": "$15/week"}
+            ],
+            "total_potential_savings": "$25/week"
         }
     
     def _fallback_trend_analysis(self, period_totals: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,195 @@
+"""
+Online preference vectors: what a user tends to eat, learned one log at a time
+
+Each vector holds decayed weights over tag and category features plus a running macro
+profile (share of kcal from protein, carbs and fat). An update touches only the logged
+food's features; older signal fades through a shared scale factor instead of rewriting
+every weight. Vectors live in memory and are written back to the DB every few seconds.
+"""
+import json
+import os
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from db.database import get_db
+from .eligibility import food_macro, food_tags
+
+logger = logging.getLogger(__name__)
+
+# The app has a single profile (user_prefs row 1) until accounts exist
+DEFAULT_USER_ID = 1
+
+# Signal strength per event; logs are what was actually eaten
+EVENT_WEIGHTS = {"log": 1.0, "accept": 0.5}
+# Each event multiplies all earlier weight by DECAY (about a 100-event half-life)
+DECAY = 0.993
+# Folding the scale back into the weights also drops features below this
+MIN_WEIGHT = 1e-3
+MAX_SCALE = 1e6
+# Blend of feature match and macro profile match in score()
+FEATURE_SHARE = 0.7
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+def food_features(food: Dict[str, Any]) -> Tuple[List[str], Optional[Tuple[float, float, float]]]:
+    """Tag/category features and kcal shares of protein, carbs and fat (None without macros)"""
+    features = [f"cat:{food.get('category', '')}"] + [f"tag:{tag}" for tag in food_tags(food)]
+    protein = food_macro(food, "protein_g") * 4
+    carbs = food_macro(food, "carbs_g") * 4
+    fat = food_macro(food, "fat_g") * 9
+    total = protein + carbs + fat
+    return features, (protein / total, carbs / total, fat / total) if total else None
+
+
+class PreferenceVector:
+    """Decayed feature weights and macro profile for one user"""
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        macros: Optional[List[float]] = None,
+        mass: float = 0.0,
+        events: int = 0
+    ):
+        self.weights: Dict[str, float] = weights or {}
+        self.macros: List[float] = macros or [0.0, 0.0, 0.0]  # scaled like the weights
+        self.mass = mass  # scaled total event weight
+        self.scale = 1.0  # stored values = real values * scale
+        self.events = events
+
+    def update(self, features: Iterable[str], macros: Optional[Tuple[float, float, float]], strength: float = 1.0) -> None:
+        """Add one event; O(number of features)"""
+        self.scale /= DECAY
+        amount = strength * self.scale
+        for feature in features:
+            self.weights[feature] = self.weights.get(feature, 0.0) + amount
+        if macros is not None:
+            for i, share in enumerate(macros):
+                self.macros[i] += share * amount
+        self.mass += amount
+        self.events += 1
+        if self.scale > MAX_SCALE:
+            self.normalize()
+
+    def normalize(self) -> None:
+        """Fold the scale into the stored values and drop faded features"""
+        shrink = 1 / self.scale
+        self.weights = {
+            feature: weight * shrink
+            for feature, weight in self.weights.items()
+            if weight * shrink >= MIN_WEIGHT
+        }
+        self.macros = [value * shrink for value in self.macros]
+        self.mass *= shrink
+        self.scale = 1.0
+
+    def macro_profile(self) -> Optional[List[float]]:
+        total = sum(self.macros)
+        return [value / total for value in self.macros] if total else None
+
+    def score(self, food: Dict[str, Any]) -> float:
+        """How well a food matches the learned preferences, in [0, 1]; 0 with no history"""
+        if not self.mass:
+            return 0.0
+        features, macros = food_features(food)
+        # Share of past events that had each feature, averaged over the food's features
+        feature_match = sum(self.weights.get(feature, 0.0) for feature in features) / (self.mass * len(features))
+        profile = self.macro_profile()
+        if macros is None or profile is None:
+            return FEATURE_SHARE * feature_match
+        macro_match = 1 - sum(abs(a - b) for a, b in zip(macros, profile)) / 2
+        return FEATURE_SHARE * feature_match + (1 - FEATURE_SHARE) * macro_match
+
+    def top_features(self, n: int = 10) -> List[Tuple[str, float]]:
+        if not self.mass:
+            return []
+        ranked = sorted(self.weights.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(feature, round(weight / self.mass, 3)) for feature, weight in ranked]
+
+    def to_json(self) -> str:
+        self.normalize()
+        return json.dumps({"weights": self.weights, "macros": self.macros, "mass": self.mass, "events": self.events})
+
+    @classmethod
+    def from_json(cls, blob: str) -> "PreferenceVector":
+        data = json.loads(blob)
+        return cls(data["weights"], data["macros"], data["mass"], data["events"])
+
+
+class PreferenceStore:
+    """Preference vectors by user, written back to the preference_vectors table in batches"""
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self.vectors: Dict[int, PreferenceVector] = {}
+        self._dirty: set = set()
+        self._last_flush = time.monotonic()
+        self.stats = {"updates": 0, "flushes": 0}
+
+    @classmethod
+    def from_env(cls) -> "PreferenceStore":
+        return cls(flush_interval=_env_float("PREFERENCE_FLUSH_SECONDS", 5.0))
+
+    def load(self) -> None:
+        """Load stored vectors; a user without one is bootstrapped from the existing logs"""
+        with get_db() as db:
+            for row in db.execute("SELECT user_id, vector FROM preference_vectors"):
+                self.vectors[row["user_id"]] = PreferenceVector.from_json(row["vector"])
+            if DEFAULT_USER_ID not in self.vectors:
+                vector = self.vectors[DEFAULT_USER_ID] = PreferenceVector()
+                rows = db.execute("""
+                    SELECT foods.* FROM logs JOIN foods ON foods.id = logs.food_id ORDER BY logs.timestamp
+                """).fetchall()
+                for row in rows:
+                    vector.update(*food_features(dict(row)), EVENT_WEIGHTS["log"])
+                if rows:
+                    self._dirty.add(DEFAULT_USER_ID)
+        self.flush()
+
+    def vector(self, user_id: int = DEFAULT_USER_ID) -> PreferenceVector:
+        if user_id not in self.vectors:
+            self.vectors[user_id] = PreferenceVector()
+        return self.vectors[user_id]
+
+    def record(self, food: Dict[str, Any], event: str = "log", user_id: int = DEFAULT_USER_ID) -> None:
+        """Learn from a logged or accepted food"""
+        self.vector(user_id).update(*food_features(food), EVENT_WEIGHTS[event])
+        self._dirty.add(user_id)
+        self.stats["updates"] += 1
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write changed vectors back to the database"""
+        self._last_flush = time.monotonic()
+        if not self._dirty:
+            return
+        now = datetime.now().isoformat()
+        rows = [(user_id, self.vectors[user_id].to_json(), now) for user_id in self._dirty]
+        with get_db() as db:
+            db.executemany("INSERT OR REPLACE INTO preference_vectors (user_id, vector, updated_at) VALUES (?, ?, ?)", rows)
+            db.commit()
+        self._dirty.clear()
+        self.stats["flushes"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        vector = self.vectors.get(DEFAULT_USER_ID)
+        return {
+            **self.stats,
+            "users": len(self.vectors),
+            "events": vector.events if vector else 0,
+            "top_features": vector.top_features(5) if vector else []
+        }
+
+
+# Global instance
+preference_store = PreferenceStore.from_env()
@@ -0,0 +1,268 @@
+"""
+Background pre-warming of static and popular LLM responses with stale-while-revalidate
+"""
+import asyncio
+import json
+import os
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .ai_service import ai_service, metered
+
+logger = logging.getLogger(__name__)
+
+# Per warm cycle; with a 60s interval a key stays hot at roughly six requests an hour
+POPULARITY_DECAY = 0.9
+
+Fetch = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    """Stable key for request parameters"""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+@dataclass
+class CacheEntry:
+    params: Dict[str, Any]
+    value: Any = None
+    fetched_at: Optional[float] = None
+    popularity: float = 0.0
+    pinned: bool = False  # static keys are kept warm regardless of traffic
+
+
+class TokenBudget:
+    """Tokens spent over a sliding one-hour window"""
+
+    WINDOW = 3600.0
+
+    def __init__(self, tokens_per_hour: int, clock: Callable[[], float] = time.monotonic):
+        self.tokens_per_hour = tokens_per_hour
+        self._clock = clock
+        self._spent: Deque[Tuple[float, int]] = deque()
+
+    def spent(self) -> int:
+        cutoff = self._clock() - self.WINDOW
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+        return sum(tokens for _, tokens in self._spent)
+
+    def allows(self, expected_tokens: int) -> bool:
+        return self.spent() + expected_tokens <= self.tokens_per_hour
+
+    def record(self, tokens: int) -> None:
+        self._spent.append((self._clock(), tokens))
+
+
+class PreWarmer:
+    """Serves hot LLM responses from memory and refreshes them in the background"""
+
+    def __init__(
+        self,
+        fresh_for: float = 900.0,
+        serve_stale_for: float = 3600.0,
+        interval: float = 60.0,
+        hot_keys: int = 20,
+        max_keys: int = 500,
+        tokens_per_hour: int = 20000,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.fresh_for = fresh_for
+        self.serve_stale_for = serve_stale_for
+        self.interval = interval
+        self.hot_keys = hot_keys
+        self.max_keys = max_keys
+        self.budget = TokenBudget(tokens_per_hour, clock)
+        self._clock = clock
+
+        self._fetchers: Dict[str, Fetch] = {}
+        self._entries: Dict[str, Dict[str, CacheEntry]] = {}
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Cold fetches in flight and how many requests wait on each; concurrent misses share one call
+        self._inflight: Dict[Tuple[str, str], List[Any]] = {}
+        self._tokens_per_fetch: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0, "skipped_budget": 0}
+
+    @classmethod
+    def from_env(cls) -> "PreWarmer":
+        return cls(
+            fresh_for=_env_float("AI_PREWARM_FRESH_SECONDS", 900.0),
+            serve_stale_for=_env_float("AI_PREWARM_STALE_SECONDS", 3600.0),
+            interval=_env_float("AI_PREWARM_INTERVAL_SECONDS", 60.0),
+            hot_keys=int(_env_float("AI_PREWARM_HOT_KEYS", 20)),
+            tokens_per_hour=int(_env_float("AI_PREWARM_TOKEN_BUDGET_PER_HOUR", 20000))
+        )
+
+    def register(self, endpoint: str, fetch: Fetch, static_params: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Register how to compute an endpoint's response; static params are warmed even before any request"""
+        self._fetchers[endpoint] = fetch
+        entries = self._entries.setdefault(endpoint, {})
+        for params in static_params or []:
+            entries[cache_key(params)] = CacheEntry(params=params, pinned=True)
+
+    def invalidate(self, endpoint: str) -> None:
+        """Forget an endpoint's cached responses, e.g. when the data they were computed from changed"""
+        entries = self._entries.get(endpoint, {})
+        for key in [key for key, entry in entries.items() if not entry.pinned]:
+            del entries[key]
+
+    async def get_or_fetch(self, endpoint: str, params: Dict[str, Any]) -> Any:
+        """Return the cached response (fresh or stale); only a cold miss waits on the provider"""
+        key = cache_key(params)
+        entries = self._entries.setdefault(endpoint, {})
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = CacheEntry(params=params)
+        entry.popularity += 1
+        self._evict(entries, keep=key)
+
+        age = None if entry.fetched_at is None else self._clock() - entry.fetched_at
+        if age is not None and age < self.fresh_for:
+            self.stats["fresh_hits"] += 1
+            return entry.value
+        if age is not None and age < self.serve_stale_for:
+            self.stats["stale_hits"] += 1
+            self._schedule_refresh(endpoint, key, entry)
+            return entry.value
+
+        self.stats["misses"] += 1
+        return await self._fetch_shared(endpoint, key, entry)
+
+    async def _fetch_shared(self, endpoint: str, key: str, entry: CacheEntry) -> Any:
+        """Wait on the one provider call for this key; it is cancelled when its last waiter goes away"""
+        flight = self._inflight.get((endpoint, key))
+        if flight is None:
+            task = asyncio.ensure_future(self._fetch_and_store(endpoint, entry))
+            flight = self._inflight[(endpoint, key)] = [task, 0]
+            task.add_done_callback(lambda _: self._end_flight(endpoint, key, flight))
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                task.cancel()
+                self._end_flight(endpoint, key, flight)
+
+    async def _fetch_and_store(self, endpoint: str, entry: CacheEntry) -> Any:
+        value = await self._fetchers[endpoint](entry.params)
+        self._store(entry, value)
+        return value
+
+    def _end_flight(self, endpoint: str, key: str, flight: List[Any]) -> None:
+        if self._inflight.get((endpoint, key)) is flight:
+            del self._inflight[(endpoint, key)]
+
+    def _store(self, entry: CacheEntry, value: Any) -> None:
+        entry.value = value
+        entry.fetched_at = self._clock()
+
+    def _evict(self, entries: Dict[str, CacheEntry], keep: Optional[str] = None) -> None:
+        """Drop the least popular unpinned key over max_keys, never keep (the key just requested)"""
+        if len(entries) <= self.max_keys:
+            return
+        coldest = min(
+            (key for key, entry in entries.items() if not entry.pinned and key != keep),
+            key=lambda key: entries[key].popularity,
+            default=None
+        )
+        if coldest is not None:
+            del entries[coldest]
+
+    def _schedule_refresh(self, endpoint: str, key: str, entry: CacheEntry) -> None:
+        if (endpoint, key) in self._refreshing:
+            return
+        task = asyncio.ensure_future(self._refresh(endpoint, entry))
+        self._refreshing[(endpoint, key)] = task
+        task.add_done_callback(lambda _: self._refreshing.pop((endpoint, key), None))
+
+    async def _refresh(self, endpoint: str, entry: CacheEntry) -> None:
+        """Recompute one entry in the background if the hourly token budget allows it"""
+        if not ai_service.ai_enabled:
+            return
+        expected = int(self._tokens_per_fetch.get(endpoint, 0))
+        if not self.budget.allows(expected):
+            self.stats["skipped_budget"] += 1
+            return
+
+        with metered() as meter:
+            try:
+                value = await self._fetchers[endpoint](entry.params)
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Pre-warm of {endpoint} failed: {e}")
+                return
+            finally:
+                self.budget.record(meter[0])
+        self._store(entry, value)
+        self.stats["refreshes"] += 1
+        previous = self._tokens_per_fetch.get(endpoint)
+        self._tokens_per_fetch[endpoint] = meter[0] if previous is None else 0.8 * previous + 0.2 * meter[0]
+
+    def _due(self) -> List[Tuple[str, str, CacheEntry]]:
+        """Pinned keys and the hottest keys per endpoint that are about to go stale"""
+        # Refresh a little before entries go stale so hot keys never wait
+        refresh_after = self.fresh_for * 0.8
+        now = self._clock()
+        due = []
+        for endpoint, entries in self._entries.items():
+            ranked = sorted(entries.items(), key=lambda item: (item[1].pinned, item[1].popularity), reverse=True)
+            for key, entry in ranked[:self.hot_keys]:
+                if not entry.pinned and entry.popularity < 1:
+                    continue
+                if entry.fetched_at is None or now - entry.fetched_at >= refresh_after:
+                    due.append((endpoint, key, entry))
+        return due
+
+    async def warm_once(self) -> None:
+        """Refresh every due key, then decay popularity so old favourites cool off"""
+        for endpoint, key, entry in self._due():
+            if (endpoint, key) not in self._refreshing:
+                await self._refresh(endpoint, entry)
+        for entries in self._entries.values():
+            for entry in entries.values():
+                entry.popularity *= POPULARITY_DECAY
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm_once()
+            except Exception as e:
+                logger.error(f"Pre-warm cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        tasks = [task for task in [self._task, *self._refreshing.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "keys": {endpoint: len(entries) for endpoint, entries in self._entries.items()},
+            "tokens_last_hour": self.budget.spent(),
+            "token_budget_per_hour": self.budget.tokens_per_hour
+        }
+
+
+# Global instance
+prewarmer = PreWarmer.from_env()
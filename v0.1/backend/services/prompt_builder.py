@@ -0,0 +1,264 @@
+"""
+Compact, token-budgeted prompt building for LLM calls
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Shared by every call so provider-side prefix caching can reuse it. Keep it byte-stable:
+# per-request data belongs in the user message, never here.
+SYSTEM_PREFIX = """You are a nutrition expert AI assistant. Reply with JSON only, matching "out".
+Input: TASK line, ctx key=value pairs, pipe tables (first row = header).
+Foods have short ids (f1, f2...); answer with those ids. p/c/f = protein/carbs/fat grams."""
+
+# Expected JSON shape per task, sent as the "out" line of the user message
+OUTPUT_FORMATS = {
+    "REC": '[{"food_id":"f1","reason":"","score":0.9}]',
+    "GOALS": '{"calories":0,"protein_g":0,"carbs_g":0,"fat_g":0,"fiber_g":0,"reasoning":""}',
+    "MEAL": '{"balance_score":0.8,"strengths":[],"weaknesses":[],"suggestions":[],"next_meal_focus":""}',
+    "NUTRI": '{"balance_score":0.8,"strengths":[],"improvements":[],"next_meal_suggestions":[]}',
+    "IMPROVE": '{"suggestions":[],"reasoning":""}',
+    "NARRATE": '{"summary":"","highlights":[]}',
+    "TRENDS": '{"trends":[],"concerns":[],"strengths":[],"recommendations":[],"score":0.7}',
+    "TIPS": '{"tips":[{"category":"","tip":"","savings":"$/week"}],"total_potential_savings":"$/week"}',
+}
+
+FOOD_COLUMNS = "id|name|kcal|p|c|f|cat"
+
+DEFAULT_PROMPT_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "1200"))
+
+# Token budget of the food table per task (roughly 10 tokens per row)
+FOOD_SECTION_BUDGETS = {
+    "REC": 180,
+    "NUTRI": 120,
+    "IMPROVE": 40,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (1 token ≈ 4 characters), consistent with AIService.count_tokens"""
+    return len(text) // 4
+
+
+def _num(value: Any) -> str:
+    """Format a number without a trailing .0"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _macros(food: Dict[str, Any]) -> Dict[str, Any]:
+    # DB rows carry flat protein_g/carbs_g/fat_g columns instead of a nested macros dict
+    macros = food.get("macros") or food
+    if hasattr(macros, "model_dump"):
+        macros = macros.model_dump()
+    return macros
+
+
+def _cell(value: Any) -> str:
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+class BuiltPrompt:
+    """A system prefix + compact user message, with the short-id mapping used in it"""
+
+    def __init__(self, task: str, user: str, id_map: Dict[str, str], section_tokens: Dict[str, int]):
+        self.task = task
+        self.system = SYSTEM_PREFIX
+        self.user = user
+        self.id_map = id_map
+        self.section_tokens = section_tokens
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.system) + estimate_tokens(self.user)
+
+    def messages(self) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user}
+        ]
+
+    def decode_id(self, food_id: Any) -> Any:
+        """Map a short id back to the catalog id (real ids pass through)"""
+        return self.id_map.get(food_id, food_id)
+
+    def decode_items(self, items: Iterable[Dict[str, Any]], key: str = "food_id") -> List[Dict[str, Any]]:
+        decoded = []
+        for item in items:
+            if isinstance(item, dict) and key in item:
+                item = {**item, key: self.decode_id(item[key])}
+            decoded.append(item)
+        return decoded
+
+class PromptBuilder:
+    """Builds compact prompts from sections, each with its own token budget"""
+
+    def __init__(self, total_budget: int = DEFAULT_PROMPT_BUDGET):
+        self.total_budget = total_budget
+
+    def context_line(self, **pairs: Any) -> str:
+        """Encode key/value context compactly, skipping empty values"""
+        parts = []
+        for key, value in pairs.items():
+            if value is None or value == "" or value == [] or value == {}:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ",".join(_cell(v) for v in value)
+            elif isinstance(value, float):
+                value = _num(round(value, 1))
+            parts.append(f"{key}={_cell(value)}")
+        return "ctx " + ";".join(parts)
+
+    def food_table(
+        self,
+        foods: List[Dict[str, Any]],
+        budget: int
+    ) -> Tuple[str, Dict[str, str]]:
+        """Encode foods as a pipe table with short ids, adding whole rows until the budget is spent"""
+        lines = [f"#foods {FOOD_COLUMNS}"]
+        used = estimate_tokens(lines[0]) + 1
+        id_map: Dict[str, str] = {}
+        for index, food in enumerate(foods, start=1):
+            short_id = f"f{index}"
+            macros = _macros(food)
+            row = "|".join([
+                short_id,
+                _cell(food.get("name", "")),
+                _num(food.get("kcal", 0)),
+                _num(macros.get("protein_g", 0)),
+                _num(macros.get("carbs_g", 0)),
+                _num(macros.get("fat_g", 0)),
+                _cell(food.get("category", "")),
+            ])
+            cost = estimate_tokens(row) + 1
+            if used + cost > budget:
+                break
+            lines.append(row)
+            used += cost
+            if "id" in food:
+                id_map[short_id] = food["id"]
+        return "\n".join(lines), id_map
+
+    def build(
+        self,
+        task: str,
+        header: str,
+        sections: List[Tuple[str, str]],
+        foods: Optional[List[Dict[str, Any]]] = None,
+        max_food_tokens: Optional[int] = None
+    ) -> BuiltPrompt:
+        """Assemble fixed sections first; the food table gets whatever budget remains"""
+        lines = [f"TASK {task} {header}".rstrip()]
+        if task in OUTPUT_FORMATS:
+            lines.append(f"out {OUTPUT_FORMATS[task]}")
+        section_tokens = {"header": estimate_tokens("\n".join(lines))}
+        for name, text in sections:
+            if text:
+                lines.append(text)
+                section_tokens[name] = estimate_tokens(text)
+
+        id_map: Dict[str, str] = {}
+        if foods:
+            remaining = self.total_budget - sum(section_tokens.values()) - estimate_tokens(SYSTEM_PREFIX)
+            if max_food_tokens is None:
+                max_food_tokens = FOOD_SECTION_BUDGETS.get(task, remaining)
+            remaining = min(remaining, max_food_tokens)
+            table, id_map = self.food_table(foods, max(0, remaining))
+            lines.append(table)
+            section_tokens["foods"] = estimate_tokens(table)
+
+        return BuiltPrompt(task, "\n".join(lines), id_map, section_tokens)
+
+    def raw(self, text: str, budget: Optional[int] = None) -> BuiltPrompt:
+        """Wrap free text, dropping whole trailing lines beyond the budget"""
+        budget = budget or self.total_budget
+        kept, used = [], 0
+        for line in text.strip().splitlines():
+            line = line.strip()
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        user = "\n".join(kept)
+        return BuiltPrompt("RAW", user, {}, {"raw": estimate_tokens(user)})
+
+    # Endpoint prompts
+
+    def recommendations(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        foods: List[Dict[str, Any]],
+        limit: int,
+        extra: Optional[Dict[str, Any]] = None
+    ) -> BuiltPrompt:
+        ctx = self.context_line(
+            diet=user_prefs.get("diet_style", "omnivore"),
+            budget=user_prefs.get("budget", "$$"),
+            dislikes=user_prefs.get("dislikes", []),
+            area=user_prefs.get("home_area"),
+            sleep=health_context.get("sleep_hours", 8),
+            activity=health_context.get("activity_level", "moderate"),
+            mood=health_context.get("mood", "normal"),
+            **(extra or {})
+        )
+        return self.build("REC", f"n={limit}", [("context", ctx)], foods)
+
+    def daily_goals(self, user_profile: Dict[str, Any], health_context: Dict[str, Any]) -> BuiltPrompt:
+        ctx = self.context_line(
+            age=user_profile.get("age", 30),
+            kg=user_profile.get("weight", 70),
+            cm=user_profile.get("height", 170),
+            goal=user_profile.get("goals", "maintain"),
+            activity=health_context.get("activity_level", "moderate"),
+            sleep=health_context.get("sleep_hours", 8)
+        )
+        return self.build("GOALS", "", [("context", ctx)])
+
+    def meal_analysis(self, meal_type: str, meal_totals: Dict[str, Any], daily_goals: Dict[str, Any]) -> BuiltPrompt:
+        totals = self.context_line(**{f"meal_{k}": v for k, v in meal_totals.items() if v})
+        goals = self.context_line(**{f"goal_{k}": v for k, v in daily_goals.items()})
+        return self.build("MEAL", f"meal={meal_type}", [("totals", totals), ("goals", goals)])
+
+    def nutrition_analysis(self, consumed_foods: List[Dict[str, Any]], user_goals: Dict[str, Any]) -> BuiltPrompt:
+        goals = self.context_line(**{f"goal_{k}": v for k, v in user_goals.items()})
+        return self.build("NUTRI", "", [("goals", goals)], consumed_foods)
+
+    def meal_improvements(self, current_meal: Dict[str, Any], user_prefs: Dict[str, Any]) -> BuiltPrompt:
+        prefs = self.context_line(
+            diet=user_prefs.get("diet_style"),
+            budget=user_prefs.get("budget"),
+            dislikes=user_prefs.get("dislikes", [])
+        )
+        return self.build("IMPROVE", "", [("prefs", prefs)], [current_meal])
+
+    def meal_plan_narration(
+        self,
+        user_prefs: Dict[str, Any],
+        health_context: Dict[str, Any],
+        plan: Dict[str, Any],
+        foods_by_id: Dict[str, str]
+    ) -> BuiltPrompt:
+        ctx = self.context_line(
+            diet=user_prefs.get("diet_style", "omnivore"),
+            activity=health_context.get("activity_level", "moderate"),
+            target_kcal=plan.get("daily_targets", {}).get("kcal")
+        )
+        slots = ["breakfast", "lunch", "dinner", "snacks"]
+        rows = ["day|" + "|".join(slots) + "|kcal|p"]
+        for day, totals in plan.get("daily_totals", {}).items():
+            meals = plan.get(day, {})
+            names = [foods_by_id.get(meals.get(slot, {}).get("food_id"), "-") for slot in slots]
+            rows.append(f"{day.split('_')[-1]}|" + "|".join(names) + f"|{totals['kcal']:.0f}|{totals['protein_g']:.0f}")
+        return self.build("NARRATE", f"days={len(rows) - 1}", [("context", ctx), ("plan", "\n".join(rows))])
+
+    def trends(self, period_totals: Dict[str, Any], time_period: str) -> BuiltPrompt:
+        totals = self.context_line(**period_totals)
+        return self.build("TRENDS", f"period={time_period}", [("totals", totals)])
+
+    def cost_tips(self) -> BuiltPrompt:
+        return self.build("TIPS", "n=5", [("focus", "focus=protein,seasonal produce,meal prep,shopping,waste")])
+
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,298 @@
+"""
+Resilience primitives for LLM provider calls: deadlines, circuit breaker and hedged requests
+"""
+import asyncio
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint deadlines in seconds. AI_DEADLINE_<ENDPOINT> (e.g. AI_DEADLINE_MEAL_PLAN=20) overrides
+# one endpoint; AI_DEADLINE_DEFAULT replaces this table for every endpoint without its own setting
+DEFAULT_DEADLINES = {
+    "recommendations": 6.0,
+    "nutrition_analysis": 5.0,
+    "meal_improvements": 5.0,
+    "daily_goals": 5.0,
+    "meal_analysis": 5.0,
+    "meal_plan": 15.0,
+    "trends": 6.0,
+    "smart_recommendations": 8.0,
+    "cost_optimization": 6.0,
+}
+DEFAULT_DEADLINE = 8.0
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker short-circuits a provider call."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a provider call does not finish within its endpoint deadline."""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+def deadline_for(endpoint: str) -> float:
+    """Get the deadline in seconds for an endpoint"""
+    default = DEFAULT_DEADLINES.get(endpoint, DEFAULT_DEADLINE)
+    if os.getenv("AI_DEADLINE_DEFAULT") is not None:
+        default = _env_float("AI_DEADLINE_DEFAULT", default)
+    return _env_float(f"AI_DEADLINE_{endpoint.upper()}", default)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the reset timeout elapsed"""
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_in_flight = 0
+        return self._state
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError"""
+        state = self.state
+        if state == self.OPEN:
+            self.short_circuited += 1
+            raise CircuitOpenError("Circuit open - using local fallback")
+        if state == self.HALF_OPEN:
+            if self._half_open_in_flight >= self.half_open_max_calls:
+                self.short_circuited += 1
+                raise CircuitOpenError("Circuit half-open - probe already in flight")
+            self._half_open_in_flight += 1
+
+    def release(self) -> None:
+        """Release a half-open probe slot without recording an outcome (e.g. cancellation)"""
+        if self._state == self.HALF_OPEN and self._half_open_in_flight > 0:
+            self._half_open_in_flight -= 1
+
+    def record_success(self) -> None:
+        if self._state != self.CLOSED:
+            logger.info("Circuit breaker closed after successful probe")
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._half_open_in_flight = 0
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"Circuit breaker opened after {self._consecutive_failures} consecutive failures")
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._half_open_in_flight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited
+        }
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile, or None until enough samples were seen"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], hedge_after: Optional[float]) -> Any:
+    """Run call(); if it is still pending after hedge_after seconds, race a second attempt"""
+    first = asyncio.ensure_future(call())
+    if hedge_after is None:
+        return await first
+
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return first.result()
+
+        pending.add(asyncio.ensure_future(call()))
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class ProviderGuard:
+    """Wraps provider calls with a circuit breaker, per-endpoint deadlines and optional hedging"""
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95.0
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.deadline_exceeded = 0
+        self.hedges_fired = 0
+
+    @classmethod
+    def from_env(cls) -> "ProviderGuard":
+        breaker = CircuitBreaker(
+            failure_threshold=int(_env_float("AI_BREAKER_FAILURE_THRESHOLD", 5)),
+            reset_timeout=_env_float("AI_BREAKER_RESET_SECONDS", 30.0)
+        )
+        return cls(
+            breaker=breaker,
+            hedge_enabled=os.getenv("AI_HEDGE_ENABLED", "false").lower() == "true",
+            hedge_percentile=_env_float("AI_HEDGE_PERCENTILE", 95.0)
+        )
+
+    def _tracker(self, endpoint: str) -> LatencyTracker:
+        if endpoint not in self.latency:
+            self.latency[endpoint] = LatencyTracker()
+        return self.latency[endpoint]
+
+    async def run(self, endpoint: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a provider call for an endpoint, raising fast when the provider is unhealthy"""
+        self.breaker.before_call()
+
+        tracker = self._tracker(endpoint)
+        hedge_after = tracker.percentile(self.hedge_percentile) if self.hedge_enabled else None
+
+        async def attempt():
+            if hedge_after is None:
+                return await call()
+            attempts = 0
+
+            async def counted():
+                nonlocal attempts
+                attempts += 1
+                if attempts == 2:
+                    self.hedges_fired += 1
+                return await call()
+
+            return await hedged(counted, hedge_after)
+
+        deadline = deadline_for(endpoint)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(attempt(), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            self.breaker.record_failure()
+            raise DeadlineExceededError(f"{endpoint} exceeded {deadline:.1f}s deadline")
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    async def stream(self, endpoint: str, open_stream: Callable[[], Awaitable[AsyncIterator[Any]]]) -> AsyncIterator[Any]:
+        """Guard a streaming call; the endpoint deadline covers the whole stream"""
+        self.breaker.before_call()
+
+        deadline = deadline_for(endpoint)
+        started = time.monotonic()
+        deadline_at = started + deadline
+        finished = False
+        try:
+            iterator = (await asyncio.wait_for(open_stream(), timeout=deadline)).__aiter__()
+            while True:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                yield item
+            finished = True
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            self.breaker.record_failure()
+            raise DeadlineExceededError(f"{endpoint} exceeded {deadline:.1f}s deadline")
+        except GeneratorExit:
+            # Consumer stopped early (it had what it needed): the provider was healthy
+            self.breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        if finished:
+            self.breaker.record_success()
+            self._tracker(endpoint).record(time.monotonic() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.snapshot(),
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedging_enabled": self.hedge_enabled,
+            "hedges_fired": self.hedges_fired,
+            "p95_latency_ms": {
+                endpoint: round(p95 * 1000, 1)
+                for endpoint, tracker in self.latency.items()
+                if (p95 := tracker.percentile(95)) is not None
+            }
+        }
@@ -0,0 +1,215 @@
+"""
+"More like this" similarity over hashed tag, category and chain features
+
+Each food becomes a sparse, L2-normalized vector over HASH_DIM buckets (the hashing trick,
+so new tags need no vocabulary). Small catalogs are searched exactly; larger ones go through
+random-hyperplane LSH tables and only the colliding candidates are scored by exact cosine.
+Foods with identical features share one vector, so real catalogs index far fewer vectors
+than foods. The catalog-wide index is built in the CPU pool and shipped back to the server.
+"""
+import heapq
+import json
+import math
+import random
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db.database import get_db
+from .eligibility import food_tags
+
+HASH_DIM = 1024
+FEATURE_WEIGHTS = {"cat": 1.0, "tag": 1.0, "chain": 0.5}
+
+# LSH: TABLES tables of up to MAX_BITS hyperplanes each, with enough bits for about
+# BUCKET_TARGET vectors per bucket; exact search below EXACT_MAX distinct vectors
+TABLES = 8
+MIN_BITS = 6
+MAX_BITS = 16
+BUCKET_TARGET = 16
+EXACT_MAX = 5000
+# Look at neighbouring buckets (one flipped bit) until this many candidates were found;
+# at 10k foods 200 gave recall@10 of 65%, 2000 gives 98% at about 2.5ms per query
+MIN_CANDIDATES = 2000
+
+# Diversification: trade-off between rank and similarity to foods already picked
+DIVERSITY_WEIGHT = 0.5
+
+SparseVector = Tuple[Tuple[int, float], ...]
+
+
+def _bucket(feature: str) -> Tuple[int, float]:
+    """Bucket and sign for a feature; the sign keeps collisions from always adding up"""
+    digest = zlib.crc32(feature.encode())
+    return digest % HASH_DIM, 1.0 if digest & 0x80000000 else -1.0
+
+
+def _json_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = json.loads(value)
+    return list(value or [])
+
+
+def feature_vector(food: Dict[str, Any]) -> SparseVector:
+    """Hashed, normalized feature vector of a food dict (DB row or API shape)"""
+    availability = food.get("availability") or {}
+    if not isinstance(availability, dict):
+        availability = availability.dict()
+    chains = _json_list(food.get("chains", availability.get("chains")))
+
+    features = [("cat", str(food.get("category", "")))]
+    features += [("tag", tag) for tag in food_tags(food)]
+    features += [("chain", chain.lower()) for chain in chains]
+
+    weights: Dict[int, float] = {}
+    for kind, value in features:
+        bucket, sign = _bucket(f"{kind}:{value}")
+        weights[bucket] = weights.get(bucket, 0.0) + sign * FEATURE_WEIGHTS[kind]
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    return tuple(sorted((bucket, weight / norm) for bucket, weight in weights.items() if weight))
+
+
+def cosine(a: SparseVector, b: SparseVector) -> float:
+    """Dot product of two normalized sparse vectors"""
+    lookup = dict(a)
+    return sum(weight * lookup.get(bucket, 0.0) for bucket, weight in b)
+
+
+class SimilarityIndex:
+    """Cosine top-k over food feature vectors, exact or via LSH depending on size"""
+
+    def __init__(self, foods: Iterable[Dict[str, Any]] = (), seed: int = 17):
+        self.seed = seed
+        self._hyperplanes: Optional[List[List[float]]] = None
+        self.bits = MIN_BITS
+        self.vectors: List[SparseVector] = []
+        self.members: List[List[str]] = []  # food ids per distinct vector
+        self.names: Dict[str, str] = {}
+        self.vector_of: Dict[str, int] = {}
+        self._tables: List[Dict[int, List[int]]] = []
+        self.build(foods)
+
+    @property
+    def _planes(self) -> List[List[float]]:
+        """One ±1 entry per bucket and hyperplane, stored per bucket for fast signatures.
+
+        Drawn on first use: exact indexes (and the empty one built at import) never need them.
+        """
+        if self._hyperplanes is None:
+            rng = random.Random(self.seed)
+            self._hyperplanes = [[rng.choice((-1.0, 1.0)) for _ in range(TABLES * MAX_BITS)] for _ in range(HASH_DIM)]
+        return self._hyperplanes
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The hyperplanes follow from the seed; redraw them rather than pickle them
+        return {**self.__dict__, "_hyperplanes": None}
+
+    @property
+    def exact(self) -> bool:
+        return len(self.vectors) <= EXACT_MAX
+
+    def build(self, foods: Iterable[Dict[str, Any]]) -> None:
+        slots: Dict[SparseVector, int] = {}
+        self.vectors, self.members, self.names, self.vector_of = [], [], {}, {}
+        for food in foods:
+            vector = feature_vector(food)
+            slot = slots.get(vector)
+            if slot is None:
+                slot = slots[vector] = len(self.vectors)
+                self.vectors.append(vector)
+                self.members.append([])
+            self.members[slot].append(food["id"])
+            self.vector_of[food["id"]] = slot
+            self.names[food["id"]] = food.get("name", "")
+
+        self._tables = [{} for _ in range(TABLES)]
+        if not self.exact:
+            self.bits = max(MIN_BITS, min(MAX_BITS, int(math.log2(len(self.vectors) / BUCKET_TARGET))))
+            for slot, vector in enumerate(self.vectors):
+                for table, signature in zip(self._tables, self._signatures(vector)):
+                    table.setdefault(signature, []).append(slot)
+
+    def _signatures(self, vector: SparseVector) -> List[int]:
+        """One BITS-wide signature per table: the signs of the vector's hyperplane projections"""
+        projection = [0.0] * (TABLES * MAX_BITS)
+        for bucket, weight in vector:
+            projection = [total + weight * plane for total, plane in zip(projection, self._planes[bucket])]
+        signatures = []
+        for table in range(TABLES):
+            signature = 0
+            for value in projection[table * MAX_BITS:table * MAX_BITS + self.bits]:
+                signature = (signature << 1) | (value > 0)
+            signatures.append(signature)
+        return signatures
+
+    def _candidates(self, vector: SparseVector) -> Iterable[int]:
+        if self.exact:
+            return range(len(self.vectors))
+        signatures = self._signatures(vector)
+        found = set()
+        for table, signature in zip(self._tables, signatures):
+            found.update(table.get(signature, ()))
+        # Multi-probe: buckets one bit away hold the next most similar vectors
+        for bit in range(self.bits):
+            if len(found) >= MIN_CANDIDATES:
+                break
+            for table, signature in zip(self._tables, signatures):
+                found.update(table.get(signature ^ (1 << bit), ()))
+        return found
+
+    def similar(self, food_id: str, k: int = 10) -> List[Dict[str, Any]]:
+        """The k foods whose features are closest to food_id's, most similar first"""
+        slot = self.vector_of.get(food_id)
+        if slot is None:
+            return []
+        return self.query(self.vectors[slot], k, exclude=food_id)
+
+    def query(self, vector: SparseVector, k: int = 10, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        lookup = dict(vector)
+        scored = [
+            (sum(weight * lookup.get(bucket, 0.0) for bucket, weight in self.vectors[slot]), slot)
+            for slot in self._candidates(vector)
+        ]
+        results = []
+        # Expand distinct vectors best first until k foods are collected
+        for score, slot in heapq.nlargest(k + 1, scored):
+            if score <= 0:
+                break
+            for food_id in self.members[slot]:
+                if food_id != exclude:
+                    results.append({"food_id": food_id, "name": self.names[food_id], "similarity": round(score, 3)})
+                    if len(results) == k:
+                        return results
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "foods": len(self.vector_of),
+            "distinct_vectors": len(self.vectors),
+            "mode": "exact" if self.exact else f"lsh {TABLES}x{self.bits} bits"
+        }
+
+
+def build_similarity_index() -> SimilarityIndex:
+    """The index over the foods table; runs in the CPU pool"""
+    with get_db() as db:
+        return SimilarityIndex(dict(row) for row in db.execute("SELECT id, name, category, tags, chains FROM foods"))
+
+
+def diversify(ranked: Sequence[Dict[str, Any]], n: int, pool_factor: int = 3) -> List[Dict[str, Any]]:
+    """Pick n foods from a best-first list, skipping near-duplicates of foods already picked
+    (maximal marginal relevance over the feature vectors)"""
+    pool = list(ranked[:n * pool_factor])
+    if len(pool) <= n:
+        return pool
+    vectors = [feature_vector(food) for food in pool]
+    relevance = [1 - position / len(pool) for position in range(len(pool))]
+    closest = [0.0] * len(pool)  # highest similarity to any picked food
+    remaining = set(range(len(pool)))
+    picked = []
+    while len(picked) < n:
+        best = max(remaining, key=lambda i: (relevance[i] - DIVERSITY_WEIGHT * closest[i], -i))
+        remaining.discard(best)
+        picked.append(best)
+        for i in remaining:
+            closest[i] = max(closest[i], cosine(vectors[i], vectors[best]))
+    return [pool[i] for i in picked]
@@ -0,0 +1,254 @@
+"""
+Streaming UserState classifier over wearable samples
+
+Keeps exponentially weighted baselines per user: a slow resting-HR and HRV baseline
+(days) and fast current values (minutes), each updated in O(1) per sample. After every
+batch the current signals pick a candidate state; thresholds differ for entering and
+leaving a condition, and a new state has to hold for DWELL_SECONDS of sample time before
+it becomes a transition, so a noisy reading does not make the state flap.
+"""
+import asyncio
+import math
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .preferences import DEFAULT_USER_ID
+from .wearables import wearable_store
+
+logger = logging.getLogger(__name__)
+
+# EWMA time constants (seconds)
+HR_FAST_TAU = 120.0
+HR_BASE_TAU = 3 * 86400.0
+HRV_FAST_TAU = 30 * 60.0
+HRV_BASE_TAU = 7 * 86400.0
+# Samples before a baseline is trusted
+MIN_HR_SAMPLES = 300
+MIN_HRV_SAMPLES = 3
+
+# (enter, exit) thresholds; each condition is harder to enter than to stay in
+EXERTION_DELTA = (30.0, 20.0)  # bpm above resting baseline
+STRESS_HRV_RATIO = (0.75, 0.85)  # current HRV / baseline, below is worse
+FOCUS_HRV_RATIO = (0.90, 0.95)
+LOW_SLEEP_HOURS = (6.0, 6.5)
+SEDENTARY_STEPS = 300  # steps in the last hour
+POST_WORKOUT_SECONDS = 90 * 60
+SLEEP_PREP_HOURS = (21, 22, 23, 0)
+FOCUS_HOURS = range(9, 17)
+
+DWELL_SECONDS = 120.0
+HISTORY = 20
+SUBSCRIBER_QUEUE = 16
+
+
+class _Ewma:
+    __slots__ = ("tau", "value", "time", "count")
+
+    def __init__(self, tau: float):
+        self.tau = tau
+        self.value: Optional[float] = None
+        self.time = 0.0
+        self.count = 0
+
+    def add(self, timestamp: float, value: float) -> bool:
+        """Fold in one sample; one not newer than the last (a replayed batch) is ignored"""
+        if self.value is None:
+            self.value = value
+        elif timestamp <= self.time:
+            return False
+        else:
+            alpha = 1 - math.exp(-(timestamp - self.time) / self.tau)
+            self.value += alpha * (value - self.value)
+        self.time = timestamp
+        self.count += 1
+        return True
+
+
+class UserSignals:
+    """Rolling baselines and the current state for one user"""
+
+    def __init__(self):
+        self.hr_fast = _Ewma(HR_FAST_TAU)
+        self.hr_rest = _Ewma(HR_BASE_TAU)
+        self.hrv_fast = _Ewma(HRV_FAST_TAU)
+        self.hrv_base = _Ewma(HRV_BASE_TAU)
+        self.last_exertion: Optional[float] = None
+        self.active: Set[str] = set()  # conditions currently held, for hysteresis
+        self.state: Optional[str] = None
+        self.since: Optional[float] = None
+        self.pending: Optional[str] = None
+        self.pending_since = 0.0
+        self.clock = 0.0  # latest sample time
+        self.utc_offset: Optional[float] = None  # seconds east of UTC, as last reported by the watch
+
+    def add_hr(self, timestamp: float, bpm: float) -> None:
+        if not self.hr_fast.add(timestamp, bpm):
+            return
+        if self.hr_rest.count < MIN_HR_SAMPLES:
+            self.hr_rest.add(timestamp, bpm)
+            return
+        delta = self.hr_fast.value - self.hr_rest.value
+        if self._held("exertion", delta >= EXERTION_DELTA[0], delta >= EXERTION_DELTA[1]):
+            self.last_exertion = timestamp
+        else:
+            # Only resting readings move the resting baseline
+            self.hr_rest.add(timestamp, bpm)
+
+    def add_hrv(self, timestamp: float, rmssd: float) -> None:
+        if self.hrv_fast.add(timestamp, rmssd):
+            self.hrv_base.add(timestamp, rmssd)
+
+    def local_hour(self) -> int:
+        """Hour of the latest sample in the wearer's time zone; the server's until the watch sends one"""
+        if self.utc_offset is None:
+            return datetime.fromtimestamp(self.clock).hour
+        return datetime.fromtimestamp(self.clock + self.utc_offset, timezone.utc).hour
+
+    def _held(self, condition: str, enter: bool, stay: bool) -> bool:
+        held = stay if condition in self.active else enter
+        if held:
+            self.active.add(condition)
+        else:
+            self.active.discard(condition)
+        return held
+
+    def hrv_ratio(self) -> Optional[float]:
+        if self.hrv_base.count < MIN_HRV_SAMPLES or not self.hrv_base.value:
+            return None
+        return self.hrv_fast.value / self.hrv_base.value
+
+    def candidate(self, window_stats: Dict[str, Dict[str, Any]]) -> str:
+        """The state the current signals point to, most specific first"""
+        ratio = self.hrv_ratio()
+        hour = self.local_hour()
+        sleep = window_stats["sleep"]
+        sleep_hours = sleep["sum"] / 60 if sleep["count"] else None
+
+        post_workout = self.last_exertion is not None and self.clock - self.last_exertion < POST_WORKOUT_SECONDS
+        stressed = self._held(
+            "stressed",
+            ratio is not None and ratio < STRESS_HRV_RATIO[0],
+            ratio is not None and ratio < STRESS_HRV_RATIO[1]
+        )
+        low_energy = self._held(
+            "lowEnergy",
+            sleep_hours is not None and sleep_hours < LOW_SLEEP_HOURS[0],
+            sleep_hours is not None and sleep_hours < LOW_SLEEP_HOURS[1]
+        )
+        focus = self._held(
+            "focusNeeded",
+            ratio is not None and ratio < FOCUS_HRV_RATIO[0],
+            ratio is not None and ratio < FOCUS_HRV_RATIO[1]
+        ) and hour in FOCUS_HOURS and window_stats["steps"]["sum"] < SEDENTARY_STEPS
+
+        if post_workout:
+            return "postWorkout"
+        if stressed:
+            return "stressed"
+        if low_energy:
+            return "lowEnergy"
+        if hour in SLEEP_PREP_HOURS:
+            return "sleepPrep"
+        if focus:
+            return "focusNeeded"
+        return "calm"
+
+    def signals(self) -> Dict[str, Any]:
+        ratio = self.hrv_ratio()
+        return {
+            "hr": round(self.hr_fast.value, 1) if self.hr_fast.value is not None else None,
+            "resting_hr": round(self.hr_rest.value, 1) if self.hr_rest.value is not None else None,
+            "hrv": round(self.hrv_fast.value, 1) if self.hrv_fast.value is not None else None,
+            "hrv_baseline": round(self.hrv_base.value, 1) if self.hrv_base.value is not None else None,
+            "hrv_ratio": round(ratio, 2) if ratio is not None else None,
+        }
+
+
+class StateClassifier:
+    """UserState per user from streaming samples; transitions go to subscribers"""
+
+    def __init__(self):
+        self.users: Dict[int, UserSignals] = {}
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=HISTORY)
+        self._subscribers: List[asyncio.Queue] = []
+        self.stats = {"batches": 0, "transitions": 0, "suppressed": 0, "dropped_events": 0}
+
+    def user(self, user_id: int = DEFAULT_USER_ID) -> UserSignals:
+        if user_id not in self.users:
+            self.users[user_id] = UserSignals()
+        return self.users[user_id]
+
+    def update(
+        self,
+        batch: Dict[str, Iterable[Tuple[float, float]]],
+        user_id: int = DEFAULT_USER_ID,
+        utc_offset_minutes: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Feed one batch of samples; returns the transition it caused, if any"""
+        user = self.user(user_id)
+        if utc_offset_minutes is not None:
+            user.utc_offset = utc_offset_minutes * 60.0
+        for timestamp, bpm in sorted(batch.get("hr", ())):
+            user.add_hr(timestamp, bpm)
+        for timestamp, rmssd in sorted(batch.get("hrv", ())):
+            user.add_hrv(timestamp, rmssd)
+        latest = [max(samples)[0] for samples in batch.values() if samples]
+        if not latest:
+            return None
+        user.clock = max(user.clock, *latest)
+        self.stats["batches"] += 1
+
+        candidate = user.candidate(wearable_store.window_stats(user_id, user.clock))
+        if candidate == user.state:
+            if user.pending is not None:
+                self.stats["suppressed"] += 1  # a different state did not hold long enough
+            user.pending = None
+            return None
+        if user.state is not None:
+            if candidate != user.pending:
+                user.pending, user.pending_since = candidate, user.clock
+                return None
+            if user.clock - user.pending_since < DWELL_SECONDS:
+                return None
+
+        transition = {
+            "user_id": user_id,
+            "from": user.state,
+            "to": candidate,
+            "at": user.clock,
+            "signals": user.signals()
+        }
+        user.state, user.since, user.pending = candidate, user.clock, None
+        self.history.append(transition)
+        self.stats["transitions"] += 1
+        return transition
+
+    def current(self, user_id: int = DEFAULT_USER_ID) -> Dict[str, Any]:
+        user = self.user(user_id)
+        return {"state": user.state, "since": user.since, "pending": user.pending, "signals": user.signals()}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Hand an event to every subscriber; a subscriber that fell behind loses its oldest event"""
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.stats["dropped_events"] += 1
+            queue.put_nowait(event)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "users": len(self.users), "subscribers": len(self._subscribers)}
+
+
+# Global instance
+state_classifier = StateClassifier()
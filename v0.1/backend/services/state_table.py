@@ -0,0 +1,213 @@
+"""
+Precomputed top picks per wearable state: the best foods for every (state, area, diet)
+
+The watch app reports a detected UserState (calm, stressed, lowEnergy, ...). Each state has a
+scoring rule over macros, kcal and tags; a background job ranks the catalog once per state
+and writes one row per key, so a request is a single primary-key read. Rows carry the catalog
+version plus a hash of the rules, so editing either one invalidates the table.
+"""
+import json
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from db.database import catalog_version, get_db
+from .eligibility import food_macro
+from .macro_index import IndexedFood, swap_filter
+
+# Matches the iOS UserState cases; weights apply to the share of kcal from each macro
+STATE_RULES: Dict[str, Dict[str, Any]] = {
+    "calm": {
+        "reason": "Relaxed and in good condition • Keep meals balanced",
+        "macros": {"protein": 0.3, "carbs": 0.3, "fat": 0.1},
+        "kcal": [300, 600],
+        "tags": {"healthy": 0.3, "fresh": 0.2},
+    },
+    "stressed": {
+        "reason": "HRV lower vs baseline • Protein steadies blood sugar • Skip stimulants",
+        "macros": {"protein": 0.5, "carbs": 0.2, "fat": -0.2},
+        "kcal": [150, 500],
+        "tags": {"healthy": 0.3, "fresh": 0.2, "vegetarian": 0.1, "caffeine": -0.5, "coffee": -0.5},
+    },
+    "lowEnergy": {
+        "reason": "Energy dip • Complex carbohydrates for sustained energy",
+        "macros": {"protein": 0.3, "carbs": 0.6, "fat": -0.1},
+        "kcal": [400, 800],
+        "tags": {"bowl": 0.2, "healthy": 0.1},
+    },
+    "postWorkout": {
+        "reason": "Post-workout recovery • Protein and carbohydrates for muscle repair",
+        "macros": {"protein": 1.0, "carbs": 0.4, "fat": -0.3},
+        "kcal": [400, 800],
+        "tags": {"protein": 0.4, "smoothie": 0.2},
+    },
+    "sleepPrep": {
+        "reason": "Preparing for sleep • Keep it light • Avoid stimulating foods",
+        "macros": {"protein": 0.2, "carbs": 0.3, "fat": -0.4},
+        "kcal": [100, 400],
+        "tags": {"sleep-aid": 0.5, "caffeine": -1.0, "coffee": -1.0, "spicy": -0.5},
+    },
+    "focusNeeded": {
+        "reason": "Need to improve focus • Protein and healthy fats, few fast carbs",
+        "macros": {"protein": 0.5, "carbs": -0.2, "fat": 0.2},
+        "kcal": [250, 550],
+        "tags": {"healthy": 0.3, "fresh": 0.2, "mediterranean": 0.2},
+    },
+}
+USER_STATES = tuple(STATE_RULES)
+RULES_VERSION = format(zlib.crc32(json.dumps(STATE_RULES, sort_keys=True).encode()), "08x")
+
+# Rows for foods available anywhere, used when the user has no area
+ANY_AREA = "any"
+# Foods stored per row; more than the 3 served, so dislike and budget filtering at read
+# time still leaves enough
+TABLE_K = 25
+
+
+def table_version(catalog: str) -> str:
+    return f"{catalog}/rules:{RULES_VERSION}"
+
+
+def state_score(food: Dict[str, Any], tags: Iterable[str], state: str) -> float:
+    """How well a food fits a state's rule; higher is better"""
+    rule = STATE_RULES[state]
+    kcal = float(food.get("kcal") or 0)
+    shares = {
+        "protein": food_macro(food, "protein_g") * 4,
+        "carbs": food_macro(food, "carbs_g") * 4,
+        "fat": food_macro(food, "fat_g") * 9,
+    }
+    total = sum(shares.values()) or 1.0
+    score = sum(weight * shares[macro] / total for macro, weight in rule["macros"].items())
+    low, high = rule["kcal"]
+    # Full credit inside the kcal window, fading out over one window-width on either side
+    outside = max(low - kcal, kcal - high, 0.0)
+    score += 0.5 * max(0.0, 1 - outside / (high - low))
+    score += sum(boost for tag, boost in rule["tags"].items() if tag in tags)
+    return score
+
+
+def _areas(food: Dict[str, Any]) -> List[str]:
+    areas = food.get("areas") or []
+    if isinstance(areas, str):
+        areas = json.loads(areas)
+    return [area.lower() for area in areas] + [ANY_AREA]
+
+
+def _pick(food: Dict[str, Any], item: IndexedFood, score: float) -> Dict[str, Any]:
+    return {
+        "food_id": item.id,
+        "name": item.name,
+        "kcal": food.get("kcal"),
+        "macros": {
+            "protein_g": food_macro(food, "protein_g"),
+            "carbs_g": food_macro(food, "carbs_g"),
+            "fat_g": food_macro(food, "fat_g"),
+        },
+        "score": round(score, 3),
+        "tags": sorted(item.tags),
+        "tier": item.tier,
+    }
+
+
+def rank_states(foods: List[Dict[str, Any]], k: int = TABLE_K) -> Dict[tuple, List[Dict[str, Any]]]:
+    """Top k foods for every (state, area, diet) key; one sort per state"""
+    items = [(food, IndexedFood(food), _areas(food)) for food in foods]
+    ranked: Dict[tuple, List[Dict[str, Any]]] = {}
+    for state in USER_STATES:
+        scored = sorted(
+            ((state_score(food, item.tags, state), item.id, food, item, areas) for food, item, areas in items),
+            key=lambda entry: (-entry[0], entry[1])
+        )
+        for score, _, food, item, areas in scored:
+            pick = None
+            for area in areas:
+                for diet in item.diets:
+                    picks = ranked.setdefault((state, area, diet), [])
+                    if len(picks) < k:
+                        pick = pick or _pick(food, item, score)
+                        picks.append(pick)
+    return ranked
+
+
+def rank_live(
+    foods: List[Dict[str, Any]],
+    state: str,
+    area: str,
+    diet: str,
+    user_prefs: Dict[str, Any],
+    k: int = 3
+) -> List[Dict[str, Any]]:
+    """Top picks for one key straight from the catalog, for keys the table cannot answer"""
+    allowed = swap_filter(user_prefs)
+    scored = []
+    for food in foods:
+        item = IndexedFood(food)
+        if area in _areas(food) and diet in item.diets and allowed(item.name, item.tags, item.tier):
+            scored.append((state_score(food, item.tags, state), item.id, food, item))
+    scored.sort(key=lambda entry: (-entry[0], entry[1]))
+    return filter_picks([_pick(food, item, score) for score, _, food, item in scored[:k]], user_prefs, k)
+
+
+def build_state_table() -> Dict[str, Any]:
+    """Rank the catalog for every state and replace the table if it is stale; runs in the CPU pool"""
+    started = time.perf_counter()
+    with get_db() as db:
+        db.execute("BEGIN")  # read version and rows from one snapshot
+        version = table_version(catalog_version(db))
+        current = db.execute(
+            "SELECT COUNT(*) FROM state_recommendations WHERE version = ?", (version,)
+        ).fetchone()[0]
+        stale = db.execute(
+            "SELECT COUNT(*) FROM state_recommendations WHERE version != ?", (version,)
+        ).fetchone()[0]
+        foods = [dict(row) for row in db.execute("SELECT * FROM foods")] if not current or stale else []
+        db.rollback()
+
+    written = 0
+    if foods:
+        rows = [
+            (state, area, diet, version, json.dumps(picks))
+            for (state, area, diet), picks in rank_states(foods).items()
+        ]
+        with get_db() as db:
+            db.execute("DELETE FROM state_recommendations")
+            db.executemany("INSERT INTO state_recommendations VALUES (?, ?, ?, ?, ?)", rows)
+            db.commit()
+        written = len(rows)
+    return {"version": version, "rows_written": written, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def filter_picks(stored: List[Dict[str, Any]], user_prefs: Dict[str, Any], k: int) -> List[Dict[str, Any]]:
+    allowed = swap_filter(user_prefs)
+    return [
+        {key: value for key, value in pick.items() if key not in ("tags", "tier")}
+        for pick in stored
+        if allowed(pick["name"], pick["tags"], pick["tier"])
+    ][:k]
+
+
+def lookup_state_picks(
+    state: str,
+    area: str,
+    diet: str,
+    version: str,
+    user_prefs: Dict[str, Any],
+    k: int = 3
+) -> Optional[List[Dict[str, Any]]]:
+    """Top picks from the table, or None when the table cannot answer for this key and user"""
+    if k > TABLE_K:
+        return None
+    with get_db() as db:
+        row = db.execute(
+            "SELECT foods FROM state_recommendations WHERE user_state = ? AND area = ? AND diet_style = ? AND version = ?",
+            (state, area, diet, version)
+        ).fetchone()
+    if row is None:
+        return None
+    stored = json.loads(row["foods"])
+    picks = filter_picks(stored, user_prefs, k)
+    if len(picks) < k and len(stored) == TABLE_K:
+        # Filtering dropped too many; a live ranking can look past the stored foods
+        return None
+    return picks
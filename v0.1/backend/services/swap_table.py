@@ -0,0 +1,118 @@
+"""
+Precomputed swap table: the best alternatives for every (food, diet, goal), refreshed offline
+
+A background job walks the catalog in chunks, asks the macro index for each food's nearest
+improvements and writes one row per key; requests then read a single row by primary key.
+Rows carry the catalog version they were computed for, so a stale row is never served and
+an interrupted build resumes where it stopped. A build whose catalog changed underneath it
+stops writing, so a slow build for an old version never replaces a newer one's rows. The
+version is the whole catalog's (a row's neighbours depend on every food), so any edit
+invalidates the whole table.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from db.database import catalog_version, get_db
+from .macro_index import SWAP_GOALS, IndexedFood, MacroIndex, describe_swap, swap_filter
+
+# Alternatives stored per row; more than any request asks for, so budget and dislike
+# filtering at read time still leaves enough
+TABLE_K = 10
+CHUNK_SIZE = 500
+
+
+def build_swap_table(chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Fill in every missing row for the current catalog version; runs in the CPU pool"""
+    started = time.perf_counter()
+    with get_db() as db:
+        db.execute("BEGIN")  # read version and rows from one snapshot
+        version = catalog_version(db)
+        foods = [dict(row) for row in db.execute("SELECT * FROM foods")]
+        done = {
+            (row["food_id"], row["diet_style"])
+            for row in db.execute(
+                "SELECT food_id, diet_style FROM food_swaps WHERE catalog_version = ? GROUP BY food_id, diet_style",
+                (version,)
+            )
+        }
+        db.rollback()
+
+    # Every food gets rows for each diet it belongs to
+    items = [IndexedFood(food) for food in foods]
+    todo = [(item, diet) for item in items for diet in sorted(item.diets) if (item.id, diet) not in done]
+    written = 0
+    if todo:
+        index = MacroIndex(foods)
+        for start in range(0, len(todo), chunk_size):
+            rows = []
+            for current, diet in todo[start:start + chunk_size]:
+                for goal in SWAP_GOALS:
+                    swaps = [
+                        {**describe_swap(current, item, distance), "tags": sorted(item.tags), "tier": item.tier}
+                        for distance, item in index.neighbours(current, diet, goal, TABLE_K)
+                    ]
+                    rows.append((current.id, diet, goal, version, json.dumps(swaps)))
+            with get_db() as db:
+                if not _still_current(db, version):
+                    return _result(version, written, 0, started, superseded=True)
+                db.executemany("INSERT OR REPLACE INTO food_swaps VALUES (?, ?, ?, ?, ?)", rows)
+                db.commit()
+            written += len(rows)
+
+    with get_db() as db:
+        if not _still_current(db, version):
+            return _result(version, written, 0, started, superseded=True)
+        removed = db.execute("DELETE FROM food_swaps WHERE catalog_version != ?", (version,)).rowcount
+        db.commit()
+    return _result(version, written, removed, started)
+
+
+def _still_current(db, version: str) -> bool:
+    """Take the write lock, then check the catalog is still at version; rolls back if not"""
+    db.execute("BEGIN IMMEDIATE")
+    if catalog_version(db) == version:
+        return True
+    db.rollback()
+    return False
+
+
+def _result(version: str, written: int, removed: int, started: float, superseded: bool = False) -> Dict[str, Any]:
+    return {
+        "version": version,
+        "rows_written": written,
+        "rows_removed": removed,
+        "superseded": superseded,
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+
+
+def lookup_swaps(
+    food_id: Optional[str],
+    diet: str,
+    goal: str,
+    version: str,
+    user_prefs: Dict[str, Any],
+    k: int
+) -> Optional[List[Dict[str, Any]]]:
+    """Swaps from the table, or None when the table cannot answer for this food and user"""
+    if food_id is None or k > TABLE_K:
+        return None
+    with get_db() as db:
+        row = db.execute(
+            "SELECT swaps FROM food_swaps WHERE food_id = ? AND diet_style = ? AND goal = ? AND catalog_version = ?",
+            (food_id, diet, goal, version)
+        ).fetchone()
+    if row is None:
+        return None
+
+    stored = json.loads(row["swaps"])
+    allowed = swap_filter(user_prefs)
+    swaps = [swap for swap in stored if allowed(swap["name"], swap["tags"], swap["tier"])]
+    if len(swaps) < k and len(stored) == TABLE_K:
+        # Filtering dropped too many; a live query can look past the stored alternatives
+        return None
+    return [
+        {key: value for key, value in swap.items() if key not in ("tags", "tier")}
+        for swap in swaps[:k]
+    ]
@@ -0,0 +1,439 @@
+"""
+Compressed on-disk time series for wearable samples
+
+Every (user, metric) series is an append-only data file of chunks plus an index file with
+one fixed-size record per chunk (time range, offset, count, min, max, sum). A chunk holds up
+to CHUNK_SECONDS of samples: timestamps as delta-of-delta and values as deltas of the
+quantized readings, both zigzag varints, deflated together. Regular 1 Hz sampling turns the
+timestamp stream into runs of zero bytes, so a sample costs well under a byte.
+
+Reads memory-map the data file and only inflate the chunks a range touches; downsampled
+queries answer whole chunks from their index records without inflating them at all.
+
+Retention rewrites a series as a new generation of both files and switches to it by renaming
+a one-line manifest, so a crash leaves the old pair or the new one, never a mix. Samples of
+the open chunk go to a small log per batch and are replayed on load.
+"""
+import asyncio
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+import logging
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .preferences import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+# Quantization per metric: stored value = round(reading * scale)
+METRIC_SCALES = {"hr": 10, "hrv": 10, "steps": 1, "sleep": 1}
+CHUNK_SECONDS = 3600
+CHUNK_MAX_SAMPLES = 4096
+RETENTION_INTERVAL_SECONDS = 86400
+
+# count, first timestamp (ms), first delta (ms), first value, timestamp stream length
+_HEADER = struct.Struct("<IqqqI")
+# start ms, end ms, offset, length, count, min, max, sum
+_RECORD = struct.Struct("<qqQIIddd")
+# open chunk log entry: timestamp ms, quantized value
+_PENDING = struct.Struct("<qq")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid value for {name}, using {default}")
+        return default
+
+
+def _encode_varints(numbers: Iterable[int]) -> bytes:
+    zigzag = [n << 1 if n >= 0 else (-n << 1) - 1 for n in numbers]
+    if not zigzag or max(zigzag) < 0x80:
+        return bytes(zigzag)  # common case: every number fits one byte
+    out = bytearray()
+    for n in zigzag:
+        while n >= 0x80:
+            out.append((n & 0x7F) | 0x80)
+            n >>= 7
+        out.append(n)
+    return bytes(out)
+
+
+def _write_durably(path: str, data: bytes) -> None:
+    with open(path, "wb") as out:
+        out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+
+
+def _decode_varints(data: bytes) -> List[int]:
+    if not data or max(data) < 0x80:
+        return [(b >> 1) ^ -(b & 1) for b in data]
+    numbers = []
+    n = shift = 0
+    for b in data:
+        n |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+        else:
+            numbers.append((n >> 1) ^ -(n & 1))
+            n = shift = 0
+    return numbers
+
+
+def encode_chunk(times: List[int], values: List[int]) -> bytes:
+    """Compress parallel lists of timestamps (ms) and quantized values"""
+    deltas = [b - a for a, b in zip(times, times[1:])]
+    dods = [b - a for a, b in zip(deltas, deltas[1:])]
+    value_deltas = [b - a for a, b in zip(values, values[1:])]
+    time_bytes = _encode_varints(dods)
+    header = _HEADER.pack(len(times), times[0], deltas[0] if deltas else 0, values[0], len(time_bytes))
+    return zlib.compress(header + time_bytes + _encode_varints(value_deltas))
+
+
+def decode_chunk(blob: bytes) -> Tuple[List[int], List[int]]:
+    raw = zlib.decompress(blob)
+    count, first_time, first_delta, first_value, time_length = _HEADER.unpack_from(raw)
+    body = memoryview(raw)[_HEADER.size:]
+    if count == 1:
+        return [first_time], [first_value]
+    deltas = accumulate(_decode_varints(body[:time_length]), initial=first_delta)
+    times = list(accumulate(deltas, initial=first_time))
+    values = list(accumulate(_decode_varints(body[time_length:]), initial=first_value))
+    return times, values
+
+
+class Series:
+    """One (user, metric) series: sealed chunks on disk plus the open chunk in memory, which is
+    written out when its hour ends or on shutdown.
+
+    Files: path.gen names the current generation; generation 0 is path.dat and path.idx, later
+    ones path.<n>.dat and path.<n>.idx. path.log holds the open chunk's samples until it is sealed.
+    """
+
+    def __init__(self, path: str, scale: int):
+        self.path = path
+        self.scale = scale
+        self.records: List[Tuple] = []
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.open_times: List[int] = []
+        self.open_values: List[int] = []
+        self.latest = -1
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+        self._logged = 0  # open chunk samples already in the log
+        self.generation = 0
+        if os.path.exists(path + ".gen"):
+            with open(path + ".gen") as manifest:
+                self.generation = int(manifest.read())
+        self._remove_stale_files()
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as index:
+                self.records = list(_RECORD.iter_unpack(index.read()))
+            # Drop a record whose chunk never made it to disk
+            size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+            self.records = [record for record in self.records if record[2] + record[3] <= size]
+            self.starts = [record[0] for record in self.records]
+            self.ends = [record[1] for record in self.records]
+            self.latest = self.ends[-1] if self.ends else -1
+        self._replay_log()
+
+    def _files(self, generation: int) -> Tuple[str, str]:
+        base = self.path if generation == 0 else f"{self.path}.{generation}"
+        return base + ".dat", base + ".idx"
+
+    @property
+    def data_path(self) -> str:
+        return self._files(self.generation)[0]
+
+    @property
+    def index_path(self) -> str:
+        return self._files(self.generation)[1]
+
+    def _remove_stale_files(self) -> None:
+        """Delete files of other generations, left behind by a rewrite that crashed"""
+        directory, name = os.path.split(self.path)
+        stale = re.compile(rf"{re.escape(name)}(\.\d+)?\.(dat|idx)|{re.escape(name)}\.gen\.tmp")
+        current = set(self._files(self.generation))
+        for entry in os.listdir(directory or "."):
+            path = os.path.join(directory, entry)
+            if stale.fullmatch(entry) and path not in current:
+                os.remove(path)
+
+    def _replay_log(self) -> None:
+        """Restore the open chunk from its log; entries a sealed chunk already holds are skipped"""
+        if not os.path.exists(self.path + ".log"):
+            return
+        with open(self.path + ".log", "rb") as log:
+            data = log.read()
+        data = data[:len(data) - len(data) % _PENDING.size]  # a write cut short by the crash
+        for timestamp_ms, value in _PENDING.iter_unpack(data):
+            if timestamp_ms > self.latest:
+                self.open_times.append(timestamp_ms)
+                self.open_values.append(value)
+                self.latest = timestamp_ms
+        self._logged = len(self.open_times)
+
+    def append(self, timestamp_ms: int, value: float) -> bool:
+        """Add one sample; samples older than the newest one are dropped"""
+        if timestamp_ms <= self.latest:
+            return False
+        if self.open_times and (
+            timestamp_ms // (CHUNK_SECONDS * 1000) != self.open_times[0] // (CHUNK_SECONDS * 1000)
+            or len(self.open_times) >= CHUNK_MAX_SAMPLES
+        ):
+            self.seal()
+        self.open_times.append(timestamp_ms)
+        self.open_values.append(round(value * self.scale))
+        self.latest = timestamp_ms
+        return True
+
+    def log_pending(self) -> None:
+        """Append the open chunk's samples that are not in the log yet; called once per batch"""
+        if self._logged < len(self.open_times):
+            pending = zip(self.open_times[self._logged:], self.open_values[self._logged:])
+            with open(self.path + ".log", "ab") as log:
+                log.write(b"".join(_PENDING.pack(*sample) for sample in pending))
+            self._logged = len(self.open_times)
+
+    def seal(self) -> None:
+        """Write the open chunk to disk"""
+        if not self.open_times:
+            return
+        times, values = self.open_times, self.open_values
+        blob = encode_chunk(times, values)
+        with self._lock:
+            with open(self.data_path, "ab") as data:
+                offset = data.tell()
+                data.write(blob)
+            record = (
+                times[0], times[-1], offset, len(blob), len(times),
+                min(values) / self.scale, max(values) / self.scale, sum(values) / self.scale
+            )
+            with open(self.index_path, "ab") as index:
+                index.write(_RECORD.pack(*record))
+            self.records.append(record)
+            self.starts.append(times[0])
+            self.ends.append(times[-1])
+            self.open_times, self.open_values = [], []
+            self._logged = 0
+            if os.path.exists(self.path + ".log"):
+                os.remove(self.path + ".log")
+
+    def _chunk(self, record: Tuple) -> Tuple[List[int], List[int]]:
+        with self._lock:
+            # Retention may have rewritten the files since the record was taken: look up its current
+            # offset, and treat a chunk that has been dropped meanwhile as empty
+            index = bisect_left(self.starts, record[0])
+            if index == len(self.records) or self.records[index][:2] != record[:2]:
+                return [], []
+            offset, length = self.records[index][2], self.records[index][3]
+            if self._map is None or offset + length > len(self._map):
+                if self._map is not None:
+                    self._map.close()
+                with open(self.data_path, "rb") as data:
+                    self._map = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ)
+            blob = self._map[offset:offset + length]
+        return decode_chunk(blob)
+
+    def _view(self, start_ms: int, end_ms: int) -> Tuple[List[Tuple], List[int], List[int]]:
+        """Overlapping chunk records and a copy of the open chunk, taken together so seal() cannot
+        move samples from one to the other in between"""
+        with self._lock:
+            records = self.records[bisect_left(self.ends, start_ms):bisect_left(self.starts, end_ms)]
+            return records, list(self.open_times), list(self.open_values)
+
+    def read(self, start_ms: int, end_ms: int) -> List[Tuple[int, float]]:
+        """Raw samples with start_ms <= t < end_ms"""
+        records, open_times, open_values = self._view(start_ms, end_ms)
+        samples = []
+        for record in records:
+            times, values = self._chunk(record)
+            first, last = bisect_left(times, start_ms), bisect_left(times, end_ms)
+            samples.extend(zip(times[first:last], (value / self.scale for value in values[first:last])))
+        first, last = bisect_left(open_times, start_ms), bisect_left(open_times, end_ms)
+        samples.extend(zip(open_times[first:last], (value / self.scale for value in open_values[first:last])))
+        return samples
+
+    def downsample(self, start_ms: int, end_ms: int, step_ms: int) -> List[List[float]]:
+        """[bucket start ms, mean, min, max, count] per step, skipping empty buckets"""
+        buckets: Dict[int, List[float]] = {}
+
+        def add(bucket: int, count: int, low: float, high: float, total: float) -> None:
+            entry = buckets.get(bucket)
+            if entry is None:
+                buckets[bucket] = [count, low, high, total]
+            else:
+                entry[0] += count
+                entry[1] = min(entry[1], low)
+                entry[2] = max(entry[2], high)
+                entry[3] += total
+
+        def add_samples(times: List[int], values: List[int]) -> None:
+            # Slice the sorted samples at bucket boundaries so min/max/sum run per slice
+            index, last = bisect_left(times, start_ms), bisect_left(times, end_ms)
+            while index < last:
+                bucket = (times[index] - start_ms) // step_ms
+                boundary = bisect_left(times, start_ms + (bucket + 1) * step_ms, index, last)
+                window = values[index:boundary]
+                add(bucket, len(window), min(window) / self.scale, max(window) / self.scale, sum(window) / self.scale)
+                index = boundary
+
+        records, open_times, open_values = self._view(start_ms, end_ms)
+        for record in records:
+            chunk_start, chunk_end = record[0], record[1]
+            bucket = (chunk_start - start_ms) // step_ms
+            if chunk_start >= start_ms and chunk_end < end_ms and bucket == (chunk_end - start_ms) // step_ms:
+                # The whole chunk falls in one bucket: its index record is enough
+                add(bucket, record[4], record[5], record[6], record[7])
+            else:
+                add_samples(*self._chunk(record))
+        add_samples(open_times, open_values)
+
+        return [
+            [start_ms + bucket * step_ms, total / count, low, high, count]
+            for bucket, (count, low, high, total) in sorted(buckets.items())
+        ]
+
+    def drop_before(self, cutoff_ms: int) -> int:
+        """Remove chunks that ended before cutoff_ms by writing both files as a new generation;
+        returns chunks dropped"""
+        with self._lock:
+            keep = bisect_right(self.ends, cutoff_ms - 1)
+            if not keep:
+                return 0
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            kept = self.records[keep:]
+            shift = kept[0][2] if kept else 0
+            with open(self.data_path, "rb") as data:
+                data.seek(shift)
+                tail = data.read()
+            kept = [record[:2] + (record[2] - shift,) + record[3:] for record in kept]
+            generation = self.generation + 1
+            data_path, index_path = self._files(generation)
+            _write_durably(data_path, tail if kept else b"")
+            _write_durably(index_path, b"".join(_RECORD.pack(*record) for record in kept))
+            _write_durably(self.path + ".gen.tmp", str(generation).encode())
+            try:
+                # The one switching step: before the rename the old pair is current, after it the new one
+                os.replace(self.path + ".gen.tmp", self.path + ".gen")
+            except OSError:
+                for path in (data_path, index_path, self.path + ".gen.tmp"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                raise
+            replaced = self._files(self.generation)
+            self.generation = generation
+            self.records = kept
+            self.starts = [record[0] for record in kept]
+            self.ends = [record[1] for record in kept]
+            for path in replaced:
+                os.remove(path)
+        return keep
+
+    def disk_bytes(self) -> int:
+        paths = (self.data_path, self.index_path, self.path + ".log")
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+class TimeSeriesStore:
+    """Series per user and metric under one directory, with a retention window"""
+
+    def __init__(self, root: str = "timeseries", retention_days: float = 365.0):
+        self.root = root
+        self.retention_days = retention_days
+        self.series: Dict[Tuple[int, str], Series] = {}
+        self._retention_task: Optional[asyncio.Task] = None
+        self.stats = {"samples": 0, "dropped": 0, "chunks_expired": 0}
+
+    @classmethod
+    def from_env(cls) -> "TimeSeriesStore":
+        return cls(
+            root=os.getenv("TIMESERIES_DIR", "timeseries"),
+            retention_days=_env_float("TIMESERIES_RETENTION_DAYS", 365.0)
+        )
+
+    def get(self, metric: str, user_id: int = DEFAULT_USER_ID) -> Series:
+        series = self.series.get((user_id, metric))
+        if series is None:
+            directory = os.path.join(self.root, str(user_id))
+            os.makedirs(directory, exist_ok=True)
+            # setdefault: retention opens series from a worker thread while requests do from the loop
+            series = self.series.setdefault((user_id, metric), Series(os.path.join(directory, metric), METRIC_SCALES[metric]))
+        return series
+
+    def append(self, batch: Dict[str, Iterable[Tuple[float, float]]], user_id: int = DEFAULT_USER_ID) -> int:
+        """Store samples given as (epoch seconds, value) per metric; returns how many were kept"""
+        kept = 0
+        for metric, samples in batch.items():
+            if metric not in METRIC_SCALES or not samples:
+                continue
+            series = self.get(metric, user_id)
+            for timestamp, value in sorted(samples):
+                if series.append(int(timestamp * 1000), value):
+                    kept += 1
+                else:
+                    self.stats["dropped"] += 1
+            series.log_pending()
+        self.stats["samples"] += kept
+        return kept
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        """Drop chunks older than the retention window from every series on disk"""
+        now = time.time() if now is None else now
+        cutoff = int((now - self.retention_days * 86400) * 1000)
+        dropped = 0
+        if os.path.isdir(self.root):
+            for user in filter(str.isdigit, os.listdir(self.root)):
+                for metric in METRIC_SCALES:
+                    path = os.path.join(self.root, user, metric)
+                    if os.path.exists(path + ".idx") or os.path.exists(path + ".gen"):
+                        dropped += self.get(metric, int(user)).drop_before(cutoff)
+        self.stats["chunks_expired"] += dropped
+        return dropped
+
+    def start(self) -> None:
+        """Apply retention now and then daily, in a worker thread since it rewrites files"""
+        if self._retention_task is None:
+            self._retention_task = asyncio.create_task(self._retention_loop())
+
+    async def stop(self) -> None:
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            await asyncio.gather(self._retention_task, return_exceptions=True)
+            self._retention_task = None
+
+    async def _retention_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.apply_retention)
+            except Exception as e:
+                logger.error(f"Time-series retention failed: {e}")
+            await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+    def flush(self) -> None:
+        """Seal every open chunk"""
+        for series in self.series.values():
+            series.seal()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "series": len(self.series),
+            "chunks": sum(len(series.records) for series in self.series.values()),
+            "disk_bytes": sum(series.disk_bytes() for series in self.series.values())
+        }
+
+
+# Global instance
+timeseries_store = TimeSeriesStore.from_env()
@@ -0,0 +1,171 @@
+"""
+Wearable signal ingestion: per-user ring buffers with sliding-window statistics
+
+Each signal keeps its recent samples in a fixed-size ring buffer together with a running
+sum and sum of squares over the samples still inside its time window. Appending a sample
+and evicting an expired one are O(1), so the current HealthContext is derived from a few
+running totals instead of a scan over the raw samples.
+"""
+import math
+import time
+from array import array
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .preferences import DEFAULT_USER_ID
+
+# Window (seconds) and ring capacity per signal; capacity covers the window at the usual
+# watch sampling rate, and the oldest samples are evicted early if a burst overflows it
+SIGNALS = {
+    "hr": (10 * 60, 1024),  # about 1 Hz while active
+    "hrv": (60 * 60, 256),  # a reading every few minutes
+    "steps": (60 * 60, 512),  # per-minute step counts
+    "sleep": (24 * 60 * 60, 256),  # sleep segments
+}
+
+# activity_level thresholds: steps in the last hour, or mean heart rate over the HR window
+ACTIVITY_STEPS = (("intense", 4000), ("moderate", 1500), ("light", 300))
+INTENSE_HR = 130.0
+# mood_energy thresholds on mean HRV (RMSSD, ms) and sleep
+LOW_HRV = 30.0
+HIGH_HRV = 60.0
+LOW_SLEEP_HOURS = 6.0
+GOOD_SLEEP_HOURS = 7.5
+
+
+class SignalWindow:
+    """Ring buffer of (timestamp, value) with running count, sum and sum of squares over a time window"""
+
+    __slots__ = ("window", "capacity", "times", "values", "head", "size", "total", "squares", "latest", "late")
+
+    def __init__(self, window: float, capacity: int):
+        self.window = window
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.head = 0  # index of the oldest sample
+        self.size = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.latest = -math.inf
+        self.late = 0  # samples dropped for arriving older than the newest one
+
+    def _pop(self) -> None:
+        value = self.values[self.head]
+        self.total -= value
+        self.squares -= value * value
+        self.head = (self.head + 1) % self.capacity
+        self.size -= 1
+
+    def add(self, timestamp: float, value: float) -> bool:
+        """Append one sample; samples not newer than the latest are dropped to keep the window
+        append-only, and so a retried batch does not count its last sample twice"""
+        if timestamp <= self.latest:
+            self.late += 1
+            return False
+        if self.size == self.capacity:
+            self._pop()
+        tail = (self.head + self.size) % self.capacity
+        self.times[tail] = timestamp
+        self.values[tail] = value
+        self.size += 1
+        self.total += value
+        self.squares += value * value
+        self.latest = timestamp
+        return True
+
+    def expire(self, now: float) -> None:
+        """Evict samples that fell out of the window; amortized O(1) per sample"""
+        cutoff = now - self.window
+        while self.size and self.times[self.head] < cutoff:
+            self._pop()
+        if not self.size:
+            # Running sums are exact again once empty; this stops float drift from accumulating
+            self.total = self.squares = 0.0
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        self.expire(now)
+        if not self.size:
+            return {"count": 0, "sum": 0.0, "mean": None, "std": None}
+        mean = self.total / self.size
+        variance = max(0.0, self.squares / self.size - mean * mean)
+        return {"count": self.size, "sum": round(self.total, 2), "mean": round(mean, 2), "std": round(math.sqrt(variance), 2)}
+
+
+class WearableStore:
+    """In-memory signal windows per user"""
+
+    def __init__(self):
+        self.users: Dict[int, Dict[str, SignalWindow]] = {}
+        self.stats = {"batches": 0, "samples": 0, "late": 0}
+
+    def signals(self, user_id: int = DEFAULT_USER_ID) -> Dict[str, SignalWindow]:
+        signals = self.users.get(user_id)
+        if signals is None:
+            signals = self.users[user_id] = {
+                name: SignalWindow(window, capacity)
+                for name, (window, capacity) in SIGNALS.items()
+            }
+        return signals
+
+    def ingest(self, batch: Dict[str, Iterable[Tuple[float, float]]], user_id: int = DEFAULT_USER_ID) -> Dict[str, int]:
+        """Add a batch of samples per signal; returns accepted and late counts"""
+        signals = self.signals(user_id)
+        accepted = late = 0
+        for name, samples in batch.items():
+            window = signals.get(name)
+            if window is None:
+                continue
+            # Batches from the watch are usually ordered; sorting makes a shuffled batch safe
+            for timestamp, value in sorted(samples):
+                if window.add(timestamp, value):
+                    accepted += 1
+                else:
+                    late += 1
+        self.stats["batches"] += 1
+        self.stats["samples"] += accepted
+        self.stats["late"] += late
+        return {"accepted": accepted, "late": late}
+
+    def window_stats(self, user_id: int = DEFAULT_USER_ID, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        now = time.time() if now is None else now
+        return {name: window.stats(now) for name, window in self.signals(user_id).items()}
+
+    def health_context(self, user_id: int = DEFAULT_USER_ID, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Current HealthContext fields from the windows, or None with no recent samples"""
+        stats = self.window_stats(user_id, now)
+        if not any(signal["count"] for signal in stats.values()):
+            return None
+
+        sleep_hours = min(12.0, stats["sleep"]["sum"] / 60)
+        steps = stats["steps"]["sum"]
+        heart_rate = stats["hr"]["mean"]
+        activity_level = "none"
+        if heart_rate is not None and heart_rate >= INTENSE_HR:
+            activity_level = "intense"
+        else:
+            for level, threshold in ACTIVITY_STEPS:
+                if steps >= threshold:
+                    activity_level = level
+                    break
+
+        hrv = stats["hrv"]["mean"]
+        has_sleep = stats["sleep"]["count"] > 0
+        mood_energy = "normal"
+        if (hrv is not None and hrv < LOW_HRV) or (has_sleep and sleep_hours < LOW_SLEEP_HOURS):
+            mood_energy = "low"
+        elif hrv is not None and hrv >= HIGH_HRV and (not has_sleep or sleep_hours >= GOOD_SLEEP_HOURS):
+            mood_energy = "high"
+
+        return {
+            # Without sleep data, assume a normal night rather than none
+            "sleep_hours": round(sleep_hours, 2) if has_sleep else 8.0,
+            "activity_level": activity_level,
+            "mood_energy": mood_energy,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "users": len(self.users)}
+
+
+# Global instance
+wearable_store = WearableStore()
@@ -273,6 +273,268 @@ def test_nutrition_endpoints():
     except Exception as e:
         print_test("Nutrition trends", False, f"Error: {str(e)}")
 
+def test_streaming_endpoints():
+    """Test SSE streaming variants of meal plan and smart recommendations"""
+    print_section("Streaming Endpoints Testing")
+    
+    try:
+        foods_response = requests.get(f"{BASE_URL}/api/foods/")
+        foods = foods_response.json() if foods_response.status_code == 200 else []
+        stream_data = {
+            "user_pref": {
+                "diet_style": "omnivore",
+                "dislikes": [],
+                "budget": "$$",
+                "home_area": "downtown"
+            },
+            "health_context": {
+                "sleep_hours": 8.0,
+                "activity_level": "moderate",
+                "mood_energy": "normal"
+            },
+            "available_foods": foods[:10]
+        }
+        
+        response = requests.post(
+            f"{BASE_URL}/api/nutrition/meal-plan/stream?days=3",
+            json=stream_data,
+            headers={"Content-Type": "application/json"},
+            stream=True
+        )
+        events = [line for line in response.iter_lines(decode_unicode=True) if line.startswith("event:")]
+        success = response.status_code == 200 and "event: done" in events
+        print_test("Meal plan stream", success, f"Received {len(events)} events")
+        
+        stream_data["recent_logs"] = []
+        response = requests.post(
+            f"{BASE_URL}/api/nutrition/smart-recommendations/stream",
+            json=stream_data,
+            headers={"Content-Type": "application/json", "Accept": "application/x-ndjson"},
+            stream=True
+        )
+        events = [json.loads(line)["event"] for line in response.iter_lines(decode_unicode=True) if line]
+        success = response.status_code == 200 and events[:1] == ["trend_insights"] and events[-1:] == ["done"]
+        print_test("Smart recommendations stream (NDJSON)", success, f"Events: {events}")
+        
+    except Exception as e:
+        print_test("Streaming endpoints", False, f"Error: {str(e)}")
+
+def test_job_endpoints():
+    """Test queued meal plans with status long-polling"""
+    print_section("Job Queue Testing")
+    
+    try:
+        foods_response = requests.get(f"{BASE_URL}/api/foods/")
+        foods = foods_response.json() if foods_response.status_code == 200 else []
+        job_data = {
+            "user_pref": {
+                "diet_style": "omnivore",
+                "dislikes": [],
+                "budget": "$$",
+                "home_area": "downtown"
+            },
+            "health_context": {
+                "sleep_hours": 8.0,
+                "activity_level": "moderate",
+                "mood_energy": "normal"
+            },
+            "available_foods": foods[:10]
+        }
+        
+        response = requests.post(
+            f"{BASE_URL}/api/nutrition/meal-plan/jobs?days=2",
+            json=job_data,
+            headers={"Content-Type": "application/json"}
+        )
+        success = response.status_code == 202 and "job_id" in response.json()
+        print_test("Enqueue meal plan job", success, f"Status: {response.status_code}")
+        
+        if success:
+            job_id = response.json()["job_id"]
+            response = requests.get(f"{BASE_URL}/api/jobs/{job_id}?wait=20")
+            job = response.json() if response.status_code == 200 else {}
+            success = job.get("status") == "succeeded" and "day_1" in (job.get("result") or {})
+            print_test("Long-poll meal plan job", success, f"Status: {job.get('status')}, attempts: {job.get('attempts')}")
+        
+        response = requests.get(f"{BASE_URL}/api/jobs/unknown-job")
+        print_test("Unknown job returns 404", response.status_code == 404, f"Status: {response.status_code}")
+        
+    except Exception as e:
+        print_test("Job endpoints", False, f"Error: {str(e)}")
+
+def test_food_relations():
+    """Test similar foods and co-occurrence pairings"""
+    print_section("Food Relations Testing")
+    
+    try:
+        foods_response = requests.get(f"{BASE_URL}/api/foods/")
+        foods = foods_response.json() if foods_response.status_code == 200 else []
+        if len(foods) < 2:
+            print_test("Food relations", False, "Not enough foods available")
+            return
+        
+        response = requests.get(f"{BASE_URL}/api/foods/{foods[0]['id']}/similar?k=3")
+        data = response.json() if response.status_code == 200 else {}
+        print_test("Similar foods", response.status_code == 200, f"Found {len(data.get('similar', []))} similar foods")
+        
+        # Two foods logged back to back count as the same meal
+        for food in foods[:2]:
+            requests.post(f"{BASE_URL}/api/logs/?food_id={food['id']}&servings=1")
+        response = requests.get(f"{BASE_URL}/api/foods/{foods[0]['id']}/goes-well-with")
+        pairings = [item["food_id"] for item in response.json().get("goes_well_with", [])] if response.status_code == 200 else []
+        print_test("Goes well with", foods[1]["id"] in pairings, f"Pairings: {pairings}")
+        
+        response = requests.get(f"{BASE_URL}/api/foods/unknown-food/similar")
+        print_test("Unknown food returns 404", response.status_code == 404, f"Status: {response.status_code}")
+        
+        response = requests.post(f"{BASE_URL}/api/users/recommendations/{foods[1]['id']}/accept")
+        print_test("Accept recommendation", response.status_code == 200, f"Status: {response.status_code}")
+        response = requests.get(f"{BASE_URL}/api/users/preferences/learned")
+        features = [item["feature"] for item in response.json().get("top_features", [])] if response.status_code == 200 else []
+        print_test("Learned preferences", f"cat:{foods[1]['category']}" in features, f"Top features: {features[:5]}")
+        
+    except Exception as e:
+        print_test("Food relations", False, f"Error: {str(e)}")
+
+def test_state_recommendations():
+    """Test precomputed top picks per wearable state"""
+    print_section("State Recommendations Testing")
+    
+    try:
+        response = requests.get(f"{BASE_URL}/api/foods/for-state/postWorkout?area=campus")
+        data = response.json() if response.status_code == 200 else {}
+        foods = data.get("foods", [])
+        print_test("Post-workout picks", response.status_code == 200 and 0 < len(foods) <= 3, f"Foods: {[food['name'] for food in foods]}")
+        
+        response = requests.get(f"{BASE_URL}/api/foods/for-state/hungry")
+        print_test("Unknown state returns 400", response.status_code == 400, f"Status: {response.status_code}")
+        
+    except Exception as e:
+        print_test("State recommendations", False, f"Error: {str(e)}")
+
+def test_wearable_ingestion():
+    """Test wearable sample ingestion and the derived health context"""
+    print_section("Wearable Ingestion Testing")
+    
+    try:
+        now = time.time()
+        # Earlier runs within 24h leave their sleep in the window, so check the change
+        stats = requests.get(f"{BASE_URL}/api/wearables/stats").json()
+        sleep_before = stats["sleep"]["sum"]
+        batch = {
+            "hr": [[now - 120 + i, 72] for i in range(120)],
+            "hrv": [[now - 60, 50]],
+            "steps": [[now - 60 * i, 30] for i in range(30)],
+            "sleep": [[now - 3600 * 6, 450]]
+        }
+        response = requests.post(f"{BASE_URL}/api/wearables/samples", json=batch)
+        data = response.json() if response.status_code == 200 else {}
+        print_test("Ingest samples", data.get("accepted", 0) > 0, f"Response: {data}")
+        
+        response = requests.get(f"{BASE_URL}/api/wearables/health-context")
+        context = response.json() if response.status_code == 200 else {}
+        sleep_after = requests.get(f"{BASE_URL}/api/wearables/stats").json()["sleep"]["sum"]
+        print_test("Sleep window updated", sleep_after == sleep_before + 450, f"Sleep minutes: {sleep_before} -> {sleep_after}")
+        print_test(
+            "Derived health context",
+            context.get("sleep_hours") == round(min(12.0, sleep_after / 60), 2),
+            f"Context: {context}"
+        )
+        
+        response = requests.get(f"{BASE_URL}/api/wearables/series/hr?start={now - 300}&step=60")
+        buckets = response.json().get("buckets", []) if response.status_code == 200 else []
+        print_test("Stored heart-rate series", sum(bucket[4] for bucket in buckets) >= 120, f"{len(buckets)} buckets")
+        
+        response = requests.get(f"{BASE_URL}/api/wearables/state")
+        state = response.json().get("state") if response.status_code == 200 else None
+        print_test("Detected user state", state is not None, f"State: {state}")
+        
+    except Exception as e:
+        print_test("Wearable ingestion", False, f"Error: {str(e)}")
+
+def test_binary_responses():
+    """Test MessagePack content negotiation on the food endpoints"""
+    print_section("Binary Wire Format Testing")
+    
+    try:
+        import msgpack
+        
+        json_foods = requests.get(f"{BASE_URL}/api/foods/").json()
+        response = requests.get(f"{BASE_URL}/api/foods/", headers={"Accept": "application/msgpack; dict=1"})
+        payload = msgpack.unpackb(response.content) if response.headers.get("content-type") == "application/msgpack" else {}
+        rows = payload.get("rows", [])
+        print_test("MessagePack catalog", len(rows) == len(json_foods),
+                   f"{len(response.content)} bytes vs {len(json.dumps(json_foods))} as JSON, fields: {payload.get('fields')}")
+        print_test("Tags dictionary-encoded", bool(rows) and all(isinstance(tag, int) for tag in rows[0][payload["fields"].index("tags")]),
+                   f"{len(payload.get('strings', []))} strings")
+        
+    except Exception as e:
+        print_test("Binary responses", False, f"Error: {str(e)}")
+
+def test_catalog_changes():
+    """Test the catalog delta sync endpoint"""
+    print_section("Catalog Delta Sync Testing")
+    
+    try:
+        response = requests.get(f"{BASE_URL}/api/foods/changes")
+        data = response.json() if response.status_code == 200 else {}
+        print_test("Full sync from no version", data.get("reset") is True and bool(data.get("snapshot")),
+                   f"Version: {data.get('version')}, {len(data.get('snapshot', []))} foods in snapshot")
+        
+        response = requests.get(f"{BASE_URL}/api/foods/changes", params={"since": data.get("version")})
+        current = response.json() if response.status_code == 200 else {}
+        print_test("Nothing to send when current", current.get("reset") is False and current.get("upserts") == [] and current.get("deletes") == [],
+                   f"Version: {current.get('version')}")
+        
+    except Exception as e:
+        print_test("Catalog changes", False, f"Error: {str(e)}")
+
+def test_home_screen():
+    """Test the composite home screen endpoint and catalog version caching"""
+    print_section("Home Screen Testing")
+    
+    try:
+        response = requests.get(f"{BASE_URL}/api/home/")
+        data = response.json() if response.status_code == 200 else {}
+        print_test("Home screen", response.status_code == 200 and bool(data.get("foods")) and bool(data.get("recommendations")),
+                   f"Version: {data.get('catalog_version')}, remaining: {data.get('remaining')}")
+        
+        response = requests.get(f"{BASE_URL}/api/home/", params={"catalog_version": data.get("catalog_version")})
+        cached = response.json() if response.status_code == 200 else {}
+        print_test("Catalog skipped when current", response.status_code == 200 and cached.get("foods") is None,
+                   f"Today: {cached.get('today')}")
+        
+    except Exception as e:
+        print_test("Home screen", False, f"Error: {str(e)}")
+
+def test_live_recommendations():
+    """Test the live recommendation websocket: snapshot, pong and a pushed delta"""
+    print_section("Live Recommendations Testing")
+    
+    try:
+        from websockets.sync.client import connect
+        
+        ws_url = BASE_URL.replace("http", "ws", 1)
+        with connect(f"{ws_url}/api/live/recommendations?limit=3") as websocket:
+            snapshot = json.loads(websocket.recv(timeout=10))
+            print_test("Initial snapshot", snapshot.get("type") == "snapshot", f"Items: {[item['name'] for item in snapshot.get('items', [])]}")
+            
+            websocket.send(json.dumps({"type": "ping"}))
+            pong = json.loads(websocket.recv(timeout=10))
+            print_test("Ping answered", pong.get("type") == "pong", f"Message: {pong}")
+            
+            original = requests.get(f"{BASE_URL}/api/users/preferences").json()
+            diet_style = "vegan" if original.get("diet_style") != "vegan" else "omnivore"
+            requests.put(f"{BASE_URL}/api/users/preferences", json={**original, "diet_style": diet_style})
+            message = json.loads(websocket.recv(timeout=10))
+            while message.get("type") == "heartbeat":
+                message = json.loads(websocket.recv(timeout=10))
+            print_test("Delta pushed on preference change", message.get("type") == "delta", f"Removed: {message.get('removed')}")
+            requests.put(f"{BASE_URL}/api/users/preferences", json=original)
+        
+    except Exception as e:
+        print_test("Live recommendations", False, f"Error: {str(e)}")
+
 def test_ai_features():
     """Test AI-related features"""
     print_section("AI Features Testing")
@@ -543,6 +805,15 @@ def main():
     test_api_health()
     test_food_endpoints()
     test_nutrition_endpoints()
+    test_streaming_endpoints()
+    test_job_endpoints()
+    test_food_relations()
+    test_state_recommendations()
+    test_wearable_ingestion()
+    test_binary_responses()
+    test_catalog_changes()
+    test_home_screen()
+    test_live_recommendations()
     test_ai_features()
     simulate_user_flows()
     test_error_handling()
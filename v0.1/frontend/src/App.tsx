@@ -85,10 +85,31 @@ function App() {
     try {
       setLoading(true)
       setError(null)
-      const response = await fetch(`${API_BASE}/api/foods/`)
+      // One round trip for the launch screen; the catalog is only sent when our cached copy is stale
+      const cachedVersion = localStorage.getItem('catalogVersion')
+      const query = cachedVersion ? `?catalog_version=${encodeURIComponent(cachedVersion)}` : ''
+      const response = await fetch(`${API_BASE}/api/home/${query}`)
       if (!response.ok) throw new Error('Failed to load foods')
       const data = await response.json()
-      setFoods(data)
+      let catalog: Food[] = data.foods
+      if (catalog) {
+        // Catalog first: a version saved without its catalog would skip every later download
+        try {
+          localStorage.setItem('catalog', JSON.stringify(catalog))
+          localStorage.setItem('catalogVersion', data.catalog_version)
+        } catch {
+          localStorage.removeItem('catalogVersion')
+        }
+      } else {
+        catalog = JSON.parse(localStorage.getItem('catalog') || '[]')
+      }
+      const byId = new Map(catalog.map(food => [food.id, food]))
+      setFoods(catalog)
+      setRecommendations(
+        data.recommendations
+          .map((rec: { food_id: string }) => byId.get(rec.food_id))
+          .filter((food: Food | undefined): food is Food => food !== undefined)
+      )
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Unknown error')
     } finally {